@@ -0,0 +1,196 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+
+# Um arquivo JSONL por partida; pode ser trocado pela variável de ambiente
+JOURNAL_DIR = os.environ.get(
+    'PROFUTSTAT_JOURNAL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'match_journals')
+)
+# fsync em lote: a cada N eventos ou a cada T segundos (o flush para o sistema operacional é por evento)
+FSYNC_EVERY = 25
+FSYNC_INTERVAL = 2.0
+# Quantas partidas recentes aparecem para retomar
+MAX_LISTED_JOURNALS = 20
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if hasattr(value, 'item'):  # escalares numpy
+        return value.item()
+    raise TypeError(f"Valor não serializável no journal: {value!r}")
+
+
+def _decode(obj):
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+class EventJournal:
+    """
+    Journal de escrita antecipada de uma partida: cada evento vira uma linha JSON
+    acrescentada ao arquivo. A primeira linha é o cabeçalho (app, colunas, criação);
+    o arquivo só é criado no primeiro evento.
+
+    Cada linha vai para o sistema operacional na hora (sobrevive a refresh do navegador
+    e a queda do processo); o fsync, que protege contra queda da máquina, é feito em
+    lote para não travar cliques em sequência. Uma última linha incompleta (queda no
+    meio da escrita) é ignorada na leitura e descartada ao retomar.
+    """
+
+    def __init__(self, path, columns, app=''):
+        self.path = path
+        self.columns = list(columns)
+        self.app = app
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    @classmethod
+    def create(cls, app, columns, journal_dir=None):
+        """Journal de uma partida nova (nome único por app e horário de início)."""
+        journal_dir = journal_dir or JOURNAL_DIR
+        name = f"{app}_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}.jsonl"
+        return cls(os.path.join(journal_dir, name), columns, app)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        new_file = not os.path.exists(self.path)
+        if not new_file:
+            _truncate_partial_tail(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if new_file:
+            header = {'app': self.app, 'columns': self.columns, 'created': datetime.now()}
+            self._write(header)
+            self.sync()
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, default=_encode, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def append(self, row):
+        """Grava a linha do evento (tupla na ordem de `columns`)."""
+        self.write_record({'event': list(row)})
+
+    def write_record(self, record):
+        if self._file is None:
+            self._open()
+        self._write(record)
+        self._pending += 1
+        if self._pending >= FSYNC_EVERY or time.monotonic() - self._last_sync >= FSYNC_INTERVAL:
+            self.sync()
+
+    @property
+    def pending(self):
+        """Há registros gravados que ainda não passaram por fsync."""
+        return self._pending > 0
+
+    def sync_if_due(self):
+        """fsync dos registros pendentes se o intervalo já passou (chamado pelo relógio, mesmo sem novos eventos)."""
+        if self._pending and time.monotonic() - self._last_sync >= FSYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def read(path):
+        """(cabeçalho, registros) do journal, ignorando uma última linha incompleta."""
+        with open(path, encoding='utf-8') as journal_file:
+            lines = journal_file.read().split('\n')
+        records = []
+        for line in lines:
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line, object_hook=_decode))
+            except ValueError:
+                break
+        if not records:
+            return None, []
+        return records[0], records[1:]
+
+
+def _truncate_partial_tail(path):
+    """Corta o arquivo no último '\\n' (descarta uma linha escrita pela metade)."""
+    with open(path, 'rb+') as journal_file:
+        data = journal_file.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            journal_file.truncate(end)
+
+
+def _count_live_events(journal_file):
+    """
+    Nº de eventos ativos: registros de evento menos os excluídos. Só as linhas de
+    exclusão/correção (poucas) são decodificadas; uma última linha incompleta é ignorada.
+    """
+    n_events = 0
+    removed = set()
+    for line in journal_file:
+        if not line.endswith(b'\n'):
+            break
+        if line.startswith(b'{"event"'):
+            n_events += 1
+        elif line.startswith((b'{"remove"', b'{"set"')):
+            record = json.loads(line)
+            if 'remove' in record:
+                removed.add(record['remove'])
+            else:
+                removed.discard(record['set'][0])
+    return n_events - len(removed)
+
+
+# caminho -> ((tamanho, mtime), cabeçalho, nº de eventos ativos) dos journals já lidos
+_summaries = {}
+
+
+def _journal_summary(path):
+    """(cabeçalho ou None, nº de eventos ativos); o arquivo só é relido se mudou de tamanho ou mtime."""
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    cached = _summaries.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1], cached[2]
+    with open(path, 'rb') as journal_file:
+        first_line = journal_file.readline()
+        n_events = _count_live_events(journal_file)
+    try:
+        header = json.loads(first_line, object_hook=_decode)
+    except ValueError:
+        header = None
+    _summaries[path] = (key, header, n_events)
+    return header, n_events
+
+
+def list_journals(app, journal_dir=None, limit=MAX_LISTED_JOURNALS):
+    """
+    Partidas gravadas de `app`, da mais recente para a mais antiga: lista de
+    (caminho, cabeçalho, nº de eventos ativos). Só o cabeçalho é decodificado e
+    journals que não mudaram desde a última listagem não são relidos.
+    """
+    journal_dir = journal_dir or JOURNAL_DIR
+    if not os.path.isdir(journal_dir):
+        return []
+    names = sorted((n for n in os.listdir(journal_dir) if n.startswith(f"{app}_") and n.endswith('.jsonl')), reverse=True)
+    journals = []
+    for name in names:
+        path = os.path.join(journal_dir, name)
+        header, n_events = _journal_summary(path)
+        if header is not None and header.get('app') == app:  # o prefixo de um app pode ser início de outro
+            journals.append((path, header, n_events))
+            if len(journals) >= limit:
+                break
+    return journals
@@ -0,0 +1,192 @@
+from collections import defaultdict
+
+import pandas as pd
+
+from event_journal import EventJournal
+from live_stats import LiveStats, event_label
+
+# Colunas padrão do log de eventos dos trackers
+EVENT_COLUMNS = ["Event", "Minute", "Second", "Team", "Player", "Type", "SubType", "Timestamp", "Observation"]
+
+
+class EventLog:
+    """
+    Log de eventos de uma partida.
+
+    Cada clique acrescenta uma tupla (O(1)) em vez de recriar o DataFrame com pd.concat;
+    o DataFrame só é montado quando o log é exibido ou exportado e fica memorizado até
+    a próxima alteração (`version` muda a cada uma). `stats` mantém as estatísticas
+    ao vivo atualizadas a cada evento. Com um `journal`, cada alteração também é
+    gravada em disco e a partida pode ser retomada com `resume`.
+
+    Cada evento tem um id estável (sua posição no log; um evento excluído vira None),
+    então excluir, corrigir, desfazer e refazer custam O(1) e ajustam os contadores
+    de `stats` em vez de recalcular tudo. `find` usa um índice por minuto, jogador e
+    evento para localizar o que corrigir.
+    """
+
+    def __init__(self, columns=EVENT_COLUMNS, journal=None, rows=()):
+        self.columns = list(columns)
+        self.journal = journal
+        self._rows = []
+        self._live = 0
+        self._index = defaultdict(lambda: defaultdict(set))  # minuto -> (jogador, evento) -> ids
+        self._keys = (self.columns.index("Minute"), self.columns.index("Player"), self.columns.index("Event"))
+        self._undo = []  # (id, linha antes, linha depois)
+        self._redo = []
+        self.stats = LiveStats(self.columns)
+        self.version = 0
+        self._frame = None
+        for row in rows:
+            self._set(len(self._rows), tuple(row))
+
+    @classmethod
+    def with_journal(cls, app, columns=EVENT_COLUMNS):
+        """Log de uma partida nova, gravado em um journal próprio (criado no primeiro evento)."""
+        return cls(columns, EventJournal.create(app, columns))
+
+    @classmethod
+    def resume(cls, path):
+        """Log reconstruído a partir do journal em `path`; as próximas alterações continuam no mesmo arquivo."""
+        header, records = EventJournal.read(path)
+        log = cls(header['columns'])
+        for record in records:
+            if 'event' in record:
+                log._set(len(log._rows), tuple(record['event']))
+            elif 'set' in record:
+                event_id, row = record['set']
+                log._set(event_id, tuple(row))
+            elif 'remove' in record:
+                log._set(record['remove'], None)
+        log.journal = EventJournal(path, header['columns'], header.get('app', ''))
+        return log
+
+    def __len__(self):
+        return self._live
+
+    @property
+    def unsynced(self):
+        """Há eventos no journal ainda sem fsync."""
+        return self.journal is not None and self.journal.pending
+
+    def sync_if_due(self):
+        if self.journal is not None:
+            self.journal.sync_if_due()
+
+    def close(self):
+        """Fecha o journal (fsync do que faltar); chamar antes de trocar o log da sessão."""
+        if self.journal is not None:
+            self.journal.close()
+
+    @property
+    def empty(self):
+        return not self._live
+
+    def _index_key(self, row):
+        minute, player, event = self._keys
+        return int(row[minute]), (row[player], row[event])
+
+    def _set(self, event_id, row):
+        """Coloca `row` (ou None = excluído) no id, atualizando journal, índice e contadores."""
+        old = self._rows[event_id] if event_id < len(self._rows) else None
+        if self.journal is not None:
+            if event_id == len(self._rows):
+                self.journal.append(row)
+            elif row is None:
+                self.journal.write_record({'remove': event_id})
+            else:
+                self.journal.write_record({'set': [event_id, list(row)]})
+        if old is not None:
+            minute, key = self._index_key(old)
+            self._index[minute][key].discard(event_id)
+            self.stats.remove(old)
+            self._live -= 1
+        if row is not None:
+            minute, key = self._index_key(row)
+            self._index[minute][key].add(event_id)
+            self.stats.add(row)
+            self._live += 1
+        if event_id == len(self._rows):
+            self._rows.append(row)
+        else:
+            self._rows[event_id] = row
+        self.version += 1
+
+    def _change(self, event_id, row):
+        before = self._rows[event_id] if event_id < len(self._rows) else None
+        self._set(event_id, row)
+        self._undo.append((event_id, before, row))
+        self._redo.clear()
+
+    def append(self, event):
+        """Acrescenta um evento (dict com todas as colunas do log) e retorna seu id."""
+        event_id = len(self._rows)
+        self._change(event_id, tuple(event[column] for column in self.columns))
+        return event_id
+
+    def remove(self, event_id):
+        if self._rows[event_id] is not None:
+            self._change(event_id, None)
+
+    def edit(self, event_id, changes):
+        """Corrige campos do evento (ex.: {'Player': '#10 Fulano'})."""
+        row = dict(zip(self.columns, self._rows[event_id]))
+        row.update(changes)
+        self._change(event_id, tuple(row[column] for column in self.columns))
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo(self):
+        """Desfaz a última alteração (evento, exclusão ou correção)."""
+        if self._undo:
+            event_id, before, after = self._undo.pop()
+            self._set(event_id, before)
+            self._redo.append((event_id, before, after))
+
+    def redo(self):
+        if self._redo:
+            event_id, before, after = self._redo.pop()
+            self._set(event_id, after)
+            self._undo.append((event_id, before, after))
+
+    def get(self, event_id):
+        """Evento como dict (None se foi excluído)."""
+        row = self._rows[event_id]
+        return dict(zip(self.columns, row)) if row is not None else None
+
+    def find(self, minute, player=None, event=None):
+        """Ids dos eventos do minuto, opcionalmente filtrados por jogador e evento, em ordem de registro."""
+        ids = []
+        for (key_player, key_event), key_ids in self._index.get(int(minute), {}).items():
+            if (player is None or key_player == player) and (event is None or key_event == event):
+                ids.extend(key_ids)
+        return sorted(ids)
+
+    def describe(self, event_id):
+        """Texto curto do evento para listas de seleção."""
+        event = self.get(event_id)
+        if event is None:
+            return "(excluído)"
+        label = event_label(event["Event"], event["Type"], event["SubType"])
+        return f"{event['Minute']}:{int(event['Second']):02d} · {event['Player']} · {label}"
+
+    def last_time(self):
+        """Tempo de jogo (segundos) do último evento registrado, ou 0."""
+        last = next((row for row in reversed(self._rows) if row is not None), None)
+        if last is None:
+            return 0
+        last = dict(zip(self.columns, last))
+        return int(last["Minute"]) * 60 + int(last["Second"])
+
+    def to_frame(self):
+        """DataFrame com todos os eventos (compartilhado: quem for alterar deve copiar)."""
+        if self._frame is None or self._frame[0] != self.version:
+            rows = [row for row in self._rows if row is not None]
+            self._frame = (self.version, pd.DataFrame.from_records(rows, columns=self.columns))
+        return self._frame[1]
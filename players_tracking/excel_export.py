@@ -0,0 +1,41 @@
+import io
+from datetime import datetime
+
+import xlsxwriter
+
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+def _write_sheet(workbook, name, frame, header_format, datetime_format):
+    # constant_memory só aceita escrita linha a linha (o to_excel do pandas escreve por coluna)
+    sheet = workbook.add_worksheet(name)
+    sheet.write_row(0, 0, [str(column) for column in frame.columns], header_format)
+    for row_number, row in enumerate(frame.itertuples(index=False, name=None), start=1):
+        for column_number, value in enumerate(row):
+            if isinstance(value, datetime):
+                sheet.write_datetime(row_number, column_number, value, datetime_format)
+            elif value is None or (isinstance(value, float) and value != value):
+                continue
+            else:
+                sheet.write(row_number, column_number, value)
+
+
+def workbook_bytes(sheets):
+    """
+    Arquivo .xlsx com uma aba por (nome, DataFrame), gravado com constant_memory: cada
+    linha vai para o arquivo temporário assim que é escrita, então a memória não
+    cresce com o tamanho da partida.
+    """
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True, 'border': 1})
+    datetime_format = workbook.add_format({'num_format': DATETIME_FORMAT})
+    for name, frame in sheets:
+        _write_sheet(workbook, name, frame, header_format, datetime_format)
+    workbook.close()
+    return output.getvalue()
+
+
+def player_stats(frame, index):
+    """Contagem de eventos por jogador (linhas `index`) e rótulo combinado (colunas), como o pivot_table 'size'."""
+    return frame.groupby(index + ['CombinedEvent']).size().unstack(fill_value=0).reset_index().rename_axis(columns=None)
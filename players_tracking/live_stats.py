@@ -0,0 +1,94 @@
+import threading
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+# Tamanho das janelas de tempo das estatísticas ao vivo (minutos)
+WINDOW_MINUTES = 15
+
+
+def event_label(event, event_type="", subtype=""):
+    """Rótulo combinado do evento ('Passe - Certo - Curto'), o mesmo usado nas colunas do Excel."""
+    return ' - '.join(str(part) for part in (event, event_type, subtype) if part)
+
+
+def event_labels(frame):
+    """`event_label` vetorizado para as colunas Event/Type/SubType de um DataFrame do log."""
+    labels = frame["Event"].fillna("").astype(str)
+    for column in ("Type", "SubType"):
+        part = frame[column].fillna("").astype(str)
+        labels = labels.where(part == "", labels + " - " + part)
+    return labels
+
+
+def window_label(window):
+    start = window * WINDOW_MINUTES
+    return f"{start}-{start + WINDOW_MINUTES}'"
+
+
+class LiveStats:
+    """
+    Contadores da partida mantidos a cada evento: por jogador x rótulo do evento, por
+    time x rótulo e por time x janela de 15 minutos. Acrescentar ou remover um evento
+    custa O(1) e os painéis ao vivo leem os contadores, sem percorrer o log; o custo
+    das tabelas depende só do número de jogadores e tipos de evento.
+    """
+
+    def __init__(self, columns, rows=()):
+        index = {column: i for i, column in enumerate(columns)}
+        self._team = index["Team"]
+        self._player = index["Player"]
+        self._minute = index["Minute"]
+        self._label = (index["Event"], index["Type"], index["SubType"])
+        self.lock = threading.Lock()
+        self.players = defaultdict(Counter)  # (time, jogador) -> rótulo -> n
+        self.teams = defaultdict(Counter)  # time -> rótulo -> n
+        self.windows = defaultdict(Counter)  # time -> janela -> n
+        self.total = 0
+        for row in rows:
+            self.add(row)
+
+    def _update(self, row, step):
+        team, player = row[self._team], row[self._player]
+        label = event_label(*(row[i] for i in self._label))
+        window = int(row[self._minute]) // WINDOW_MINUTES
+        with self.lock:
+            for counter, key in ((self.players[(team, player)], label), (self.teams[team], label), (self.windows[team], window)):
+                counter[key] += step
+                if counter[key] <= 0:
+                    del counter[key]
+            self.total += step
+
+    def add(self, row):
+        """Conta o evento (tupla na ordem das colunas do log)."""
+        self._update(row, 1)
+
+    def remove(self, row):
+        """Desconta um evento contado antes (desfazer)."""
+        self._update(row, -1)
+
+    def team_totals(self):
+        with self.lock:
+            return {team: sum(counter.values()) for team, counter in self.teams.items() if counter}
+
+    def team_table(self):
+        """Rótulos nas linhas, times nas colunas."""
+        with self.lock:
+            data = {team: dict(counter) for team, counter in self.teams.items() if counter}
+        return pd.DataFrame(data).fillna(0).astype(int).sort_index()
+
+    def window_table(self):
+        """Eventos por janela de 15 minutos (linhas) e time (colunas)."""
+        with self.lock:
+            data = {team: dict(counter) for team, counter in self.windows.items() if counter}
+        table = pd.DataFrame(data).fillna(0).astype(int).sort_index()
+        table.index = [window_label(window) for window in table.index]
+        return table
+
+    def player_keys(self):
+        with self.lock:
+            return sorted(key for key, counter in self.players.items() if counter)
+
+    def player_counts(self, team, player):
+        with self.lock:
+            return dict(self.players.get((team, player), {}))
@@ -0,0 +1,302 @@
+import bisect
+import itertools
+import os
+import re
+import threading
+import uuid
+
+import pandas as pd
+
+from event_journal import JOURNAL_DIR, EventJournal
+from event_log import EVENT_COLUMNS
+from live_stats import LiveStats, event_label
+
+
+class SharedMatch:
+    """
+    Eventos de uma partida marcados por vários taggers ao mesmo tempo.
+
+    Cada evento tem um id estável (tagger, nº do evento no tagger), então taggers
+    diferentes nunca disputam ids. Os eventos ficam ordenados pelo relógio da partida
+    (minuto, segundo; empate = ordem de chegada) à medida que chegam. Desfazer é uma
+    marca de remoção pelo id: não depende da ordem em que as operações chegam, repetir
+    não tem efeito e não afeta eventos de outros taggers. Com `journal`, eventos e
+    remoções também vão para o disco e a partida pode ser recarregada com `load`.
+    `stats` tem as estatísticas ao vivo de todos os taggers (remoções descontam).
+    """
+
+    def __init__(self, code, columns=EVENT_COLUMNS, journal=None):
+        self.code = code
+        self.columns = list(columns)
+        self.journal = journal
+        self.lock = threading.Lock()
+        self.version = 0
+        self._events = []  # (chave do relógio, id, linha), ordenados
+        self._ids = {}  # id -> linha
+        self._removed = set()
+        self._arrival = itertools.count()
+        self._clock = (self.columns.index("Minute"), self.columns.index("Second"))
+        self.stats = LiveStats(self.columns)
+        self._frame = None
+
+    def _insert(self, event_id, row):
+        minute, second = self._clock
+        key = (int(row[minute]), int(row[second]), next(self._arrival))
+        bisect.insort(self._events, (key, event_id, row))
+        self._ids[event_id] = row
+        self.stats.add(row)
+
+    def _remove(self, event_id):
+        self._removed.add(event_id)
+        self.stats.remove(self._ids[event_id])
+
+    def append(self, event_id, row):
+        with self.lock:
+            if event_id in self._ids:
+                return False
+            if self.journal is not None:
+                self.journal.write_record({'id': list(event_id), 'event': list(row)})
+            self._insert(event_id, tuple(row))
+            self.version += 1
+            return True
+
+    def remove(self, event_id):
+        """Marca o evento como removido. Retorna False se ele não existe ou já foi removido."""
+        with self.lock:
+            if event_id not in self._ids or event_id in self._removed:
+                return False
+            if self.journal is not None:
+                self.journal.write_record({'undo': list(event_id)})
+            self._remove(event_id)
+            self.version += 1
+            return True
+
+    def __len__(self):
+        return len(self._ids) - len(self._removed)
+
+    @property
+    def unsynced(self):
+        return self.journal is not None and self.journal.pending
+
+    def sync_if_due(self):
+        if self.journal is not None:
+            with self.lock:
+                self.journal.sync_if_due()
+
+    def events(self):
+        """(id, linha) dos eventos ativos, na ordem do relógio da partida."""
+        with self.lock:
+            return [(event_id, row) for _, event_id, row in self._events if event_id not in self._removed]
+
+    def get(self, event_id):
+        """Linha do evento, ou None se ele não existe ou foi removido."""
+        with self.lock:
+            return None if event_id in self._removed else self._ids.get(event_id)
+
+    def find(self, minute):
+        """Ids dos eventos ativos do minuto (busca binária na ordem do relógio)."""
+        with self.lock:
+            start = bisect.bisect_left(self._events, ((minute,),))
+            end = bisect.bisect_left(self._events, ((minute + 1,),))
+            return [event_id for _, event_id, _ in self._events[start:end] if event_id not in self._removed]
+
+    def to_frame(self):
+        """DataFrame dos eventos ativos na ordem do relógio (compartilhado entre os taggers: não alterar)."""
+        with self.lock:
+            if self._frame is None or self._frame[0] != self.version:
+                rows = [row for _, event_id, row in self._events if event_id not in self._removed]
+                self._frame = (self.version, pd.DataFrame.from_records(rows, columns=self.columns))
+            return self._frame[1]
+
+    @classmethod
+    def load(cls, code, path, columns=EVENT_COLUMNS):
+        """
+        Partida reconstruída a partir do journal (eventos e remoções); novos registros
+        continuam no arquivo. Um journal sem cabeçalho completo (queda antes do primeiro
+        evento) é descartado e a partida começa do zero com `columns`.
+        """
+        header, records = EventJournal.read(path)
+        if header is None:
+            os.remove(path)
+            app = os.path.splitext(os.path.basename(path))[0]
+            return cls(code, columns, EventJournal(path, columns, app))
+        match = cls(code, header['columns'])
+        for record in records:
+            if 'event' in record:
+                match._insert(tuple(record['id']), tuple(record['event']))
+            elif 'undo' in record and tuple(record['undo']) not in match._removed:
+                match._remove(tuple(record['undo']))
+        match.version = len(records)
+        match.journal = EventJournal(path, header['columns'], header.get('app', ''))
+        return match
+
+
+class MatchBroker:
+    """
+    Registro das partidas compartilhadas do servidor (uma instância por processo, via
+    st.cache_resource): taggers que entram com o mesmo código recebem o mesmo
+    SharedMatch. Com `persist=False` é um armazenamento só em memória, útil para testar
+    vários taggers localmente.
+    """
+
+    def __init__(self, journal_dir=None, persist=True):
+        self.journal_dir = journal_dir or JOURNAL_DIR
+        self.persist = persist
+        self.lock = threading.Lock()
+        self._matches = {}
+
+    @staticmethod
+    def match_key(code):
+        """Código usado como chave em memória e no nome do journal ("Jogo 1" e "Jogo_1" são a mesma partida)."""
+        return re.sub(r'[^0-9A-Za-z_-]+', '_', code.strip())
+
+    def _path(self, key):
+        return os.path.join(self.journal_dir, f"shared_{key}.jsonl")
+
+    def open(self, code, columns=EVENT_COLUMNS):
+        """Partida `code`: a que já está em memória, a gravada no journal ou uma nova."""
+        code = code.strip()
+        key = self.match_key(code)
+        with self.lock:
+            match = self._matches.get(key)
+            if match is None:
+                path = self._path(key)
+                if self.persist and os.path.exists(path):
+                    match = SharedMatch.load(code, path, columns)
+                else:
+                    journal = EventJournal(path, columns, f"shared_{key}") if self.persist else None
+                    match = SharedMatch(code, columns, journal)
+                self._matches[key] = match
+            return match
+
+
+class SharedEventLog:
+    """
+    Visão de um tagger sobre uma SharedMatch, com a mesma interface de EventLog (append,
+    remove, edit, undo/redo, find, to_frame, stats...).
+
+    Na partida compartilhada um evento nunca é alterado no lugar: excluir é a marca de
+    remoção e corrigir é remover + acrescentar a versão corrigida com um id novo. Assim
+    desfazer/refazer deste tagger também são só remoções e acréscimos e não entram em
+    conflito com o que os outros taggers fazem ao mesmo tempo.
+    """
+
+    def __init__(self, match, tagger_id=None):
+        self.match = match
+        self.tagger_id = tagger_id or uuid.uuid4().hex[:8]
+        self._next = itertools.count()
+        self._undo = []  # operação inversa: (id a remover, linha a acrescentar, id antigo dessa linha)
+        self._redo = []
+        self._moved = {}  # id removido -> id com que a mesma linha foi reacrescentada
+
+    @property
+    def columns(self):
+        return self.match.columns
+
+    @property
+    def version(self):
+        return self.match.version
+
+    @property
+    def stats(self):
+        return self.match.stats
+
+    def __len__(self):
+        return len(self.match)
+
+    @property
+    def empty(self):
+        return len(self.match) == 0
+
+    @property
+    def unsynced(self):
+        return self.match.unsynced
+
+    def sync_if_due(self):
+        self.match.sync_if_due()
+
+    def close(self):
+        """Nada a fechar: o journal é da partida compartilhada e continua aberto para os outros taggers."""
+
+    def _apply(self, remove_id, add_row, add_replaces=None):
+        """
+        Remove `remove_id` e/ou acrescenta `add_row`; retorna a operação inversa. Uma linha
+        reacrescentada ganha id novo, então operações antigas que apontam para o id que
+        ela tinha (`add_replaces`) passam a apontar para o novo.
+        """
+        while remove_id in self._moved:
+            remove_id = self._moved[remove_id]
+        removed_row = self.match.get(remove_id) if remove_id is not None else None
+        if removed_row is not None and not self.match.remove(remove_id):
+            removed_row = None  # outro tagger removeu antes
+        added_id = None
+        if add_row is not None:
+            added_id = (self.tagger_id, next(self._next))
+            self.match.append(added_id, add_row)
+            if add_replaces is not None:
+                self._moved[add_replaces] = added_id
+        return added_id, removed_row, remove_id
+
+    def _change(self, remove_id, add_row):
+        inverse = self._apply(remove_id, add_row)
+        self._undo.append(inverse)
+        self._redo.clear()
+        return inverse[0]
+
+    def append(self, event):
+        return self._change(None, tuple(event[column] for column in self.columns))
+
+    def remove(self, event_id):
+        self._change(event_id, None)
+
+    def edit(self, event_id, changes):
+        row = self.get(event_id)
+        if row is not None:
+            row.update(changes)
+            self._change(event_id, tuple(row[column] for column in self.columns))
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo(self):
+        if self._undo:
+            self._redo.append(self._apply(*self._undo.pop()))
+
+    def redo(self):
+        if self._redo:
+            self._undo.append(self._apply(*self._redo.pop()))
+
+    def get(self, event_id):
+        row = self.match.get(event_id)
+        return dict(zip(self.columns, row)) if row is not None else None
+
+    def find(self, minute, player=None, event=None):
+        """Ids dos eventos do minuto (de todos os taggers), opcionalmente filtrados por jogador e evento."""
+        ids = []
+        for event_id in self.match.find(int(minute)):
+            row = self.get(event_id)
+            if row is not None and (player is None or row["Player"] == player) and (event is None or row["Event"] == event):
+                ids.append(event_id)
+        return ids
+
+    def describe(self, event_id):
+        event = self.get(event_id)
+        if event is None:
+            return "(removido)"
+        label = event_label(event["Event"], event["Type"], event["SubType"])
+        return f"{event['Minute']}:{int(event['Second']):02d} · {event['Player']} · {label}"
+
+    def last_time(self):
+        events = self.match.events()
+        if not events:
+            return 0
+        last = dict(zip(self.columns, events[-1][1]))
+        return int(last["Minute"]) * 60 + int(last["Second"])
+
+    def to_frame(self):
+        return self.match.to_frame()
@@ -2,13 +2,19 @@ import streamlit as st
 import pandas as pd
 import time
 from datetime import datetime
-import io  # Importado para lidar com a exportação para Excel em memória
+from event_journal import list_journals
+from event_log import EventLog
+from excel_export import player_stats, workbook_bytes
+from live_stats import event_labels
+
+# Nome do app nos journals de partida (cada partida é gravada em disco para poder ser retomada)
+TRACKER_APP = "profutstat_analise_individual"
 
 # --- Inicialização Robusta do st.session_state ---
 # Cada variável é verificada individualmente para garantir que exista
 # Isso resolve o AttributeError que estava acontecendo em certas reruns do Streamlit
-if 'match_data' not in st.session_state:
-    st.session_state.match_data = pd.DataFrame(columns=[
+if 'event_log' not in st.session_state:
+    st.session_state.event_log = EventLog.with_journal(TRACKER_APP, [
         "Event", "Minute", "Second", "Team", "Player", "Type", "SubType", "Timestamp"
     ])
 
@@ -33,8 +39,8 @@ if 'current_possession' not in st.session_state:
 if 'possession_start' not in st.session_state:
     st.session_state.possession_start = None
 
-if 'possession_log' not in st.session_state:
-    st.session_state.possession_log = []
+if 'possession_seconds' not in st.session_state:
+    st.session_state.possession_seconds = {}  # tempo de posse acumulado por time
 
 if 'registered_players_a' not in st.session_state:
     st.session_state.registered_players_a = pd.DataFrame(columns=["Number", "Name"])
@@ -75,23 +81,21 @@ def reset_timer():
     Não reinicia os jogadores cadastrados por padrão, permitindo que persistam entre as partidas."""
     st.session_state.timer_start = None
     st.session_state.paused_time = 0
-    st.session_state.possession_log = []
+    st.session_state.possession_seconds = {}
     st.session_state.current_possession = None
     st.session_state.possession_start = None
-    st.session_state.match_data = pd.DataFrame(columns=[
+    st.session_state.event_log.close()
+    st.session_state.event_log = EventLog.with_journal(TRACKER_APP, [
         "Event", "Minute", "Second", "Team", "Player", "Type", "SubType", "Timestamp"
     ])
     st.rerun()
 
 def log_possession_duration():
-    """Registra a duração da posse atual para o time ativo."""
+    """Soma a duração da posse atual ao acumulado do time ativo."""
     if st.session_state.current_possession and st.session_state.possession_start:
         duration = time.time() - st.session_state.possession_start
-        st.session_state.possession_log.append({
-            "Team": st.session_state.current_possession,
-            "Start": st.session_state.possession_start,
-            "Duration": duration
-        })
+        team = st.session_state.current_possession
+        st.session_state.possession_seconds[team] = st.session_state.possession_seconds.get(team, 0.0) + duration
         st.session_state.possession_start = time.time() if st.session_state.timer_start else None
 
 def set_possession(team):
@@ -102,9 +106,9 @@ def set_possession(team):
     st.rerun()
 
 def calculate_possession():
-    """Calcula e retorna as porcentagens de posse para ambos os times."""
-    team_a_time = sum([p["Duration"] for p in st.session_state.possession_log if p["Team"] == st.session_state.team_a])
-    team_b_time = sum([p["Duration"] for p in st.session_state.possession_log if p["Team"] == st.session_state.team_b])
+    """Calcula e retorna as porcentagens de posse para ambos os times (O(1): usa os acumulados)."""
+    team_a_time = st.session_state.possession_seconds.get(st.session_state.team_a, 0.0)
+    team_b_time = st.session_state.possession_seconds.get(st.session_state.team_b, 0.0)
     
     if st.session_state.timer_start and st.session_state.current_possession and st.session_state.possession_start:
         current_duration = time.time() - st.session_state.possession_start
@@ -147,39 +151,53 @@ def record_event(event, team, player_number, event_type="", subtype=""):
         "Timestamp": time.time()
     }
     
-    st.session_state.match_data = pd.concat(
-        [st.session_state.match_data, pd.DataFrame([new_event])],
-        ignore_index=True
-    )
+    st.session_state.event_log.append(new_event)
     st.rerun()
 
+def undo_event():
+    st.session_state.event_log.undo()
+
+def redo_event():
+    st.session_state.event_log.redo()
+
+def remove_event(event_id):
+    st.session_state.event_log.remove(event_id)
+
+def correct_event(event_id):
+    """Aplica as correções digitadas no painel de correção ao evento `event_id`."""
+    st.session_state.event_log.edit(event_id, {
+        "Player": st.session_state[f"fix_player_{event_id}"],
+        "Minute": int(st.session_state[f"fix_minute_{event_id}"]),
+        "Second": int(st.session_state[f"fix_second_{event_id}"]),
+    })
+
 def generate_excel_by_player():
-    """Gera um arquivo Excel com estatísticas agregadas por jogador."""
-    df = st.session_state.match_data.copy()
+    """Gera um arquivo Excel com estatísticas agregadas por jogador (refeito só quando o log muda)."""
+    event_log = st.session_state.event_log
+    cached = st.session_state.get('excel_export')
+    if cached is not None and cached[0] is event_log and cached[1] == event_log.version:
+        return cached[2]
+    df = event_log.to_frame().copy()
     
-    # Criar uma coluna de evento combinado para usar como colunas no pivot
-    df['CombinedEvent'] = df['Event'].fillna('') + \
-                         df['Type'].apply(lambda x: f" - {x}" if x else "") + \
-                         df['SubType'].apply(lambda x: f" - {x}" if x else "")
+    # Criar uma coluna de evento combinado para usar como colunas da tabela (vetorizado)
+    df['CombinedEvent'] = event_labels(df)
 
-    # Usar pivot_table para transformar os dados
     # Cada jogador se torna uma linha, cada evento combinado uma coluna
-    player_stats_pivot = df.pivot_table(
-        index=['Player', 'Team'], 
-        columns='CombinedEvent', 
-        aggfunc='size', 
-        fill_value=0
-    )
-    
-    # Resetar o índice para que 'Player' e 'Team' se tornem colunas
-    player_stats_pivot = player_stats_pivot.reset_index()
+    player_stats_pivot = player_stats(df, ['Player', 'Team'])
 
-    # Criar um buffer de bytes para o arquivo Excel
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        player_stats_pivot.to_excel(writer, index=False, sheet_name='Stats por Jogador')
-    
-    return output.getvalue()
+    # Gravado linha a linha em modo constant_memory
+    excel_data = workbook_bytes([('Stats por Jogador', player_stats_pivot)])
+    st.session_state.excel_export = (event_log, event_log.version, excel_data)
+    return excel_data
+
+def resume_match(journal_path):
+    """Retoma uma partida gravada: eventos do journal e cronômetro pausado no último evento."""
+    st.session_state.event_log.close()
+    st.session_state.event_log = EventLog.resume(journal_path)
+    st.session_state.timer_start = None
+    st.session_state.paused_time = st.session_state.event_log.last_time() / st.session_state.playback_speed
+    st.session_state.current_possession = None
+    st.session_state.possession_start = None
 
 
 # ========== INTERFACE DO USUÁRIO: SEÇÃO DE CADASTRO DE JOGADORES ==========
@@ -271,22 +289,45 @@ with control_col3:
             st.session_state.registered_players_b = pd.DataFrame(columns=["Number", "Name"])
             st.rerun()
 
-time_col, poss_col_a, poss_col_b = st.columns([2,1,1])
-with time_col:
+with st.expander("💾 Retomar Partida Gravada"):
+    saved_matches = list_journals(TRACKER_APP)
+    if saved_matches:
+        saved_labels = {path: f"{header['created']:%d/%m %H:%M} · {n_events} eventos" for path, header, n_events in saved_matches}
+        resume_path = st.selectbox("Partida:", list(saved_labels), format_func=saved_labels.get, key="resume_path")
+        st.button("Retomar", key="resume_btn", on_click=resume_match, args=(resume_path,))
+    else:
+        st.caption("Nenhuma partida gravada ainda.")
+
+# Com o cronômetro rodando, só os fragmentos do relógio e da posse reexecutam a cada segundo
+# (também com ele parado, enquanto houver eventos no journal sem fsync)
+clock_refresh = 1 if st.session_state.timer_start or st.session_state.event_log.unsynced else None
+
+@st.fragment(run_every=clock_refresh)
+def match_clock():
+    st.session_state.event_log.sync_if_due()
     current_time = get_current_time()
     display_min = int(current_time // 60)
     display_sec = int(current_time % 60)
     st.metric("Tempo de Jogo", f"{display_min}:{display_sec:02d}")
 
-team_a_poss, team_b_poss = calculate_possession()
+@st.fragment(run_every=clock_refresh)
+def possession_metric(team_index):
+    """Percentual de posse do time A (0) ou B (1)."""
+    team = st.session_state.team_a if team_index == 0 else st.session_state.team_b
+    st.metric(f"Posse {team}", f"{calculate_possession()[team_index]:.1f}%")
+
+time_col, poss_col_a, poss_col_b = st.columns([2,1,1])
+with time_col:
+    match_clock()
+
 with poss_col_a:
     if st.button(f"🏃 Posse de {st.session_state.team_a}", use_container_width=True, key="poss_a_btn"):
         set_possession(st.session_state.team_a)
-    st.metric(f"Posse {st.session_state.team_a}", f"{team_a_poss:.1f}%")
+    possession_metric(0)
 with poss_col_b:
     if st.button(f"🏃 Posse de {st.session_state.team_b}", use_container_width=True, key="poss_b_btn"):
         set_possession(st.session_state.team_b)
-    st.metric(f"Posse {st.session_state.team_b}", f"{team_b_poss:.1f}%")
+    possession_metric(1)
 
 st.header("⚽ Ações da Partida (Por Jogador)")
 player_selection_col1, player_selection_col2 = st.columns(2)
@@ -431,16 +472,56 @@ with player_selection_col2:
     else:
         st.info("Selecione um jogador do Time Visitante para registrar ações.")
 
+# Correção de eventos (desfazer/refazer, corrigir e excluir)
+with st.expander("✏️ Corrigir Eventos"):
+    event_log = st.session_state.event_log
+    undo_col, redo_col = st.columns(2)
+    undo_col.button("↩️ Desfazer", key="undo_btn", on_click=undo_event, disabled=not event_log.can_undo, use_container_width=True)
+    redo_col.button("↪️ Refazer", key="redo_btn", on_click=redo_event, disabled=not event_log.can_redo, use_container_width=True)
+    fix_minute = st.number_input("Minuto do evento:", min_value=0, step=1, key="fix_minute")
+    fix_ids = event_log.find(fix_minute)
+    if fix_ids:
+        fix_id = st.selectbox("Evento:", fix_ids, format_func=event_log.describe, key="fix_event")
+        fix_event = event_log.get(fix_id)
+        fix_col1, fix_col2, fix_col3 = st.columns([3, 1, 1])
+        fix_col1.text_input("Jogador:", str(fix_event["Player"]), key=f"fix_player_{fix_id}")
+        fix_col2.number_input("Minuto", min_value=0, value=int(fix_event["Minute"]), step=1, key=f"fix_minute_{fix_id}")
+        fix_col3.number_input("Segundo", min_value=0, max_value=59, value=int(fix_event["Second"]), step=1, key=f"fix_second_{fix_id}")
+        save_col, remove_col = st.columns(2)
+        save_col.button("Salvar correção", key="fix_save_btn", on_click=correct_event, args=(fix_id,), use_container_width=True)
+        remove_col.button("Excluir evento", key="fix_remove_btn", on_click=remove_event, args=(fix_id,), use_container_width=True)
+    else:
+        st.caption("Nenhum evento neste minuto.")
+
+# Estatísticas ao vivo (lidas dos contadores do log, sem percorrer os eventos)
+st.header("📈 Estatísticas ao Vivo")
+live_stats = st.session_state.event_log.stats
+if live_stats.total:
+    team_totals = live_stats.team_totals()
+    for total_col, (team, n_events) in zip(st.columns(len(team_totals)), team_totals.items()):
+        total_col.metric(f"Eventos {team}", n_events)
+    stats_col1, stats_col2 = st.columns(2)
+    stats_col1.caption("Por tipo de evento")
+    stats_col1.dataframe(live_stats.team_table(), use_container_width=True)
+    stats_col2.caption("Por janela de 15 minutos")
+    stats_col2.dataframe(live_stats.window_table(), use_container_width=True)
+    live_player = st.selectbox("Jogador:", live_stats.player_keys(), format_func=lambda key: f"{key[1]} ({key[0]})", key="live_stats_player")
+    if live_player:
+        st.dataframe(pd.Series(live_stats.player_counts(*live_player), name="Eventos"), use_container_width=True)
+else:
+    st.info("As estatísticas aparecem a partir do primeiro evento.")
+
 # 5. Seção de Relatórios de Dados
 st.header("📊 Relatório da Partida")
-if not st.session_state.match_data.empty:
-    st.dataframe(st.session_state.match_data.sort_values(["Minute", "Second"]), use_container_width=True)
+if not st.session_state.event_log.empty:
+    match_data = st.session_state.event_log.to_frame()
+    st.dataframe(match_data.sort_values(["Minute", "Second"]), use_container_width=True)
     
     export_col1, export_col2 = st.columns(2)
     
     with export_col1:
         # Botão para exportar o log de eventos brutos (como antes)
-        csv_full = st.session_state.match_data.to_csv(index=False).encode('utf-8')
+        csv_full = match_data.to_csv(index=False).encode('utf-8')
         st.download_button(
            label="Exportar Log de Eventos (CSV)",
            data=csv_full,
@@ -464,8 +545,3 @@ if not st.session_state.match_data.empty:
 
 else:
     st.info("Nenhum evento registrado ainda. Cadastre jogadores e inicie o tracking!")
-
-# Auto-atualização para o timer a cada segundo se estiver rodando
-if st.session_state.timer_start:
-    time.sleep(1)
-    st.rerun()
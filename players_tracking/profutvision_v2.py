@@ -3,13 +3,20 @@ import pandas as pd
 import time
 from datetime import datetime
 import io
+from event_journal import list_journals
+from event_log import EventLog
+from excel_export import player_stats, workbook_bytes
+from live_stats import event_labels
+
+# Nome do app nos journals de partida (cada partida é gravada em disco para poder ser retomada)
+TRACKER_APP = "profutvision_v2"
 
 # --- CONFIGURAÇÃO DA PÁGINA E INICIALIZAÇÃO DO ESTADO ---
 st.set_page_config(layout="wide", page_title="Scout Match Tracker (Um Time)")
 
 # Dicionário para inicialização limpa e completa do session_state
 initial_state = {
-    'match_data': pd.DataFrame(columns=["Event", "Minute", "Second", "Team", "Player", "Type", "SubType", "Timestamp", "Observation"]),
+    'event_log': EventLog.with_journal(TRACKER_APP, ["Event", "Minute", "Second", "Team", "Player", "Type", "SubType", "Timestamp", "Observation"]),
     'main_team_name': "Meu Time", # Renomeado para 'main_team_name'
     'opponent_team_name': "Time Oponente", # Adicionado para referência, mas sem funcionalidade ativa de scout
     'timer_start': None,
@@ -46,6 +53,7 @@ def pause_timer():
         st.session_state.possession_start_time = 0
 
 def reset_timer():
+    st.session_state.event_log.close()
     for key, value in initial_state.items():
         st.session_state[key] = value # Reseta todo o session_state para os valores iniciais
     st.rerun()
@@ -82,29 +90,52 @@ def record_event(event, player_number, event_type="", subtype="", observation=""
         "Timestamp": datetime.now(), "Observation": observation
     }
     
-    st.session_state.match_data = pd.concat(
-        [st.session_state.match_data, pd.DataFrame([new_event])], ignore_index=True
-    )
+    st.session_state.event_log.append(new_event)
     # st.rerun() # Removed rerun here to allow for multiple clicks without immediate reload
 
+def resume_match(journal_path):
+    """Retoma uma partida gravada: eventos do journal e cronômetro pausado no último evento."""
+    st.session_state.event_log.close()
+    st.session_state.event_log = EventLog.resume(journal_path)
+    st.session_state.timer_start = None
+    st.session_state.paused_time = st.session_state.event_log.last_time()
+    st.session_state.possession_start_time = 0
+
+def undo_event():
+    st.session_state.event_log.undo()
+
+def redo_event():
+    st.session_state.event_log.redo()
+
+def remove_event(event_id):
+    st.session_state.event_log.remove(event_id)
+
+def correct_event(event_id):
+    """Aplica as correções digitadas no painel de correção ao evento `event_id`."""
+    st.session_state.event_log.edit(event_id, {
+        "Player": st.session_state[f"fix_player_{event_id}"],
+        "Minute": int(st.session_state[f"fix_minute_{event_id}"]),
+        "Second": int(st.session_state[f"fix_second_{event_id}"]),
+    })
+
 def generate_excel_by_player():
-    if st.session_state.match_data.empty:
+    if st.session_state.event_log.empty:
         return io.BytesIO().getvalue()
-    df = st.session_state.match_data.copy()
-    df['CombinedEvent'] = df.apply(lambda row: ' - '.join(filter(None, [row['Event'], str(row['Type']), str(row['SubType'])])), axis=1)
+    event_log = st.session_state.event_log
+    # O workbook só é refeito quando o log muda (mesmo log, mesma versão = mesmo arquivo)
+    cached = st.session_state.get('excel_export')
+    if cached is not None and cached[0] is event_log and cached[1] == event_log.version:
+        return cached[2]
+    df = event_log.to_frame().copy()
+    df['CombinedEvent'] = event_labels(df)
     
     # Adicionando 'Observation' ao DataFrame para exportação, mas não no pivot de stats por evento
     df_export = df[['Minute', 'Second', 'Team', 'Player', 'CombinedEvent', 'Observation', 'Timestamp']]
+    player_stats_pivot = player_stats(df, ['Player', 'Team'])
     
-    player_stats_pivot = pd.pivot_table(
-        df, index=['Player', 'Team'], columns='CombinedEvent', aggfunc='size', fill_value=0
-    ).reset_index()
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df_export.to_excel(writer, index=False, sheet_name='Log Completo de Eventos')
-        player_stats_pivot.to_excel(writer, index=False, sheet_name='Stats por Jogador')
-    return output.getvalue()
+    excel_data = workbook_bytes([('Log Completo de Eventos', df_export), ('Stats por Jogador', player_stats_pivot)])
+    st.session_state.excel_export = (event_log, event_log.version, excel_data)
+    return excel_data
 
 def select_player_for_actions(player_num):
     st.session_state.selected_player_for_actions = player_num
@@ -162,31 +193,54 @@ with st.sidebar:
                     else: st.warning(f"Nº {player_num} já existe.")
         st.dataframe(st.session_state.registered_players.sort_values(by="Number", key=lambda x: pd.to_numeric(x, errors='coerce')), use_container_width=True, hide_index=True)
 
+    with st.expander("💾 Retomar Partida Gravada"):
+        saved_matches = list_journals(TRACKER_APP)
+        if saved_matches:
+            saved_labels = {path: f"{header['created']:%d/%m %H:%M} · {n_events} eventos" for path, header, n_events in saved_matches}
+            resume_path = st.selectbox("Partida:", list(saved_labels), format_func=saved_labels.get, key="resume_path")
+            st.button("Retomar", key="resume_btn", on_click=resume_match, args=(resume_path,), use_container_width=True)
+        else:
+            st.caption("Nenhuma partida gravada ainda.")
+
 # ========== LAYOUT PRINCIPAL DA INTERFACE ==========
 st.title("⚽ Scout Match Tracker (Um Time)")
 
 # --- Controles de Tempo e Posse ---
 st.markdown("---")
-current_time = get_current_time()
-display_min = int(current_time // 60)
-display_sec = int(current_time % 60)
+# Com o cronômetro rodando, só os fragmentos do relógio e da posse reexecutam a cada segundo
+# (também com ele parado, enquanto houver eventos no journal sem fsync)
+clock_refresh = 1 if st.session_state.timer_start or st.session_state.event_log.unsynced else None
+
+@st.fragment(run_every=clock_refresh)
+def match_clock():
+    st.session_state.event_log.sync_if_due()
+    current_time = get_current_time()
+    display_min = int(current_time // 60)
+    display_sec = int(current_time % 60)
+    st.metric("Tempo", f"{display_min}:{display_sec:02d}")
+
+@st.fragment(run_every=clock_refresh)
+def possession_panel():
+    current_time = get_current_time()
+    update_possession_time() # Garante que a posse é atualizada antes de exibir
+    total_game_time = max(1, current_time) # Evita divisão por zero
+    perc_main_team = (st.session_state.main_team_possession_seconds / total_game_time * 100) if total_game_time > 0 else 0
+    perc_opponent_team = 100 - perc_main_team
+
+    col_pos1, col_pos2, col_pos3 = st.columns(3)
+    col_pos1.metric(f"Posse {st.session_state.main_team_name}", f"{perc_main_team:.0f}%", delta_color="off")
+    col_pos2.metric(f"Posse {st.session_state.opponent_team_name}", f"{perc_opponent_team:.0f}%", delta_color="off")
+    col_pos3.empty() # Placeholder para balancear
 
 col_metric, col_start, col_pause, col_reset = st.columns([1.5, 1, 1, 1])
-col_metric.metric("Tempo", f"{display_min}:{display_sec:02d}")
+with col_metric:
+    match_clock()
 col_start.button("▶️ Iniciar", use_container_width=True, on_click=start_timer, disabled=st.session_state.timer_start is not None)
 col_pause.button("⏸️ Pausar", use_container_width=True, on_click=pause_timer, disabled=st.session_state.timer_start is None)
 col_reset.button("🔄 Resetar", use_container_width=True, on_click=reset_timer)
 
 st.markdown("##### Posse de Bola")
-update_possession_time() # Garante que a posse é atualizada antes de exibir
-total_game_time = max(1, current_time) # Evita divisão por zero
-perc_main_team = (st.session_state.main_team_possession_seconds / total_game_time * 100) if total_game_time > 0 else 0
-perc_opponent_team = 100 - perc_main_team
-
-col_pos1, col_pos2, col_pos3 = st.columns(3)
-col_pos1.metric(f"Posse {st.session_state.main_team_name}", f"{perc_main_team:.0f}%", delta_color="off")
-col_pos2.metric(f"Posse {st.session_state.opponent_team_name}", f"{perc_opponent_team:.0f}%", delta_color="off")
-col_pos3.empty() # Placeholder para balancear
+possession_panel()
 
 pos_btn_c1, pos_btn_c2 = st.columns(2)
 pos_btn_c1.button(f"Posse: {st.session_state.main_team_name}", key="pos_main", use_container_width=True, on_click=set_possession, args=('main_team',), type="primary" if st.session_state.possession_team_active == 'main_team' else "secondary")
@@ -272,20 +326,57 @@ with st.form("observation_form", clear_on_submit=True):
             st.success("Observação registrada!")
         st.rerun() # Rerun after submitting an observation
 
+# --- Correção de Eventos (desfazer/refazer, corrigir e excluir) ---
+st.markdown("---")
+with st.expander("✏️ Corrigir Eventos"):
+    event_log = st.session_state.event_log
+    undo_col, redo_col = st.columns(2)
+    undo_col.button("↩️ Desfazer", key="undo_btn", on_click=undo_event, disabled=not event_log.can_undo, use_container_width=True)
+    redo_col.button("↪️ Refazer", key="redo_btn", on_click=redo_event, disabled=not event_log.can_redo, use_container_width=True)
+    fix_minute = st.number_input("Minuto do evento:", min_value=0, step=1, key="fix_minute")
+    fix_ids = event_log.find(fix_minute)
+    if fix_ids:
+        fix_id = st.selectbox("Evento:", fix_ids, format_func=event_log.describe, key="fix_event")
+        fix_event = event_log.get(fix_id)
+        fix_col1, fix_col2, fix_col3 = st.columns([3, 1, 1])
+        fix_col1.text_input("Jogador:", str(fix_event["Player"]), key=f"fix_player_{fix_id}")
+        fix_col2.number_input("Minuto", min_value=0, value=int(fix_event["Minute"]), step=1, key=f"fix_minute_{fix_id}")
+        fix_col3.number_input("Segundo", min_value=0, max_value=59, value=int(fix_event["Second"]), step=1, key=f"fix_second_{fix_id}")
+        save_col, remove_col = st.columns(2)
+        save_col.button("Salvar correção", key="fix_save_btn", on_click=correct_event, args=(fix_id,), use_container_width=True)
+        remove_col.button("Excluir evento", key="fix_remove_btn", on_click=remove_event, args=(fix_id,), use_container_width=True)
+    else:
+        st.caption("Nenhum evento neste minuto.")
+
+# --- Estatísticas ao Vivo (lidas dos contadores do log, sem percorrer os eventos) ---
+st.markdown("---")
+with st.expander("📈 Estatísticas ao Vivo", expanded=True):
+    live_stats = st.session_state.event_log.stats
+    if live_stats.total:
+        team_totals = live_stats.team_totals()
+        for total_col, (team, n_events) in zip(st.columns(len(team_totals)), team_totals.items()):
+            total_col.metric(f"Eventos {team}", n_events)
+        stats_col1, stats_col2 = st.columns(2)
+        stats_col1.caption("Por tipo de evento")
+        stats_col1.dataframe(live_stats.team_table(), use_container_width=True)
+        stats_col2.caption("Por janela de 15 minutos")
+        stats_col2.dataframe(live_stats.window_table(), use_container_width=True)
+        live_player = st.selectbox("Jogador:", live_stats.player_keys(), format_func=lambda key: f"{key[1]} ({key[0]})", key="live_stats_player")
+        if live_player:
+            st.dataframe(pd.Series(live_stats.player_counts(*live_player), name="Eventos"), use_container_width=True)
+    else:
+        st.info("As estatísticas aparecem a partir do primeiro evento.")
+
 # --- Seção de Relatórios e Log ---
 st.markdown("---")
 with st.expander("📊 Ver Log de Eventos e Exportar Dados", expanded=True): # Expander aberto por padrão
-    if not st.session_state.match_data.empty:
-        st.dataframe(st.session_state.match_data.sort_values(["Minute", "Second"], ascending=[False, False]), use_container_width=True, hide_index=True)
+    if not st.session_state.event_log.empty:
+        match_data = st.session_state.event_log.to_frame()
+        st.dataframe(match_data.sort_values(["Minute", "Second"], ascending=[False, False]), use_container_width=True, hide_index=True)
         export_col1, export_col2 = st.columns(2)
-        csv_full = st.session_state.match_data.to_csv(index=False).encode('utf-8')
+        csv_full = match_data.to_csv(index=False).encode('utf-8')
         export_col1.download_button("Exportar Log (CSV)", csv_full, f"log_eventos_{datetime.now():%Y%m%d_%H%M%S}.csv", "text/csv", use_container_width=True)
         excel_data = generate_excel_by_player()
         export_col2.download_button("Exportar Stats (Excel)", excel_data, f"relatorio_jogador_{datetime.now():%Y%m%d_%H%M%S}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
     else:
         st.info("Nenhum evento registrado ainda.")
-
-# --- Atualização Contínua do Cronômetro ---
-if st.session_state.timer_start:
-    time.sleep(1)
-    st.rerun()
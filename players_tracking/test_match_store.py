@@ -0,0 +1,100 @@
+from match_store import MatchBroker, SharedEventLog, SharedMatch
+
+
+def make_event(minute, second, player="#10 Fulano", event="Passe", team="Time A"):
+    return {
+        "Event": event, "Minute": minute, "Second": second, "Team": team, "Player": player,
+        "Type": "Certo", "SubType": "", "Timestamp": None, "Observation": "",
+    }
+
+
+def shared_logs():
+    match = MatchBroker(persist=False).open("Jogo 1")
+    return match, SharedEventLog(match, "a"), SharedEventLog(match, "b")
+
+
+def test_taggers_merge_in_clock_order():
+    match, tagger_a, tagger_b = shared_logs()
+    tagger_a.append(make_event(10, 5, player="#1"))
+    tagger_b.append(make_event(2, 30, player="#2"))
+    tagger_a.append(make_event(2, 30, player="#3"))
+    tagger_b.append(make_event(0, 45, player="#4"))
+
+    assert list(match.to_frame()["Player"]) == ["#4", "#2", "#3", "#1"]
+    assert tagger_a.find(2) == [("b", 0), ("a", 1)]
+    assert tagger_b.last_time() == 10 * 60 + 5
+
+
+def test_same_code_is_the_same_match():
+    broker = MatchBroker(persist=False)
+    assert broker.open("Jogo 1") is broker.open(" Jogo_1 ")
+
+
+def test_undo_redo_and_edit_only_tombstone_and_append():
+    match, tagger_a, tagger_b = shared_logs()
+    first = tagger_a.append(make_event(1, 0))
+    other = tagger_b.append(make_event(1, 10, player="#7"))
+
+    tagger_a.edit(first, {"Player": "#9"})
+    assert match.get(first) is None
+    assert first in match._ids  # a linha original continua lá, só marcada como removida
+    [edited] = [event_id for event_id in tagger_a.find(1) if event_id != other]
+    assert edited != first and tagger_a.get(edited)["Player"] == "#9"
+
+    tagger_a.undo()  # desfaz a correção: remove a nova versão e reacrescenta a original
+    assert match.get(edited) is None
+    assert sorted(row[4] for _, row in match.events()) == ["#10 Fulano", "#7"]
+
+    tagger_a.redo()
+    assert sorted(row[4] for _, row in match.events()) == ["#7", "#9"]
+
+    tagger_a.undo()
+    tagger_a.undo()  # desfaz o primeiro evento; o do outro tagger fica
+    assert [event_id for event_id, _ in match.events()] == [other]
+    assert len(match._ids) == len(match._removed) + 1
+
+
+def test_stats_follow_undo():
+    match, tagger_a, tagger_b = shared_logs()
+    tagger_a.append(make_event(1, 0))
+    tagger_b.append(make_event(2, 0))
+    tagger_b.append(make_event(20, 0, event="Chute", team="Time B", player="#11"))
+    assert match.stats.team_totals() == {"Time A": 2, "Time B": 1}
+
+    tagger_b.undo()
+    assert match.stats.total == 2
+    assert match.stats.team_totals() == {"Time A": 2}
+    assert match.stats.player_counts("Time A", "#10 Fulano") == {"Passe - Certo": 2}
+    assert list(match.stats.window_table().index) == ["0-15'"]
+
+    tagger_a.undo()
+    assert match.stats.player_counts("Time A", "#10 Fulano") == {"Passe - Certo": 1}
+
+
+def test_load_replays_undo(tmp_path):
+    broker = MatchBroker(str(tmp_path))
+    match = broker.open("Jogo 1")
+    tagger_a, tagger_b = SharedEventLog(match, "a"), SharedEventLog(match, "b")
+    tagger_a.append(make_event(3, 0, player="#1"))
+    tagger_b.append(make_event(1, 0, player="#2"))
+    tagger_a.append(make_event(2, 0, player="#3"))
+    tagger_a.undo()
+    tagger_b.remove(("a", 0))
+    match.journal.close()
+
+    loaded = SharedMatch.load("Jogo 1", match.journal.path)
+    assert [event_id for event_id, _ in loaded.events()] == [("b", 0)]
+    assert loaded.stats.total == 1
+    assert loaded.version == match.version
+
+    loaded.append(("c", 0), tuple(make_event(4, 0).values()))
+    loaded.journal.close()
+    assert len(SharedMatch.load("Jogo 1", match.journal.path)) == 2
+
+
+def test_load_without_header_starts_fresh(tmp_path):
+    path = tmp_path / "shared_Jogo_1.jsonl"
+    path.write_text('{"app": "shared_Jo')
+    match = MatchBroker(str(tmp_path)).open("Jogo 1")
+    assert len(match) == 0
+    assert not path.exists()
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import tempfile
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+# Diretório do cache local (sobrevive a reinícios do servidor); pode ser trocado pela variável de ambiente
+CACHE_DIR = os.environ.get('PROFUTSTAT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'profutstat_cache'))
+TIMEOUT_REQUISICAO = 30
+
+
+def _caminhos(url, cache_dir):
+    chave = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f'{chave}.parquet'), os.path.join(cache_dir, f'{chave}.json')
+
+
+def _ler_meta(caminho_meta):
+    try:
+        with open(caminho_meta, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_atomico(caminho, gravar):
+    """Grava em arquivo temporário no mesmo diretório e troca de uma vez (leitores nunca veem arquivo pela metade)."""
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    os.close(descritor)
+    try:
+        gravar(temporario)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+def read_csv_cached(url, preparar=None, versao=1, cache_dir=None):
+    """
+    Lê o CSV de `url` usando um cache em disco (Parquet) chaveado pela URL.
+
+    A cada chamada é feita uma requisição condicional (If-None-Match / If-Modified-Since
+    com o ETag / Last-Modified guardados): se o arquivo não mudou (304), o Parquet local é
+    lido direto, já tipado; se mudou, o CSV é baixado, passado por `preparar(df)` (conversão
+    de tipos, datas, limpeza) e salvo como Parquet para as próximas leituras. Trocar `versao`
+    invalida o cache quando `preparar` muda. Sem rede, o cache local é usado se existir.
+    Caminhos locais (não URL) são lidos direto, sem cache.
+    """
+    if not str(url).startswith(('http://', 'https://')):
+        df = pd.read_csv(url)
+        return preparar(df) if preparar else df
+
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    caminho_parquet, caminho_meta = _caminhos(url, cache_dir)
+    meta = _ler_meta(caminho_meta)
+    if meta is not None and (meta.get('versao') != versao or not os.path.exists(caminho_parquet)):
+        meta = None
+
+    requisicao = urllib.request.Request(url)
+    if meta is not None:
+        if meta.get('etag'):
+            requisicao.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            requisicao.add_header('If-Modified-Since', meta['last_modified'])
+
+    try:
+        with urllib.request.urlopen(requisicao, timeout=TIMEOUT_REQUISICAO) as resposta:
+            df = pd.read_csv(resposta)
+            etag, last_modified = resposta.headers.get('ETag'), resposta.headers.get('Last-Modified')
+    except urllib.error.HTTPError as erro:
+        if erro.code == 304 and meta is not None:
+            return pd.read_parquet(caminho_parquet)
+        raise
+    except (urllib.error.URLError, TimeoutError):
+        if meta is not None:  # Sem conexão: última versão baixada
+            return pd.read_parquet(caminho_parquet)
+        raise
+
+    if preparar:
+        df = preparar(df)
+    _gravar_atomico(caminho_parquet, lambda destino: df.to_parquet(destino, index=False))
+    novo_meta = {'url': url, 'versao': versao, 'etag': etag, 'last_modified': last_modified}
+    _gravar_atomico(caminho_meta, lambda destino: _gravar_json(destino, novo_meta))
+    return df
+
+
+def _gravar_json(destino, conteudo):
+    with open(destino, 'w', encoding='utf-8') as arquivo:
+        json.dump(conteudo, arquivo)
@@ -1,8 +1,15 @@
+import uuid
+
 import streamlit as st
 import pandas as pd
-from fpdf import FPDF
+import numpy as np
 from io import BytesIO
-from itertools import product 
+from csv_cache import read_csv_cached
+from performance_aggregates import CollectiveAggregates, IndividualAggregates
+from performance_trends import JANELA_TENDENCIA, SPAN_EWM
+from performance_reports import (
+    create_bulk_reports_pdf, create_bulk_reports_zip, create_pdf_report_generic, report_file_name, safe_file_name
+)
 
 # --- Configuração da Página ---
 st.set_page_config(layout="centered", page_title="Dashboard de Performance")
@@ -43,17 +50,23 @@ PROFUTSTAT_LOGO_URL = "https://raw.githubusercontent.com/rafacstein/profutstat/m
 SAO_BENTO_LOGO_URL = "https://raw.githubusercontent.com/rafacstein/profutstat/main/scouting/ec_sao_bento.png"
 
 
+# Intervalo para buscar novamente os CSVs (jogos novos entram nos agregados de forma incremental)
+INTERVALO_ATUALIZACAO_CSV = 10 * 60
+
 # --- Funções de Carregamento de Dados ---
-@st.cache_data
-def load_individual_data(url):
-    df = pd.read_csv(url)
+# Os CSVs ficam em cache local como Parquet já tipado; após um reinício, ou quando o arquivo
+# no GitHub não mudou (ETag), a carga é só a leitura do Parquet. Incrementar a versão ao mudar o preparo.
+VERSAO_CACHE_INDIVIDUAL = 1
+VERSAO_CACHE_COLETIVO = 1
+
+def _prepare_individual_data(df):
     df['Timestamp'] = pd.to_datetime(df['Timestamp'])
     df['Evento descrição'] = df['Evento descrição'].str.strip()
+    for coluna in ('Minute', 'Second', 'Count'):
+        df[coluna] = pd.to_numeric(df[coluna], errors='coerce').fillna(0).astype('int64')
     return df
 
-@st.cache_data
-def load_collective_data(url):
-    df = pd.read_csv(url)
+def _prepare_collective_data(df):
     if 'Timestamp' in df.columns: 
         df['Timestamp'] = pd.to_datetime(df['Timestamp'])
     df['Evento'] = df['Evento'].str.strip() 
@@ -61,6 +74,16 @@ def load_collective_data(url):
     df['Fora'] = pd.to_numeric(df['Fora'], errors='coerce')
     return df
 
+# Os loaders retornam (DataFrame, id da carga): o id só muda quando o cache expira e o
+# CSV é lido de novo, então os agregados não recomparam os mesmos dados a cada rerun
+@st.cache_data(ttl=INTERVALO_ATUALIZACAO_CSV)
+def load_individual_data(url):
+    return read_csv_cached(url, _prepare_individual_data, versao=VERSAO_CACHE_INDIVIDUAL), uuid.uuid4().hex
+
+@st.cache_data(ttl=INTERVALO_ATUALIZACAO_CSV)
+def load_collective_data(url):
+    return read_csv_cached(url, _prepare_collective_data, versao=VERSAO_CACHE_COLETIVO), uuid.uuid4().hex
+
 # --- Definição da Natureza de Cada Evento (Positiva/Negativa) ---
 EVENTO_NATUREZA_CONFIG_INDIVIDUAL = {
     'Passe Certo Curto': False, 'Passe Certo Longo': False, 'Passe Errado Curto': True, 
@@ -82,6 +105,9 @@ EVENTO_LISTA_COLETIVA = [
     'Passes Errados', '% de Posse de bola', 
 ]
 
+# Eventos coletivos na ordem de exibição (alfabética)
+EVENTOS_COLETIVOS = sorted(EVENTO_LISTA_COLETIVA)
+
 # --- ORDEM DE EXIBIÇÃO PERSONALIZADA PARA ESTATÍSTICAS INDIVIDUAIS ---
 INDIVIDUAL_EVENT_DISPLAY_ORDER = [
     'Gol', 'Finalização No Alvo', 'Finalização Fora do Alvo',
@@ -94,39 +120,42 @@ INDIVIDUAL_EVENT_DISPLAY_ORDER = [
     'Duelo Aéreo Ganho', 'Duelo Aéreo Perdido',
 ]
 
-# --- Função de Pré-processamento para Médias Individuais ---
-@st.cache_data
-def preprocess_individual_data_for_averages(df_raw_individual):
-    df_raw_individual['Evento descrição'] = df_raw_individual['Evento descrição'].str.strip()
-
-    all_players = df_raw_individual['Player'].unique().tolist()
-    all_games_individual = df_raw_individual['Jogo'].unique().tolist()
-    all_event_descriptions = df_raw_individual['Evento descrição'].unique().tolist()
-    
-    actual_player_game_pairs = df_raw_individual[['Player', 'Jogo']].drop_duplicates()
-    
-    all_relevant_combinations = pd.DataFrame(list(product(
-        actual_player_game_pairs['Player'].unique(), 
-        actual_player_game_pairs['Jogo'].unique(),   
-        all_event_descriptions
-    )), columns=['Player', 'Jogo', 'Evento descrição'])
-    
-    df_grouped_per_event_per_game = df_raw_individual.groupby(
-        ['Jogo', 'Player', 'Evento descrição']
-    )['Count'].sum().reset_index()
-
-    df_full_individual_counts = pd.merge(
-        all_relevant_combinations, 
-        df_grouped_per_event_per_game, 
-        on=['Jogo', 'Player', 'Evento descrição'], 
-        how='left'
-    )
-    df_full_individual_counts['Count'].fillna(0, inplace=True)
-
-    player_overall_averages_corrected = df_full_individual_counts.groupby(['Player', 'Evento descrição'])['Count'].mean().reset_index()
-    player_overall_averages_corrected.rename(columns={'Count': 'Média'}, inplace=True)
-    
-    return df_grouped_per_event_per_game, player_overall_averages_corrected
+# Eventos individuais já na ordem de exibição, com a natureza (negativo) alinhada como vetor
+EVENTOS_INDIVIDUAIS = [e for e in INDIVIDUAL_EVENT_DISPLAY_ORDER if e in EVENTO_NATUREZA_CONFIG_INDIVIDUAL]
+EVENTOS_INDIVIDUAIS_NEGATIVOS = np.array([EVENTO_NATUREZA_CONFIG_INDIVIDUAL[e] for e in EVENTOS_INDIVIDUAIS])
+
+# --- Agregados Individuais (somas por jogo e médias por jogo disputado) ---
+@st.cache_resource
+def load_individual_aggregates():
+    # Compartilhado entre sessões; cada sincronização só processa os jogos novos/alterados
+    return IndividualAggregates()
+
+def preprocess_individual_data_for_averages(df_raw_individual, carga):
+    """
+    Retorna (counts, averages): matriz (Jogo, Player) x evento e matriz Player x evento com
+    a média por jogo disputado, ambas com as colunas em EVENTOS_INDIVIDUAIS.
+    """
+    aggregates = load_individual_aggregates()
+    aggregates.sync(df_raw_individual, carga)
+    return aggregates.matrices(EVENTOS_INDIVIDUAIS)
+
+def get_individual_trends():
+    """Tendências (últimos N, EWM, z-scores, forma) de todo o elenco, calculadas uma vez por versão dos dados."""
+    return load_individual_aggregates().trends(EVENTOS_INDIVIDUAIS, EVENTOS_INDIVIDUAIS_NEGATIVOS, JANELA_TENDENCIA, SPAN_EWM)
+
+# --- Agregados Coletivos (jogo x evento x Casa/Fora e resumos da temporada) ---
+# Janela da média móvel de posse de bola na visão da temporada
+JANELA_POSSE = 3
+
+@st.cache_resource
+def load_collective_aggregates():
+    # Compartilhado entre sessões; cada sincronização só pivota os jogos novos/alterados
+    return CollectiveAggregates(EVENTOS_COLETIVOS)
+
+def preprocess_collective_data(df_collective_raw, carga):
+    aggregates = load_collective_aggregates()
+    aggregates.sync(df_collective_raw, carga)
+    return aggregates
 
 # REMOVIDO: Função de pré-processamento para média coletiva não é mais necessária
 # @st.cache_data
@@ -139,62 +168,38 @@ def preprocess_individual_data_for_averages(df_raw_individual):
 
 # --- Funções de Cálculo de Performance ---
 
-def get_performance_data_individual(player_name, game_name, df_grouped_data, overall_averages_data):
-    comparison_list = []
+def get_performance_data_individual(player_name, game_name, counts_by_game_player, averages_by_player):
     epsilon = 0.01 
+    no_events = np.zeros(len(EVENTOS_INDIVIDUAIS))
 
-    for event_name, is_negative_event in EVENTO_NATUREZA_CONFIG_INDIVIDUAL.items():
-        current_val_series = df_grouped_data[
-            (df_grouped_data['Jogo'] == game_name) &
-            (df_grouped_data['Player'] == player_name) &
-            (df_grouped_data['Evento descrição'] == event_name) 
-        ]['Count']
-        current_val = current_val_series.iloc[0] if not current_val_series.empty else 0
-
-        avg_val_series = overall_averages_data[
-            (overall_averages_data['Player'] == player_name) &
-            (overall_averages_data['Evento descrição'] == event_name) 
-        ]['Média']
-        avg_val = avg_val_series.iloc[0] if not avg_val_series.empty else 0
-
-        indicator_text_raw = "Mantém (—)" 
-        indicator_text_pdf = "Mantém (-)" 
-
-        if abs(current_val - avg_val) < epsilon: 
-            indicator_text_raw = "Mantém (—)"
-            indicator_text_pdf = "Mantém (-)"
-        elif is_negative_event:
-            if current_val < avg_val:
-                indicator_text_raw = "Melhora (↓)" 
-                indicator_text_pdf = "Melhora (DOWN)"
-            else: 
-                indicator_text_raw = "Piora (↑)" 
-                indicator_text_pdf = "Piora (UP)"
-        else:
-            if current_val > avg_val:
-                indicator_text_raw = "Melhora (↑)"
-                indicator_text_pdf = "Melhora (UP)"
-            else: 
-                indicator_text_raw = "Piora (↓)"
-                indicator_text_pdf = "Piora (DOWN)"
-
-        comparison_list.append({
-            'Event_Name': event_name, 
-            'Atual': current_val,
-            'Média': avg_val,
-            'Mudança_UI': indicator_text_raw,
-            'Mudança_PDF': indicator_text_pdf
-        })
-    
-    df_performance = pd.DataFrame(comparison_list)
-    
-    all_possible_events_in_order = [e for e in INDIVIDUAL_EVENT_DISPLAY_ORDER if e in df_performance['Event_Name'].unique()]
-    df_performance['Event_Name'] = pd.Categorical(
-        df_performance['Event_Name'], 
-        categories=all_possible_events_in_order, 
-        ordered=True
-    )
-    df_performance = df_performance.sort_values('Event_Name').reset_index(drop=True)
+    # Dois lookups (linha do jogo e linha de médias do jogador) em vez de filtrar as tabelas por evento
+    if (game_name, player_name) in counts_by_game_player.index:
+        current_vals = counts_by_game_player.loc[(game_name, player_name)].to_numpy(dtype=float)
+    else:
+        current_vals = no_events
+    if player_name in averages_by_player.index:
+        avg_vals = averages_by_player.loc[player_name].to_numpy(dtype=float)
+    else:
+        avg_vals = no_events
+
+    # Uma comparação vetorizada para todos os eventos
+    negative = EVENTOS_INDIVIDUAIS_NEGATIVOS
+    conditions = [
+        np.abs(current_vals - avg_vals) < epsilon,
+        negative & (current_vals < avg_vals),
+        negative,
+        current_vals > avg_vals,
+    ]
+    indicator_text_raw = np.select(conditions, ["Mantém (—)", "Melhora (↓)", "Piora (↑)", "Melhora (↑)"], "Piora (↓)")
+    indicator_text_pdf = np.select(conditions, ["Mantém (-)", "Melhora (DOWN)", "Piora (UP)", "Melhora (UP)"], "Piora (DOWN)")
+
+    df_performance = pd.DataFrame({
+        'Event_Name': pd.Categorical(EVENTOS_INDIVIDUAIS, categories=EVENTOS_INDIVIDUAIS, ordered=True),
+        'Atual': current_vals,
+        'Média': avg_vals,
+        'Mudança_UI': indicator_text_raw,
+        'Mudança_PDF': indicator_text_pdf
+    })
     
     return df_performance
 
@@ -210,110 +215,15 @@ def get_display_event_name(original_event_name):
 
 # --- Nova Função de Cálculo de Performance Coletiva (APENAS VALORES CASA E FORA) ---
 # A média e indicadores complexos foram removidos.
-def get_collective_performance_data(game_name, df_collective_raw_data):
-    game_data = df_collective_raw_data[df_collective_raw_data['Jogo'] == game_name]
-    
-    comparison_list = []
-    
+def get_collective_performance_data(game_name, collective_aggregates):
+    # Uma fatia (evento x Casa/Fora) do array pivotado; eventos sem registro = 0
     # NÃO HÁ EPSILON AQUI, POIS NÃO HÁ COMPARAÇÃO OU INDICADOR DE SETA
-    for event_name in EVENTO_LISTA_COLETIVA: # Itera pela nova lista de eventos coletivos
-        event_row = game_data[game_data['Evento'] == event_name]
-        
-        # Obter valores de Casa e Fora, tratando NaN para int
-        casa_val = event_row['Casa'].iloc[0] if not event_row.empty and pd.notnull(event_row['Casa'].iloc[0]) else 0
-        fora_val = event_row['Fora'].iloc[0] if not event_row.empty and pd.notnull(event_row['Fora'].iloc[0]) else 0
-
-        comparison_list.append({
-            'Event_Name': event_name, 
-            'Casa': casa_val, 
-            'Fora': fora_val, 
-        })
-    
-    # Garante que as colunas essenciais existam
-    df_result = pd.DataFrame(comparison_list).sort_values(by='Event_Name').reset_index(drop=True)
-    required_cols = ['Event_Name', 'Casa', 'Fora']
-    for col in required_cols:
-        if col not in df_result.columns:
-            df_result[col] = 0.0 if col in ['Casa', 'Fora'] else ''
-    
-    return df_result
-
-
-# --- Geração de PDF (Genérica para Individual/Coletiva) ---
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 10, 'Relatório de Performance', 0, 1, 'C') 
-        self.ln(5)
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
-    def chapter_title(self, title):
-        self.set_font('Arial', 'B', 10)
-        self.cell(0, 6, title, 0, 1, 'L')
-        self.ln(2)
-    def add_table(self, df_to_print):
-        headers = df_to_print.columns.tolist()
-        
-        # Ajusta larguras de coluna para o PDF
-        if 'Média' in headers and 'Atual' in headers: # Individual
-            col_widths = [80, 30, 30, 30] # Evento, Atual, Média, Mudança
-        elif 'Casa' in headers and 'Fora' in headers: # Coletivo (Evento, Casa, Fora)
-            col_widths = [80, 45, 45] # Ajustado para 3 colunas
-        else: # Fallback
-            col_widths = [80] * len(headers) 
-
-        self.set_font('Arial', 'B', 9)
-        for i, header in enumerate(headers):
-            self.cell(col_widths[i], 7, header, 1, 0, 'C')
-        self.ln()
-        self.set_font('Arial', '', 8)
-        for index, row in df_to_print.iterrows():
-            for i, header in enumerate(headers): 
-                item = row[header] 
-                item_str = str(item)
-
-                if header == 'Mudança': # Individual
-                    item_str = str(item).replace('↑', '(UP)').replace('↓', '(DOWN)').replace('—', '(-)')
-                elif header in ['Atual', 'Média', 'Casa', 'Fora']: # Numéricos
-                    try:
-                        # Verifica se a coluna 'Evento' (o nome original Event_Name) é '% de Posse de bola'
-                        if 'Evento' in row.index and row['Evento'] == '% de Posse de bola' and header in ['Atual', 'Média', 'Casa', 'Fora']: # Apply to Actual, Casa, Fora for %
-                            item_str = f"{float(item):.2f}%" 
-                        elif header == 'Média':
-                            item_str = f"{float(item):.2f}"
-                        else: # Outros numéricos inteiros
-                            item_str = str(int(float(item))) 
-                    except ValueError:
-                        item_str = str(item) # Caso seja NaN ou outro não-numérico
-                else: 
-                    item_str = str(item)
-                
-                self.cell(col_widths[i], 6, item_str, 1, 0, 'C')
-            self.ln()
-        self.ln(5)
-
-def create_pdf_report_generic(entity_type, entity_name, game_name, performance_data, is_collective=False):
-    pdf = PDF()
-    pdf.add_page()
-    pdf.set_font('Arial', 'B', 11)
-    pdf.cell(0, 10, f'{entity_type}: {entity_name}', 0, 1, 'L')
-    pdf.cell(0, 10, f'Jogo: {game_name}', 0, 1, 'L')
-    pdf.ln(5)
-
-    if is_collective:
-        df_for_pdf = performance_data[['Event_Name', 'Casa', 'Fora']].copy() # Apenas estas colunas para PDF coletivo
-        df_for_pdf.rename(columns={'Event_Name': 'Evento', 'Casa': 'Casa', 'Fora': 'Fora'}, inplace=True)
-    else: # Individual
-        df_for_pdf = performance_data[['Event_Name', 'Atual', 'Média', 'Mudança_PDF']].copy()
-        df_for_pdf.rename(columns={'Event_Name': 'Evento', 'Mudança_PDF': 'Mudança'}, inplace=True)
-        df_for_pdf['Média'] = df_for_pdf['Média'].apply(lambda x: f"{x:.2f}")
-    
-    pdf.chapter_title('Resumo da Performance por Evento:')
-    pdf.add_table(df_for_pdf)
-    pdf_bytes_content = pdf.output(dest='S').encode('latin1')
-    return pdf_bytes_content
+    game_values = np.nan_to_num(collective_aggregates.game(game_name), nan=0.0)
+    return pd.DataFrame({
+        'Event_Name': collective_aggregates.eventos,
+        'Casa': game_values[:, 0],
+        'Fora': game_values[:, 1],
+    })
 
 
 # --- Estrutura do Dashboard com Abas ---
@@ -336,11 +246,12 @@ tab_individual, tab_coletiva = st.tabs(["Estatísticas Individuais", "Estatísti
 with tab_individual:
     st.header("Análise de Performance Individual")
 
-    df_individual_raw = load_individual_data(GITHUB_INDIVIDUAL_CSV_URL)
-    df_grouped_per_event_per_game_individual, player_overall_averages_corrected = preprocess_individual_data_for_averages(df_individual_raw)
+    df_individual_raw, carga_individual = load_individual_data(GITHUB_INDIVIDUAL_CSV_URL)
+    counts_by_game_player, averages_by_player = preprocess_individual_data_for_averages(df_individual_raw, carga_individual)
+    individual_trends = get_individual_trends()
 
-    all_individual_games = sorted(df_grouped_per_event_per_game_individual['Jogo'].unique().tolist())
-    all_players = sorted(df_grouped_per_event_per_game_individual['Player'].unique().tolist())
+    all_individual_games = sorted(counts_by_game_player.index.get_level_values('Jogo').unique().tolist())
+    all_players = sorted(counts_by_game_player.index.get_level_values('Player').unique().tolist())
 
     col_ind_game, col_ind_player = st.columns(2)
     with col_ind_game:
@@ -351,7 +262,7 @@ with tab_individual:
     if selected_individual_game and selected_player:
         performance_data_individual = get_performance_data_individual(
             selected_player, selected_individual_game, 
-            df_grouped_per_event_per_game_individual, player_overall_averages_corrected 
+            counts_by_game_player, averages_by_player 
         )
 
         st.subheader(f'Performance de {selected_player} no jogo: {selected_individual_game}')
@@ -425,27 +336,89 @@ with tab_individual:
         st.download_button(
             label="📄 Exportar Relatório Individual como PDF",
             data=pdf_bytes_individual,
-            file_name=f"Relatorio_Performance_Individual_{selected_player}_{selected_individual_game.replace(' ', '_').replace(':', '').replace('/', '_')}.pdf",
+            file_name=report_file_name("Individual", selected_player, selected_individual_game),
             mime="application/pdf"
         )
 
+        # --- Tendência e Forma (valores pré-calculados; aqui só há recortes) ---
+        with st.expander(f"📈 Tendência (últimos {JANELA_TENDENCIA} jogos) e forma do elenco"):
+            player_counts, player_last_n, player_ewm, _ = individual_trends.player(selected_player)
+            trend_event = st.selectbox('Evento:', EVENTOS_INDIVIDUAIS, format_func=get_display_event_name, key='trend_event')
+            if len(player_counts) > 0:
+                trend_chart = pd.DataFrame({
+                    'No jogo': player_counts[trend_event].to_numpy(),
+                    f'Média últimos {JANELA_TENDENCIA}': player_last_n[trend_event].to_numpy(),
+                    'Média exponencial': player_ewm[trend_event].to_numpy(),
+                }, index=pd.RangeIndex(1, len(player_counts) + 1, name='Jogo (ordem cronológica)'))
+                st.line_chart(trend_chart)
+                st.caption(' → '.join(player_counts.index))
+
+            trend_summary = individual_trends.game_summary(selected_player, selected_individual_game)
+            if trend_summary is not None:
+                st.markdown(f'**{selected_player} no jogo vs. os {JANELA_TENDENCIA} jogos anteriores (Z = desvios padrão):**')
+                trend_summary.index = [get_display_event_name(e) for e in trend_summary.index]
+                st.dataframe(trend_summary.style.format('{:.2f}', na_rep='—'))
+
+            squad_form = individual_trends.squad_form(selected_individual_game)
+            if squad_form.notna().any():
+                st.markdown(f'**Forma do elenco em {selected_individual_game}** (média dos z-scores; positivo = acima do próprio padrão):')
+                st.dataframe(squad_form.rename('Forma').to_frame().style.format('{:.2f}', na_rep='—'))
+
     else:
         st.info('Selecione um jogo e um jogador para ver a performance individual.')
 
+    # --- Exportação em Lote (todos os jogadores do jogo ou da temporada) ---
+    with st.expander("📦 Exportar relatórios em lote"):
+        bulk_scope = st.radio("Abrangência:", ["Jogo selecionado", "Temporada inteira"], horizontal=True, key="bulk_scope")
+        bulk_format = st.radio("Formato:", ["ZIP (um PDF por jogador)", "PDF único (uma seção por jogador)"], horizontal=True, key="bulk_format")
+
+        if st.button("Gerar relatórios", key="bulk_generate"):
+            game_player_pairs = counts_by_game_player.index
+            if bulk_scope == "Jogo selecionado":
+                game_player_pairs = game_player_pairs[game_player_pairs.get_level_values('Jogo') == selected_individual_game]
+                bulk_name = safe_file_name(selected_individual_game)
+            else:
+                bulk_name = "Temporada"
+
+            # Dados de performance calculados aqui (lookups); só a renderização dos PDFs vai para o pool
+            jobs = [
+                (player, game, get_performance_data_individual(player, game, counts_by_game_player, averages_by_player))
+                for game, player in sorted(game_player_pairs)
+            ]
+
+            progress_bar = st.progress(0.0, text=f"0/{len(jobs)} relatórios gerados")
+            def update_progress(done, total):
+                progress_bar.progress(done / total, text=f"{done}/{total} relatórios gerados")
+
+            if bulk_format.startswith("ZIP"):
+                bulk_data = create_bulk_reports_zip(jobs, progress_callback=update_progress)
+                bulk_file_name, bulk_mime = f"Relatorios_Performance_Individual_{bulk_name}.zip", "application/zip"
+            else:
+                bulk_data = create_bulk_reports_pdf(jobs, progress_callback=update_progress)
+                bulk_file_name, bulk_mime = f"Relatorios_Performance_Individual_{bulk_name}.pdf", "application/pdf"
+
+            st.download_button(
+                label=f"⬇️ Baixar {len(jobs)} relatórios",
+                data=bulk_data,
+                file_name=bulk_file_name,
+                mime=bulk_mime,
+                key="bulk_download"
+            )
+
 # --- TAB DE ESTATÍSTICAS COLETIVAS ---
 with tab_coletiva:
     st.header("Análise de Performance Coletiva")
 
-    df_collective_raw = load_collective_data(GITHUB_COLLECTIVE_CSV_URL) 
-    collective_overall_averages_corrected = preprocess_collective_data_for_averages(df_collective_raw)
+    df_collective_raw, carga_coletiva = load_collective_data(GITHUB_COLLECTIVE_CSV_URL)
+    collective_aggregates = preprocess_collective_data(df_collective_raw, carga_coletiva)
     
-    all_collective_games = sorted(df_collective_raw['Jogo'].unique().tolist()) 
+    all_collective_games = collective_aggregates.games
     
     selected_collective_game = st.selectbox('Jogo Atual (Coletivo):', all_collective_games)
 
     if selected_collective_game:
         performance_data_collective = get_collective_performance_data(
-            selected_collective_game, df_collective_raw, collective_overall_averages_corrected
+            selected_collective_game, collective_aggregates
         )
 
         st.subheader(f'Performance do EC São Bento no jogo: {selected_collective_game}')
@@ -475,7 +448,7 @@ with tab_coletiva:
             with col_casa_val:
                 st.markdown(
                     f"""<div style="border: 1px solid #e6e6e6; border-radius: 8px; padding: 8px; background-color: #ffffff; box-shadow: 0 2px 4px rgba(0,0,0,0.03); height: 75px; display: flex; flex-direction: column; justify-content: center; margin-bottom: 10px;">
-                        <p style="font-size: 1.2em; font-weight: bold; color: #000; margin-bottom: 3px; margin-top: 0;">{int(row['Atual']) if pd.notnull(row['Atual']) else 0} <small style="font-size: 0.4em; color: #777;">(Casa)</small></p>
+                        <p style="font-size: 1.2em; font-weight: bold; color: #000; margin-bottom: 3px; margin-top: 0;">{int(row['Casa']) if pd.notnull(row['Casa']) else 0} <small style="font-size: 0.4em; color: #777;">(Casa)</small></p>
                     </div>""",
                     unsafe_allow_html=True
                 )
@@ -500,9 +473,28 @@ with tab_coletiva:
         st.download_button(
             label="📄 Exportar Relatório Coletivo como PDF",
             data=pdf_bytes_collective,
-            file_name=f"Relatorio_Performance_Coletiva_EC_Sao_Bento_{selected_collective_game.replace(' ', '_').replace(':', '').replace('/', '_')}.pdf",
+            file_name=report_file_name("Coletiva", "EC_Sao_Bento", selected_collective_game),
             mime="application/pdf"
         )
 
     else:
         st.info('Selecione um jogo para ver a performance coletiva do EC São Bento.')
+
+    # --- Visão da Temporada (resumos mantidos de forma incremental pelos agregados) ---
+    with st.expander("📅 Temporada do EC São Bento"):
+        season_summary = collective_aggregates.season_summary()
+        st.markdown(f'**Totais e médias por jogo ({len(all_collective_games)} jogos):**')
+        st.dataframe(season_summary.style.format('{:.2f}', subset=['Média Casa', 'Média Fora'], na_rep='—').format('{:.0f}', subset=['Total Casa', 'Total Fora']))
+
+        opponent_summary = collective_aggregates.opponent_summary()
+        if len(opponent_summary) > 0:
+            selected_opponent = st.selectbox('Adversário:', opponent_summary.index.get_level_values('Adversário').unique().tolist(), key='season_opponent')
+            opponent_table = opponent_summary.xs(selected_opponent, level='Adversário')
+            st.markdown(f"**Médias contra {selected_opponent} ({int(opponent_table['Jogos'].iloc[0])} jogo(s)):**")
+            st.dataframe(opponent_table[['Média Casa', 'Média Fora']].style.format('{:.2f}', na_rep='—'))
+
+        possession_trend = collective_aggregates.possession_trend(JANELA_POSSE)
+        if possession_trend['Posse'].notna().any():
+            st.markdown(f'**Posse de bola por jogo (média móvel de {JANELA_POSSE} jogos):**')
+            st.line_chart(possession_trend.reset_index(drop=True).set_axis(pd.RangeIndex(1, len(possession_trend) + 1, name='Jogo (ordem do CSV)')))
+            st.caption(' → '.join(possession_trend.index))
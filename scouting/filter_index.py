@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+# Colunas filtradas por igualdade (bitmap por valor) e por faixa (array ordenado + searchsorted)
+COLUNAS_FILTRO_CATEGORICAS = ('position',)
+COLUNAS_FILTRO_FAIXA = ('age', 'player.proposedMarketValue')
+
+
+class FilterIndex:
+    """
+    Motor de filtros pré-compilado na carga.
+
+    Os bitmaps são empacotados (np.packbits, bitorder='little') e indexados pelo rótulo
+    inteiro da linha, que é o mesmo id usado no índice FAISS; por isso um bitmap pode ir
+    direto para `faiss.IDSelectorBitmap` como pré-filtro da busca. Combinações de filtros
+    são ANDs/ORs bit a bit sobre alguns KB.
+    """
+
+    def __init__(self, df, colunas_categoricas=COLUNAS_FILTRO_CATEGORICAS, colunas_faixa=COLUNAS_FILTRO_FAIXA):
+        self.rotulos = df.index.to_numpy(dtype=np.int64)
+        self.n_bits = int(self.rotulos.max()) + 1 if len(self.rotulos) else 0
+        self.todos = self._de_rotulos(self.rotulos)
+
+        # Um bitmap por valor distinto de cada coluna categórica
+        self._bitmaps = {}
+        for coluna in colunas_categoricas:
+            if coluna not in df.columns:
+                continue
+            codigos, valores = pd.factorize(df[coluna], sort=False)
+            ordem = np.argsort(codigos, kind='stable')
+            limites = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+            self._bitmaps[coluna] = {
+                valor: self._de_rotulos(self.rotulos[ordem[limites[i]:limites[i + 1]]])
+                for i, valor in enumerate(valores)
+            }
+
+        # Valores ordenados (NaN no fim) e os rótulos na mesma ordem
+        self._ordenados = {}
+        for coluna in colunas_faixa:
+            if coluna not in df.columns:
+                continue
+            valores = df[coluna].to_numpy(dtype=np.float64)
+            ordem = np.argsort(valores, kind='stable')
+            self._ordenados[coluna] = (valores[ordem], self.rotulos[ordem], int((~np.isnan(valores)).sum()))
+
+    def _de_rotulos(self, rotulos):
+        bits = np.zeros(self.n_bits, dtype=bool)
+        bits[rotulos] = True
+        return np.packbits(bits, bitorder='little')
+
+    def categorias(self, coluna, valores):
+        """Bitmap das linhas cujo valor em `coluna` está em `valores` (OR dos bitmaps)."""
+        bitmap = np.zeros_like(self.todos)
+        for valor in valores:
+            atual = self._bitmaps[coluna].get(valor)
+            if atual is not None:
+                bitmap |= atual
+        return bitmap
+
+    def faixa(self, coluna, minimo=None, maximo=None):
+        """Bitmap das linhas com minimo <= coluna <= maximo (limites None ficam abertos; NaN fica de fora)."""
+        valores, rotulos, n_validos = self._ordenados[coluna]
+        inicio = 0 if minimo is None else np.searchsorted(valores[:n_validos], minimo, side='left')
+        fim = n_validos if maximo is None else np.searchsorted(valores[:n_validos], maximo, side='right')
+        return self._de_rotulos(rotulos[inicio:fim])
+
+    def filtrar(self, categorias=None, faixas=None):
+        """
+        AND de todos os filtros. `categorias` = {coluna: valores} (vazio = sem filtro) e
+        `faixas` = {coluna: (minimo, maximo)} (ambos None = sem filtro). Colunas que não
+        foram indexadas são ignoradas.
+        """
+        bitmap = self.todos.copy()
+        for coluna, valores in (categorias or {}).items():
+            if valores and coluna in self._bitmaps:
+                bitmap &= self.categorias(coluna, valores)
+        for coluna, (minimo, maximo) in (faixas or {}).items():
+            if (minimo is not None or maximo is not None) and coluna in self._ordenados:
+                bitmap &= self.faixa(coluna, minimo, maximo)
+        return bitmap
+
+    def sem(self, bitmap, rotulos):
+        """Cópia do bitmap sem os rótulos informados (ex.: os atletas de referência)."""
+        return bitmap & ~self._de_rotulos(np.asarray(rotulos, dtype=np.int64))
+
+    def contar(self, bitmap):
+        return int(np.unpackbits(bitmap, count=self.n_bits, bitorder='little').sum())
+
+    def para_rotulos(self, bitmap):
+        """Rótulos (ordem crescente) das linhas marcadas no bitmap."""
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n_bits, bitorder='little'))
@@ -0,0 +1,122 @@
+import bisect
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+# Quantos candidatos do índice de trigramas são reavaliados com o fuzzy score completo
+CANDIDATOS_REAVALIADOS = 25
+# Se nenhum candidato atinge este score (o mínimo aceito pelos apps), todos os nomes são reavaliados
+SCORE_MINIMO = 70
+
+
+def normalize_name(texto):
+    """Minúsculas, sem acentos e só com letras/dígitos separados por um espaço."""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in texto).split())
+
+
+def _trigramas(texto):
+    texto = f'  {texto} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class _TrigramPostings:
+    """Listas invertidas trigrama -> posições, com similaridade de Jaccard vetorizada."""
+
+    def __init__(self, textos):
+        postings = defaultdict(list)
+        self.tamanhos = np.zeros(len(textos), dtype=np.int64)
+        for pos, texto in enumerate(textos):
+            trigramas = _trigramas(texto)
+            self.tamanhos[pos] = len(trigramas)
+            for trigrama in trigramas:
+                postings[trigrama].append(pos)
+        self.postings = {t: np.array(p, dtype=np.int64) for t, p in postings.items()}
+
+    def jaccard(self, consulta):
+        trigramas = _trigramas(consulta)
+        listas = [self.postings[t] for t in trigramas if t in self.postings]
+        if not listas:
+            return np.zeros(len(self.tamanhos), dtype=np.float64)
+        acertos = np.bincount(np.concatenate(listas), minlength=len(self.tamanhos))
+        return acertos / (len(trigramas) + self.tamanhos - acertos)
+
+
+class NameIndex:
+    """
+    Índice de autocompletar para nomes de atletas: prefixos de cada palavra (lista
+    ordenada + bisect) e trigramas (listas invertidas) sobre os nomes normalizados.
+
+    Os candidatos do índice são reordenados com o mesmo `fuzz.token_set_ratio` usado
+    antes (70% nome, 30% clube), só que sobre algumas dezenas de linhas em vez do
+    dataset inteiro. Quando nenhum candidato chega a SCORE_MINIMO (grafia que os
+    trigramas não aproximam), a busca volta a pontuar o dataset inteiro, então não
+    perde nenhum resultado que a varredura completa encontraria. As consultas recentes
+    ficam memorizadas.
+    """
+
+    def __init__(self, names, teams=None):
+        self.labels = names.index.to_numpy()
+        self.names = names.astype(str).to_numpy()
+        normalizados = [normalize_name(n) for n in self.names]
+
+        # Prefixos: (palavra, posição) ordenados; uma busca por prefixo é um intervalo contíguo
+        palavras = sorted((palavra, pos) for pos, nome in enumerate(normalizados) for palavra in nome.split())
+        self._palavras = [p for p, _ in palavras]
+        self._posicoes_palavras = np.array([pos for _, pos in palavras], dtype=np.int64)
+        self._nomes = _TrigramPostings(normalizados)
+
+        # Clubes se repetem muito: trigramas por clube distinto, expandidos pelos códigos
+        self.teams = None
+        if teams is not None:
+            self._codigos_clube, clubes = pd.factorize(teams.astype(str), sort=False)
+            self.teams = np.asarray(clubes)[self._codigos_clube]
+            self._clubes = _TrigramPostings([normalize_name(c) for c in clubes])
+
+        self.search = lru_cache(maxsize=512)(self._search)
+
+    def _por_prefixo(self, prefixo):
+        inicio = bisect.bisect_left(self._palavras, prefixo)
+        fim = bisect.bisect_left(self._palavras, prefixo + '\uffff')
+        return self._posicoes_palavras[inicio:fim]
+
+    def _candidatos(self, consulta, consulta_clube=None):
+        scores = self._nomes.jaccard(consulta)
+
+        # Bônus para nomes em que alguma palavra começa com a última palavra digitada
+        palavras = consulta.split()
+        if palavras:
+            scores[self._por_prefixo(palavras[-1])] += 0.5
+        if consulta_clube and self.teams is not None:
+            scores = 0.7 * scores + 0.3 * self._clubes.jaccard(consulta_clube)[self._codigos_clube]
+
+        n = min(CANDIDATOS_REAVALIADOS, int((scores > 0).sum()))
+        if n == 0:
+            return np.array([], dtype=np.int64)
+        melhores = np.argpartition(-scores, n - 1)[:n]
+        return melhores[np.argsort(-scores[melhores])]
+
+    def _pontuar(self, posicoes, name, team):
+        resultados = []
+        for pos in posicoes:
+            score = fuzz.token_set_ratio(name, self.names[pos])
+            if team and self.teams is not None:
+                score = 0.7 * score + 0.3 * fuzz.token_set_ratio(team, self.teams[pos])
+            resultados.append((self.labels[pos], score))
+        resultados.sort(key=lambda r: r[1], reverse=True)
+        return resultados
+
+    def _search(self, name, team=None, limit=5):
+        """Retorna até `limit` tuplas (rótulo, score 0-100) em ordem decrescente de score."""
+        consulta = normalize_name(name)
+        if not consulta:
+            return ()
+        resultados = self._pontuar(self._candidatos(consulta, normalize_name(team) if team else None), name, team)
+        if not resultados or resultados[0][1] < SCORE_MINIMO:
+            resultados = self._pontuar(range(len(self.names)), name, team)
+        return tuple(resultados[:limit])
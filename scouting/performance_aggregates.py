@@ -0,0 +1,306 @@
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from performance_trends import PlayerTrends
+
+COLUNA_JOGO = 'Jogo'
+COLUNA_JOGADOR = 'Player'
+COLUNA_EVENTO = 'Evento descrição'
+COLUNA_CONTAGEM = 'Count'
+COLUNA_HORARIO = 'Timestamp'
+
+
+def _assinaturas_por_jogo(df_raw, colunas, ordenar=True):
+    """
+    Assinatura do conteúdo de cada jogo: (nº de linhas, soma dos hashes das linhas em
+    `colunas`). Não depende da ordem das linhas, mas muda com qualquer valor alterado:
+    jogador ou evento renomeado, contagem movida de um jogador/evento para outro.
+    """
+    hashes = pd.util.hash_pandas_object(df_raw[[c for c in colunas if c in df_raw.columns]], index=False)
+    assinaturas = hashes.groupby(df_raw[COLUNA_JOGO], sort=ordenar).agg(['size', 'sum'])
+    return {jogo: (int(n), int(soma)) for jogo, n, soma in assinaturas.itertuples()}
+
+
+class IndividualAggregates:
+    """
+    Agregados por jogador do dashboard individual, mantidos de forma incremental:
+
+    - counts: matriz (Jogo, Player) x evento com as contagens de cada jogo;
+    - totals: matriz Player x evento com a soma da temporada;
+    - games_played: nº de jogos em que o jogador tem algum evento registrado.
+
+    A média da temporada é totals / games_played, ou seja, só conta os jogos que o
+    jogador de fato disputou. Um jogo novo (ou alterado) é somado/subtraído das
+    matrizes sem reagregar os demais. O primeiro Timestamp de cada jogo define a
+    ordem cronológica usada nas tendências.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.counts = pd.DataFrame(
+            dtype='float64', index=pd.MultiIndex.from_arrays([[], []], names=[COLUNA_JOGO, COLUNA_JOGADOR])
+        )
+        self.totals = pd.DataFrame(dtype='float64')
+        self.games_played = pd.Series(dtype='int64')
+        self.game_starts = {}  # jogo -> primeiro Timestamp registrado
+        self._assinaturas = {}  # jogo -> assinatura do conteúdo da versão já agregada
+        self._carga = None  # identificador da carga do CSV já sincronizada
+        self._medias = None
+        self._matrizes = None
+        self._tendencias = None
+
+    @staticmethod
+    def _pivotar(linhas):
+        return linhas.pivot_table(
+            index=COLUNA_JOGADOR, columns=COLUNA_EVENTO, values=COLUNA_CONTAGEM, aggfunc='sum', fill_value=0
+        ).astype('float64')
+
+    def _adicionar_jogo(self, jogo, linhas):
+        matriz = self._pivotar(linhas)
+        self.totals = self.totals.add(matriz, fill_value=0).fillna(0).rename_axis(index=COLUNA_JOGADOR, columns=COLUNA_EVENTO)
+        self.games_played = self.games_played.add(pd.Series(1, index=matriz.index), fill_value=0).astype('int64')
+        matriz.index = pd.MultiIndex.from_product([[jogo], matriz.index], names=[COLUNA_JOGO, COLUNA_JOGADOR])
+        self.counts = pd.concat([self.counts, matriz]).fillna(0).rename_axis(columns=COLUNA_EVENTO)
+        self.game_starts[jogo] = linhas[COLUNA_HORARIO].min() if COLUNA_HORARIO in linhas.columns else pd.NaT
+
+    def _remover_jogo(self, jogo):
+        matriz = self.counts.xs(jogo, level=COLUNA_JOGO)
+        self.totals = self.totals.sub(matriz, fill_value=0).fillna(0)
+        self.games_played = self.games_played.sub(pd.Series(1, index=matriz.index), fill_value=0).astype('int64')
+        ativos = self.games_played.index[self.games_played > 0]
+        self.totals = self.totals.loc[ativos]
+        self.games_played = self.games_played.loc[ativos]
+        self.counts = self.counts.drop(index=jogo, level=COLUNA_JOGO)
+        self.game_starts.pop(jogo, None)
+
+    def sync(self, df_raw, carga=None):
+        """
+        Reagrega só os jogos novos, alterados ou removidos em `df_raw` (formato do CSV
+        individual). Retorna o número de jogos reprocessados. Com `carga` (identificador
+        da leitura do CSV), a mesma carga não é comparada de novo a cada rerun.
+        """
+        if carga is not None and carga == self._carga:
+            return 0
+        atuais = _assinaturas_por_jogo(df_raw, [COLUNA_JOGADOR, COLUNA_EVENTO, COLUNA_CONTAGEM, COLUNA_HORARIO])
+        with self.lock:
+            self._carga = carga
+            removidos = [j for j in self._assinaturas if j not in atuais]
+            alterados = [j for j, assinatura in atuais.items() if self._assinaturas.get(j) != assinatura]
+            if not removidos and not alterados:
+                return 0
+
+            for jogo in removidos + [j for j in alterados if j in self._assinaturas]:
+                self._remover_jogo(jogo)
+                self._assinaturas.pop(jogo)
+            for jogo, linhas in df_raw[df_raw[COLUNA_JOGO].isin(alterados)].groupby(COLUNA_JOGO):
+                self._adicionar_jogo(jogo, linhas)
+                self._assinaturas[jogo] = atuais[jogo]
+            self._medias = None
+            self._matrizes = None
+            self._tendencias = None
+        return len(removidos) + len(alterados)
+
+    @property
+    def averages(self):
+        """Matriz Player x evento com a média por jogo disputado (calculada uma vez por versão)."""
+        with self.lock:
+            if self._medias is None:
+                self._medias = self.totals.div(self.games_played, axis=0)
+            return self._medias
+
+    def matrices(self, eventos):
+        """
+        (counts, averages) com as colunas na ordem de `eventos` (eventos sem registro = 0),
+        montadas uma vez por versão dos agregados: cada linha vira um lookup direto por
+        (Jogo, Player) ou por Player.
+        """
+        eventos = tuple(eventos)
+        with self.lock:
+            if self._matrizes is None or self._matrizes[0] != eventos:
+                self._matrizes = (
+                    eventos,
+                    self.counts.reindex(columns=list(eventos), fill_value=0),
+                    self.averages.reindex(columns=list(eventos), fill_value=0)
+                )
+            return self._matrizes[1], self._matrizes[2]
+
+    @property
+    def game_order(self):
+        """Jogos em ordem cronológica (primeiro Timestamp; sem horário vão para o fim, por nome)."""
+        with self.lock:
+            inicios = pd.DataFrame({'jogo': list(self.game_starts), 'inicio': pd.to_datetime(list(self.game_starts.values()))})
+        return inicios.sort_values(['inicio', 'jogo'], na_position='last')['jogo'].tolist()
+
+    def trends(self, eventos, negativos, janela, span):
+        """PlayerTrends sobre as colunas `eventos`, calculado uma vez por versão dos agregados."""
+        chave = (tuple(eventos), janela, span)
+        with self.lock:
+            if self._tendencias is None or self._tendencias[0] != chave:
+                counts, _ = self.matrices(eventos)
+                self._tendencias = (chave, PlayerTrends(counts, self.game_order, negativos, janela, span))
+            return self._tendencias[1]
+
+
+COLUNA_EVENTO_COLETIVO = 'Evento'
+LADOS_COLETIVOS = ('Casa', 'Fora')
+
+
+class CollectiveMatrix:
+    """
+    Estatísticas coletivas pivotadas uma vez na carga: `values[jogo, evento, lado]`, com
+    lado 0 = Casa e 1 = Fora, jogos em ordem alfabética e eventos na ordem de `eventos`.
+    Valores não registrados ficam NaN (a tabela de um jogo os mostra como 0). Se um
+    evento aparece repetido em um jogo, vale a primeira linha.
+    """
+
+    def __init__(self, df_raw, eventos):
+        self.eventos = list(eventos)
+        self.games = sorted(df_raw[COLUNA_JOGO].unique().tolist())
+        self._posicoes = {jogo: i for i, jogo in enumerate(self.games)}
+
+        linhas = df_raw.drop_duplicates([COLUNA_JOGO, COLUNA_EVENTO_COLETIVO], keep='first')
+        tabela = linhas.set_index([COLUNA_JOGO, COLUNA_EVENTO_COLETIVO])[list(LADOS_COLETIVOS)]
+        tabela = tabela.reindex(pd.MultiIndex.from_product([self.games, self.eventos]))
+        self.values = tabela.to_numpy(dtype='float64').reshape(len(self.games), len(self.eventos), len(LADOS_COLETIVOS))
+
+    def game(self, game_name):
+        """Matriz evento x (Casa, Fora) do jogo (uma fatia do array, sem filtrar o CSV)."""
+        return self.values[self._posicoes[game_name]]
+
+
+# Nome do jogo no CSV: "<Mandante> <gols> x <gols> <Visitante>"
+PADRAO_JOGO = re.compile(r'^\s*(?P<casa>.+?)\s+\d+\s*x\s*\d+\s+(?P<fora>.+?)\s*$')
+TIME_ANALISADO = 'São Bento'
+EVENTO_POSSE = 'Posse de bola'
+
+
+def opponent_from_game(game_name, team=TIME_ANALISADO):
+    """Adversário a partir do nome do jogo (o lado que não é `team`); sem placar no nome, o próprio nome."""
+    partes = PADRAO_JOGO.match(str(game_name))
+    if partes is None:
+        return str(game_name)
+    return partes['casa'] if partes['fora'] == team else partes['fora']
+
+
+class CollectiveAggregates:
+    """
+    Estatísticas coletivas da temporada, mantidas de forma incremental como em
+    IndividualAggregates: cada jogo novo ou alterado no CSV consolidado é pivotado
+    sozinho (CollectiveMatrix) e somado aos totais da temporada e do adversário; os
+    demais jogos não são relidos.
+
+    Mesma interface de CollectiveMatrix para um jogo (`eventos`, `games`, `game`), mais
+    as tabelas da temporada, montadas uma vez por versão: season_summary,
+    opponent_summary e possession_trend. Valores não registrados (NaN) não entram nas
+    médias. A ordem dos jogos é a de chegada no CSV.
+    """
+
+    def __init__(self, eventos, team=TIME_ANALISADO):
+        self.lock = threading.RLock()
+        self.eventos = list(eventos)
+        self.team = team
+        self._por_jogo = {}  # jogo -> matriz evento x (Casa, Fora), na ordem de chegada
+        self._adversarios = {}  # jogo -> adversário
+        self.totals, self.recorded = self._zeros()  # soma e nº de jogos com registro, por evento e lado
+        self._por_adversario = {}  # adversário -> (soma, nº de registros, nº de jogos)
+        self._assinaturas = {}
+        self._carga = None
+        self._resumos = {}
+
+    def _zeros(self):
+        forma = (len(self.eventos), len(LADOS_COLETIVOS))
+        return np.zeros(forma), np.zeros(forma, dtype=np.int64)
+
+    @property
+    def games(self):
+        with self.lock:
+            return sorted(self._por_jogo)
+
+    def game(self, game_name):
+        with self.lock:
+            return self._por_jogo[game_name]
+
+    def _somar(self, jogo, valores, sinal):
+        registrados = ~np.isnan(valores)
+        # Arrays novos (sem +=): tabelas já entregues não mudam por baixo de quem as lê
+        self.totals = self.totals + sinal * np.nan_to_num(valores)
+        self.recorded = self.recorded + sinal * registrados
+        adversario = self._adversarios[jogo]
+        soma, registros, n_jogos = self._por_adversario.get(adversario) or (*self._zeros(), 0)
+        n_jogos += sinal
+        if n_jogos == 0:
+            self._por_adversario.pop(adversario, None)
+        else:
+            self._por_adversario[adversario] = (soma + sinal * np.nan_to_num(valores), registros + sinal * registrados, n_jogos)
+
+    def sync(self, df_raw, carga=None):
+        """Reagrega só os jogos novos, alterados ou removidos em `df_raw` (`carga` como em IndividualAggregates.sync)."""
+        if carga is not None and carga == self._carga:
+            return 0
+        atuais = _assinaturas_por_jogo(df_raw, [COLUNA_EVENTO_COLETIVO, *LADOS_COLETIVOS], ordenar=False)
+        with self.lock:
+            self._carga = carga
+            removidos = [j for j in self._assinaturas if j not in atuais]
+            alterados = [j for j, assinatura in atuais.items() if self._assinaturas.get(j) != assinatura]
+            if not removidos and not alterados:
+                return 0
+
+            for jogo in removidos + [j for j in alterados if j in self._assinaturas]:
+                self._somar(jogo, self._por_jogo[jogo], -1)
+                if jogo in removidos:
+                    del self._por_jogo[jogo], self._adversarios[jogo]
+                self._assinaturas.pop(jogo)
+            novos = CollectiveMatrix(df_raw[df_raw[COLUNA_JOGO].isin(alterados)], self.eventos)
+            for jogo in alterados:  # ordem de chegada no CSV (groupby sem ordenar)
+                self._por_jogo[jogo] = novos.game(jogo)
+                self._adversarios[jogo] = opponent_from_game(jogo, self.team)
+                self._somar(jogo, self._por_jogo[jogo], 1)
+                self._assinaturas[jogo] = atuais[jogo]
+            self._resumos = {}
+        return len(removidos) + len(alterados)
+
+    def _resumo(self, chave, montar):
+        with self.lock:
+            if chave not in self._resumos:
+                self._resumos[chave] = montar()
+            return self._resumos[chave]
+
+    def season_summary(self):
+        """Evento x (Total e Média de Casa/Fora, Jogos com registro)."""
+        def montar():
+            with np.errstate(invalid='ignore', divide='ignore'):
+                medias = self.totals / self.recorded
+            return pd.DataFrame({
+                'Total Casa': self.totals[:, 0], 'Total Fora': self.totals[:, 1],
+                'Média Casa': medias[:, 0], 'Média Fora': medias[:, 1],
+                'Jogos': self.recorded.max(axis=1),
+            }, index=pd.Index(self.eventos, name=COLUNA_EVENTO_COLETIVO))
+        return self._resumo('temporada', montar)
+
+    def opponent_summary(self):
+        """(Adversário, Evento) x (Média Casa, Média Fora, Jogos)."""
+        def montar():
+            adversarios = sorted(self._por_adversario)
+            partes = []
+            for adversario in adversarios:
+                soma, registros, n_jogos = self._por_adversario[adversario]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    medias = soma / registros
+                partes.append(pd.DataFrame({'Média Casa': medias[:, 0], 'Média Fora': medias[:, 1], 'Jogos': n_jogos}, index=self.eventos))
+            if not partes:
+                return pd.DataFrame(columns=['Média Casa', 'Média Fora', 'Jogos'])
+            return pd.concat(partes, keys=adversarios, names=['Adversário', COLUNA_EVENTO_COLETIVO])
+        return self._resumo('adversarios', montar)
+
+    def possession_trend(self, janela):
+        """Posse de bola (Casa) por jogo na ordem de chegada, com a média móvel de `janela` jogos."""
+        def montar():
+            if EVENTO_POSSE not in self.eventos:
+                return pd.DataFrame(columns=['Posse', f'Média móvel ({janela} jogos)'])
+            posicao = self.eventos.index(EVENTO_POSSE)
+            posse = pd.Series({jogo: valores[posicao, 0] for jogo, valores in self._por_jogo.items()}, dtype='float64')
+            return pd.DataFrame({'Posse': posse, f'Média móvel ({janela} jogos)': posse.rolling(janela, min_periods=1).mean()})
+        return self._resumo(('posse', janela), montar)
@@ -0,0 +1,216 @@
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+
+
+# --- Geração de PDF (Genérica para Individual/Coletiva) ---
+NUMERIC_COLUMNS = ('Atual', 'Média', 'Casa', 'Fora')
+PERCENT_EVENT = '% de Posse de bola'
+# Larguras de texto repetem muito entre células ("0", "0.00", "Mantém (-)"); limite do cache por processo
+MAX_CACHED_WIDTHS = 20000
+
+@lru_cache(maxsize=None)
+def _table_layout(headers):
+    """Larguras de coluna por conjunto de cabeçalhos, resolvidas uma vez e reaproveitadas em todas as páginas."""
+    if 'Média' in headers and 'Atual' in headers: # Individual
+        return (80, 30, 30, 30) # Evento, Atual, Média, Mudança
+    if 'Casa' in headers and 'Fora' in headers: # Coletivo (Evento, Casa, Fora)
+        return (80, 45, 45) # Ajustado para 3 colunas
+    return (80,) * len(headers) # Fallback
+
+def format_table_columns(df_to_print):
+    """
+    Converte a tabela em colunas de texto prontas para o PDF, uma coluna inteira por vez:
+    '% de Posse de bola' com duas casas e '%', 'Média' com duas casas, demais numéricos como
+    inteiros e setas da coluna 'Mudança' trocadas por texto. Valores não numéricos (ou NaN)
+    nas colunas numéricas saem como texto.
+    """
+    if 'Evento' in df_to_print.columns:
+        is_percent = (df_to_print['Evento'].astype(str) == PERCENT_EVENT).to_numpy()
+    else:
+        is_percent = np.zeros(len(df_to_print), dtype=bool)
+
+    columns = []
+    for header in df_to_print.columns:
+        values = df_to_print[header]
+        text = np.array([str(item) for item in values.tolist()], dtype=object)
+        if header == 'Mudança': # Individual
+            text = np.array([item.replace('↑', '(UP)').replace('↓', '(DOWN)').replace('—', '(-)') for item in text], dtype=object)
+        elif header in NUMERIC_COLUMNS: # Numéricos
+            numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+            valid = np.isfinite(numeric)
+            if header == 'Média':
+                formatted = np.char.mod('%.2f', numeric)
+            else: # Outros numéricos inteiros
+                formatted = np.trunc(np.where(valid, numeric, 0)).astype(np.int64).astype(str)
+            formatted = np.where(is_percent, np.char.add(np.char.mod('%.2f', numeric), '%'), formatted)
+            text = np.where(valid, formatted.astype(object), text)
+        columns.append(text.tolist())
+    return columns
+
+class PDF(FPDF):
+    _string_widths = {}
+
+    def header(self):
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, 'Relatório de Performance', 0, 1, 'C') 
+        self.ln(5)
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
+    def chapter_title(self, title):
+        self.set_font('Arial', 'B', 10)
+        self.cell(0, 6, title, 0, 1, 'L')
+        self.ln(2)
+    def get_string_width(self, s):
+        # Métricas de fonte em cache: cell() centralizado mede cada texto
+        key = (self.font_family, self.font_style, self.font_size_pt, s)
+        width = self._string_widths.get(key)
+        if width is None:
+            if len(self._string_widths) >= MAX_CACHED_WIDTHS:
+                self._string_widths.clear()
+            width = self._string_widths[key] = super().get_string_width(s)
+        return width
+    def add_table(self, df_to_print):
+        headers = df_to_print.columns.tolist()
+        col_widths = _table_layout(tuple(headers))
+
+        self.set_font('Arial', 'B', 9)
+        for width, header in zip(col_widths, headers):
+            self.cell(width, 7, header, 1, 0, 'C')
+        self.ln()
+        self.set_font('Arial', '', 8)
+        cell = self.cell
+        for row in zip(*format_table_columns(df_to_print)):
+            for width, item_str in zip(col_widths, row):
+                cell(width, 6, item_str, 1, 0, 'C')
+            self.ln()
+        self.ln(5)
+
+def add_report_section(pdf, entity_type, entity_name, game_name, performance_data, is_collective=False):
+    """Escreve uma seção (cabeçalho + tabela) do relatório em uma nova página de `pdf`."""
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 11)
+    pdf.cell(0, 10, f'{entity_type}: {entity_name}', 0, 1, 'L')
+    pdf.cell(0, 10, f'Jogo: {game_name}', 0, 1, 'L')
+    pdf.ln(5)
+
+    # A formatação (casas decimais, %, inteiros) é feita por coluna em add_table
+    if is_collective:
+        df_for_pdf = pd.DataFrame({ # Apenas estas colunas para PDF coletivo
+            'Evento': performance_data['Event_Name'], 'Casa': performance_data['Casa'], 'Fora': performance_data['Fora']
+        })
+    else: # Individual
+        df_for_pdf = pd.DataFrame({
+            'Evento': performance_data['Event_Name'], 'Atual': performance_data['Atual'],
+            'Média': performance_data['Média'], 'Mudança': performance_data['Mudança_PDF']
+        })
+    
+    pdf.chapter_title('Resumo da Performance por Evento:')
+    pdf.add_table(df_for_pdf)
+
+def create_pdf_report_generic(entity_type, entity_name, game_name, performance_data, is_collective=False):
+    pdf = PDF()
+    add_report_section(pdf, entity_type, entity_name, game_name, performance_data, is_collective)
+    pdf_bytes_content = pdf.output(dest='S').encode('latin1')
+    return pdf_bytes_content
+
+def safe_file_name(game_name):
+    """Nome do jogo sem espaços, ':' e '/', para uso em nomes de arquivo."""
+    return game_name.replace(' ', '_').replace(':', '').replace('/', '_')
+
+def report_file_name(kind, entity_name, game_name):
+    """Nome do arquivo no mesmo padrão dos botões de download do dashboard."""
+    return f"Relatorio_Performance_{kind}_{entity_name}_{safe_file_name(game_name)}.pdf"
+
+
+# --- Exportação em Lote ---
+# Um relatório leva poucos milissegundos; abaixo disso subir processos (spawn) custa mais que o ganho
+MIN_REPORTS_FOR_POOL = 200
+CHUNKS_PER_WORKER = 4
+
+def _render_individual_reports(jobs):
+    # Executado nos processos do pool: cada job é (jogador, jogo, performance_data)
+    return [
+        create_pdf_report_generic("Jogador", player_name, game_name, performance_data, is_collective=False)
+        for player_name, game_name, performance_data in jobs
+    ]
+
+def create_bulk_reports_zip(jobs, progress_callback=None, max_workers=None):
+    """
+    Gera um PDF por (jogador, jogo) de `jobs` e devolve um zip em bytes, com uma pasta por jogo.
+    Lotes grandes (temporada inteira) são renderizados em um pool de processos, em blocos;
+    `progress_callback(concluidos, total)` é chamado a cada bloco pronto. Se o pool não puder
+    ser usado (ambiente sem multiprocessing), o que faltar é gerado no processo atual.
+    """
+    total = len(jobs)
+    workers = max_workers or os.cpu_count() or 1
+    chunk_size = max(1, -(-total // (workers * CHUNKS_PER_WORKER)))
+    pending = {start: jobs[start:start + chunk_size] for start in range(0, total, chunk_size)}
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        def _store(start, pdfs):
+            for (player_name, game_name, _), pdf_bytes in zip(pending.pop(start), pdfs):
+                zip_file.writestr(f"{safe_file_name(game_name)}/{report_file_name('Individual', player_name, game_name)}", pdf_bytes)
+            if progress_callback:
+                progress_callback(total - sum(len(chunk) for chunk in pending.values()), total)
+
+        if total >= MIN_REPORTS_FOR_POOL and workers > 1:
+            try:
+                # spawn: o servidor do Streamlit tem várias threads, fork não é seguro
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                    futures = {pool.submit(_render_individual_reports, chunk): start for start, chunk in pending.items()}
+                    for future in as_completed(futures):
+                        _store(futures[future], future.result())
+            except (OSError, BrokenProcessPool):
+                pass
+        for start in sorted(pending):
+            _store(start, _render_individual_reports(pending[start]))
+    return buffer.getvalue()
+
+def create_bulk_reports_pdf(jobs, progress_callback=None):
+    """Um único PDF com uma seção (página) por (jogador, jogo) de `jobs`."""
+    pdf = PDF()
+    for done, (player_name, game_name, performance_data) in enumerate(jobs, start=1):
+        add_report_section(pdf, "Jogador", player_name, game_name, performance_data, is_collective=False)
+        if progress_callback:
+            progress_callback(done, len(jobs))
+    return pdf.output(dest='S').encode('latin1')
+
+def benchmark(n_players=25, n_games=20, n_events=30):
+    """
+    Páginas/s do PDF único com `n_players` x `n_games` relatórios individuais sintéticos
+    de `n_events` eventos. Uso: python performance_reports.py [jogadores] [jogos] [eventos]
+    """
+    import time
+
+    rng = np.random.default_rng(0)
+    events = [f'Evento {i}' for i in range(n_events - 1)] + [PERCENT_EVENT]
+    jobs = []
+    for game in range(n_games):
+        for player in range(n_players):
+            jobs.append((f'Jogador {player}', f'Jogo {game}', pd.DataFrame({
+                'Event_Name': events,
+                'Atual': rng.integers(0, 10, n_events).astype(float),
+                'Média': rng.random(n_events) * 5,
+                'Mudança_PDF': rng.choice(['Melhora (UP)', 'Piora (DOWN)', 'Mantém (-)'], n_events)
+            })))
+    start = time.perf_counter()
+    pdf_bytes = create_bulk_reports_pdf(jobs)
+    elapsed = time.perf_counter() - start
+    return {'pages': len(jobs), 'seconds': elapsed, 'pages_per_sec': len(jobs) / elapsed, 'bytes': len(pdf_bytes)}
+
+if __name__ == '__main__':
+    import sys
+
+    result = benchmark(*(int(arg) for arg in sys.argv[1:4]))
+    print(f"{result['pages']} páginas em {result['seconds']:.2f}s: {result['pages_per_sec']:.0f} páginas/s ({result['bytes'] / 1e6:.1f} MB)")
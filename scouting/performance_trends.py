@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+COLUNA_JOGO = 'Jogo'
+COLUNA_JOGADOR = 'Player'
+
+# Janela padrão (últimos N jogos disputados) e span da média exponencial
+JANELA_TENDENCIA = 5
+SPAN_EWM = 3
+# Mínimo de jogos anteriores para calcular o z-score de um jogo
+MIN_JOGOS_ZSCORE = 2
+
+
+class PlayerTrends:
+    """
+    Tendências por jogador ao longo da temporada, calculadas uma vez por versão dos dados.
+
+    Todas as matrizes são (Player, Jogo) x evento, com os jogos de cada jogador em ordem
+    cronológica e só os jogos que ele disputou:
+
+    - counts: contagem do jogo;
+    - last_n: média móvel dos últimos `janela` jogos (incluindo o jogo);
+    - ewm: média exponencial (span `span`);
+    - zscores: quanto o jogo se afasta da média dos `janela` jogos anteriores, em desvios
+      padrão (NaN sem histórico suficiente ou sem variação);
+    - form: índice de forma por (Player, Jogo), média dos z-scores com sinal invertido nos
+      eventos negativos (positivo = acima do próprio padrão).
+    """
+
+    def __init__(self, counts, game_order, negativos, janela=JANELA_TENDENCIA, span=SPAN_EWM):
+        self.janela = janela
+        self.span = span
+        self.game_order = list(game_order)
+
+        # Ordena por jogador e, dentro dele, pela ordem cronológica dos jogos
+        posicao_jogo = pd.Series(np.arange(len(self.game_order)), index=self.game_order)
+        jogos = counts.index.get_level_values(COLUNA_JOGO)
+        jogadores = counts.index.get_level_values(COLUNA_JOGADOR)
+        ordem = np.lexsort((posicao_jogo.reindex(jogos).to_numpy(), jogadores.to_numpy()))
+        self.counts = counts.iloc[ordem].swaplevel(COLUNA_JOGO, COLUNA_JOGADOR)
+
+        grupos = self.counts.groupby(level=COLUNA_JOGADOR, sort=False)
+        self.last_n = grupos.rolling(janela, min_periods=1).mean().droplevel(0)
+        self.ewm = grupos.ewm(span=span).mean().droplevel(0)
+
+        # Estatísticas dos jogos anteriores (shift dentro do jogador) para o z-score
+        anteriores = grupos.shift(1).groupby(level=COLUNA_JOGADOR, sort=False).rolling(janela, min_periods=MIN_JOGOS_ZSCORE)
+        media_anterior = anteriores.mean().droplevel(0)
+        desvio_anterior = anteriores.std().droplevel(0)
+        self.zscores = (self.counts - media_anterior) / desvio_anterior.where(desvio_anterior > 0)
+
+        sinais = np.where(np.asarray(negativos, dtype=bool), -1.0, 1.0)
+        self.form = (self.zscores * sinais).mean(axis=1, skipna=True)
+
+    def player(self, player_name):
+        """(counts, last_n, ewm, zscores) do jogador, indexados por Jogo em ordem cronológica."""
+        if player_name not in self.counts.index.get_level_values(COLUNA_JOGADOR):
+            vazio = self.counts.iloc[:0].droplevel(COLUNA_JOGADOR)
+            return vazio, vazio, vazio, vazio
+        return tuple(
+            matriz.xs(player_name, level=COLUNA_JOGADOR)
+            for matriz in (self.counts, self.last_n, self.ewm, self.zscores)
+        )
+
+    def game_summary(self, player_name, game_name):
+        """Linha de tendência do jogador no jogo: DataFrame evento x (Últimos N, EWM, Z) ou None."""
+        chave = (player_name, game_name)
+        if chave not in self.counts.index:
+            return None
+        return pd.DataFrame({
+            f'Últimos {self.janela}': self.last_n.loc[chave],
+            'EWM': self.ewm.loc[chave],
+            'Z': self.zscores.loc[chave],
+        })
+
+    def squad_form(self, game_name):
+        """Índice de forma de cada jogador que disputou `game_name`, do maior para o menor."""
+        if game_name not in self.form.index.get_level_values(COLUNA_JOGO):
+            return pd.Series(dtype='float64')
+        return self.form.xs(game_name, level=COLUNA_JOGO).sort_values(ascending=False)
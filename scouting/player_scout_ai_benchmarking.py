@@ -1,8 +1,12 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
-from fuzzywuzzy import fuzz
+import time
 import plotly.express as px
+from filter_index import FilterIndex
+from name_index import NameIndex
+from scout_data import COLUNAS_CATEGORICAS, read_parquet_projected
+from scout_index import IncrementalPlayerIndex
 
 # --- Configuração da Página ---
 st.set_page_config(
@@ -44,6 +48,42 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- Carregamento de Dados com Tratamento Robustecido ---
+# Métricas de contagem convertidas para valores por 90 minutos
+PER90_METRICS = ['goals', 'assists', 'keyPasses', 'tackles', 'interceptions', 'shotsOnTarget']
+# Métricas com tabela de percentis pré-calculada (contagens já em p90)
+PERCENTILE_METRICS = [f'{m}_p90' for m in PER90_METRICS] + [
+    'accuratePassesPercentage', 'minutesPlayed', 'market_value'
+]
+# Espaço de similaridade para o ranking da aba Comparação
+SIMILARITY_FEATURES = [f'{m}_p90' for m in PER90_METRICS] + ['accuratePassesPercentage']
+
+def add_percentile_tables(df):
+    """Acrescenta colunas p90 e percentis por posição (e por liga + posição, se houver liga), calculados uma única vez"""
+    minutes_played = df['minutesPlayed'].replace(0, 1)  # Evita divisão por zero
+    for metric in PER90_METRICS:
+        df[f'{metric}_p90'] = (df[metric] / minutes_played * 90).astype(np.float32)
+    
+    # Posição principal: primeira da lista ("MC, DM" -> "MC")
+    df['main_position'] = df['position'].astype(str).str.split(',').str[0].str.strip().astype('category')
+    
+    groups = {'pos': ['main_position']}
+    if 'league' in df.columns:
+        groups['league'] = ['league', 'main_position']
+    for suffix, keys in groups.items():
+        ranks = df.groupby(keys, observed=True)[PERCENTILE_METRICS].rank(pct=True) * 100
+        ranks.columns = [f'pct_{suffix}_{m}' for m in PERCENTILE_METRICS]
+        df[ranks.columns] = ranks.astype(np.float32)
+    return df
+
+def metric_column(metric, basis):
+    """Nome da coluna pré-calculada para a métrica na base de comparação escolhida"""
+    if basis == 'total':
+        return metric
+    per90 = f'{metric}_p90' if metric in PER90_METRICS else metric
+    if basis == 'p90':
+        return per90
+    return f'pct_{basis}_{per90}'
+
 @st.cache_resource
 def load_data():
     try:
@@ -53,11 +93,14 @@ def load_data():
             'goals', 'assists', 'keyPasses', 'tackles', 'interceptions',
             'accuratePassesPercentage', 'shotsOnTarget', 'minutesPlayed'
         ]
+        # Colunas usadas quando existirem no arquivo
+        optional_cols = ['league', 'player.proposedMarketValue']
         
-        # Tenta carregar o DataFrame
-        df = pd.read_parquet(
+        # Tenta carregar o DataFrame (colunas inexistentes são ignoradas na leitura)
+        df = read_parquet_projected(
             'https://github.com/rafacstein/profutstat/raw/main/scouting/final_merged_data.parquet',
-            columns=essential_cols
+            colunas=essential_cols + optional_cols,
+            colunas_categoricas=COLUNAS_CATEGORICAS + ['league']
         )
         
         # Verifica se todas as colunas essenciais existem
@@ -81,43 +124,63 @@ def load_data():
         numeric_cols = df.select_dtypes(include=[np.number]).columns
         df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].median())
         
+        df = add_percentile_tables(df)
+        # Versão do dataset: seleções guardadas na sessão só valem para a versão em que foram feitas
+        df.attrs['version'] = time.time_ns()
         return df
         
     except Exception as e:
         st.error(f"Erro crítico ao carregar dados: {str(e)}")
         st.stop()
 
+@st.cache_resource
+def load_name_index():
+    # Construído uma vez por processo; as buscas não varrem mais o dataset a cada rerun
+    return NameIndex(df['name'], df['team'])
+
+@st.cache_resource
+def load_similarity_vectors():
+    # Mesmo pipeline do índice dos apps de scouting (padronização + L2), uma linha por jogador de df
+    model = IncrementalPlayerIndex(SIMILARITY_FEATURES).fit(df[SIMILARITY_FEATURES])
+    return model.transform(df[SIMILARITY_FEATURES])
+
+@st.cache_resource
+def load_filter_index():
+    # Bitmaps por posição e arrays ordenados de idade/valor (mesmo motor dos apps de scouting)
+    return FilterIndex(df, colunas_faixa=('age', 'market_value'))
+
 df = load_data()
+name_index = load_name_index()
+filter_index = load_filter_index()
+similarity_vectors = load_similarity_vectors()
 
 # --- Funções Auxiliares ---
-def find_player(name, team=None):
-    """Encontra jogador usando fuzzy matching com tratamento robusto"""
+def find_player_candidates(name, team=None, limit=5):
+    """Retorna até `limit` tuplas (índice, score) com score >= 70, do mais parecido ao menos parecido"""
     if not name or not isinstance(name, str):
-        return None
+        return []
     
     try:
-        df_temp = df.copy()
-        df_temp['name_sim'] = df_temp['name'].apply(lambda x: fuzz.token_set_ratio(name, str(x)))  # Garante conversão para string
-        
-        if team and isinstance(team, str):
-            df_temp['team_sim'] = df_temp['team'].apply(
-                lambda x: fuzz.token_set_ratio(team, str(x)))
-            df_temp['score'] = 0.7 * df_temp['name_sim'] + 0.3 * df_temp['team_sim']
-        else:
-            df_temp['score'] = df_temp['name_sim']
-        
-        best_match = df_temp.nlargest(1, 'score')
-        
-        if not best_match.empty and best_match['score'].iloc[0] >= 70:
-            return best_match.index[0]
-        return None
+        team = team if team and isinstance(team, str) else None
+        return [(idx, score) for idx, score in name_index.search(name, team, limit) if score >= 70]
         
     except Exception as e:
         st.error(f"Erro ao buscar jogador: {str(e)}")
+        return []
+
+def save_selection(key, rows):
+    """Guarda na sessão só posições de linha do frame compartilhado, junto com a versão do dataset"""
+    st.session_state[key] = {'version': df.attrs['version'], 'rows': rows}
+
+def load_selection(key):
+    """Posições guardadas na sessão, ou None se ausentes ou feitas sobre outra versão do dataset"""
+    selection = st.session_state.get(key)
+    if selection is None or selection['version'] != df.attrs['version']:
         return None
+    return selection['rows']
 
 def filter_players(position=None, min_age=18, max_age=40, min_value=0, max_value=100):
-    """Filtra jogadores com verificação de tipos"""
+    """Filtra jogadores com verificação de tipos; retorna as posições (int32) das linhas em df"""
     try:
         # Verifica tipos dos parâmetros
         min_age = int(min_age)
@@ -125,26 +188,40 @@ def filter_players(position=None, min_age=18, max_age=40, min_value=0, max_value
         min_value = float(min_value)
         max_value = float(max_value)
         
-        mask = (
-            (df['age'] >= min_age) & 
-            (df['age'] <= max_age) &
-            (df['market_value'] >= min_value * 1_000_000) &
-            (df['market_value'] <= max_value * 1_000_000)
-        )
+        if position and not isinstance(position, (list, tuple)):
+            position = [position]
         
-        if position:
-            if not isinstance(position, (list, tuple)):
-                position = [position]
-            mask &= df['position'].isin(position)
+        allowed = filter_index.filtrar(
+            categorias={'position': position},
+            faixas={'age': (min_age, max_age), 'market_value': (min_value * 1_000_000, max_value * 1_000_000)}
+        )
         
-        return df[mask].copy()
+        # Rótulos do bitmap -> posições de linha em df
+        return df.index.get_indexer(filter_index.para_rotulos(allowed)).astype(np.int32)
         
     except Exception as e:
         st.error(f"Erro ao filtrar jogadores: {str(e)}")
-        return pd.DataFrame()
+        return np.array([], dtype=np.int32)
+
+def rank_players(ref_row, candidate_rows, rank_by, k=10):
+    """Top-k das posições candidatas (sem a referência) por similaridade ou por uma coluna, com ordenação parcial"""
+    candidate_rows = candidate_rows[candidate_rows != ref_row]
+    if len(candidate_rows) == 0:
+        return candidate_rows
+    
+    if rank_by == 'similarity':
+        scores = similarity_vectors[candidate_rows] @ similarity_vectors[ref_row]
+    else:
+        scores = df[rank_by].to_numpy()[candidate_rows].astype(np.float64)
+    scores = np.nan_to_num(scores, nan=-np.inf)
+    
+    # argpartition separa os k maiores em O(n); só eles são ordenados
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return candidate_rows[top[np.argsort(-scores[top], kind='stable')]]
 
 def create_comparison_data(ref_player, compare_players, metrics):
-    """Cria dados para comparação com verificação de colunas"""
+    """Cria dados para comparação (formato longo + percentil no grupo) com verificação de colunas"""
     try:
         # Verifica se as métricas existem no DataFrame
         valid_metrics = [m for m in metrics if m in df.columns]
@@ -152,27 +229,22 @@ def create_comparison_data(ref_player, compare_players, metrics):
             st.warning("Nenhuma métrica válida selecionada")
             return pd.DataFrame()
         
-        # Prepara dados
-        data = []
-        for metric in valid_metrics:
-            # Adiciona referência
-            data.append({
-                'Metric': metric,
-                'Type': 'Referência',
-                'Value': ref_player[metric],
-                'Player': ref_player['name']
-            })
-            
-            # Adiciona jogadores comparados
-            for _, player in compare_players.iterrows():
-                data.append({
-                    'Metric': metric,
-                    'Type': 'Comparação',
-                    'Value': player[metric],
-                    'Player': player['name']
-                })
+        # Referência + comparados num único frame; percentis calculados sobre esse grupo
+        players = pd.concat(
+            [ref_player[['name'] + valid_metrics].to_frame().T, compare_players[['name'] + valid_metrics]],
+            ignore_index=True
+        )
+        players[valid_metrics] = players[valid_metrics].astype(float)
+        players['Type'] = 'Comparação'
+        players.loc[0, 'Type'] = 'Referência'
+        percentiles = players[valid_metrics].rank(pct=True) * 100
         
-        return pd.DataFrame(data)
+        # Formato longo com um único melt (métrica a métrica, referência primeiro)
+        data = players.rename(columns={'name': 'Player'}).melt(
+            id_vars=['Player', 'Type'], value_vars=valid_metrics, var_name='Metric', value_name='Value'
+        )
+        data['Percentile'] = percentiles.to_numpy().ravel(order='F')
+        return data[['Metric', 'Type', 'Value', 'Player', 'Percentile']]
         
     except Exception as e:
         st.error(f"Erro ao preparar dados: {str(e)}")
@@ -197,11 +269,22 @@ with tab1:
         team_name = st.text_input("Clube (opcional)", key="team_name")
         
         if player_name:
-            player_id = find_player(player_name, team_name)
+            candidates = find_player_candidates(player_name, team_name)
+            player_id = None
+            if len(candidates) > 1:
+                player_id = st.selectbox(
+                    "Jogadores encontrados",
+                    options=[idx for idx, _ in candidates],
+                    format_func=lambda idx: f"{df.at[idx, 'name']} ({df.at[idx, 'team']})",
+                    key="player_candidate"
+                )
+            elif candidates:
+                player_id = candidates[0][0]
             
             if player_id is not None:
-                ref_player = df.loc[player_id]
-                st.session_state['ref_player'] = ref_player
+                ref_row = df.index.get_loc(player_id)
+                save_selection('ref_player', ref_row)
+                ref_player = df.iloc[ref_row]
                 
                 st.markdown(f"""
                 <div class="metric-card">
@@ -214,7 +297,7 @@ with tab1:
                 """, unsafe_allow_html=True)
             else:
                 st.warning("Jogador não encontrado. Verifique o nome e tente novamente.")
-                st.session_state['ref_player'] = None
+                save_selection('ref_player', None)
     
     with col2:
         st.subheader("Filtros de Busca")
@@ -241,7 +324,7 @@ with tab1:
         
         if st.button("Buscar Jogadores", type="primary", key="search_button"):
             with st.spinner("Buscando jogadores..."):
-                compare_players = filter_players(
+                compare_rows = filter_players(
                     position=positions,
                     min_age=min_age,
                     max_age=max_age,
@@ -249,22 +332,22 @@ with tab1:
                     max_value=max_value
                 )
                 
-                st.session_state['compare_players'] = compare_players
+                save_selection('compare_players', compare_rows)
                 
-                if not compare_players.empty:
-                    st.success(f"Encontrados {len(compare_players)} jogadores")
+                if len(compare_rows):
+                    st.success(f"Encontrados {len(compare_rows)} jogadores")
                 else:
                     st.warning("Nenhum jogador encontrado com os critérios selecionados")
 
 with tab2:
-    if 'ref_player' not in st.session_state or st.session_state['ref_player'] is None:
+    ref_row = load_selection('ref_player')
+    compare_rows = load_selection('compare_players')
+    if ref_row is None:
         st.warning("Por favor, selecione um jogador de referência na aba 'Busca'")
-    elif 'compare_players' not in st.session_state or st.session_state['compare_players'].empty:
+    elif compare_rows is None or len(compare_rows) == 0:
         st.warning("Nenhum jogador encontrado para comparação. Ajuste os filtros e tente novamente.")
     else:
-        ref_player = st.session_state['ref_player']
-        compare_players = st.session_state['compare_players'].head(10)  # Limita a 10 para visualização
-        
+        ref_player = df.iloc[ref_row]
         st.subheader(f"Comparação com {ref_player['name']}")
         
         # Seleção de métricas
@@ -281,7 +364,39 @@ with tab2:
             key="metrics_select"
         )
         
+        basis_options = {
+            'total': "Totais",
+            'p90': "Por 90 minutos",
+            'pos': "Percentil na posição"
+        }
+        if 'league' in df.columns:
+            basis_options['league'] = "Percentil na liga (mesma posição)"
+        basis = st.radio(
+            "Base de comparação",
+            options=list(basis_options),
+            format_func=basis_options.get,
+            horizontal=True,
+            key="comparison_basis"
+        )
+        
+        rank_options = {'similarity': "Similaridade com a referência"}
+        rank_options.update({m: m for m in available_metrics})
+        rank_by = st.selectbox(
+            "Ordenar por",
+            options=list(rank_options),
+            format_func=rank_options.get,
+            key="rank_by"
+        )
+        if rank_by != 'similarity':
+            rank_by = metric_column(rank_by, basis)
+        
+        # Os 10 mais relevantes do conjunto filtrado
+        compare_players = df.iloc[rank_players(ref_row, compare_rows, rank_by, k=10)]
+        
         if selected_metrics:
+            # Colunas pré-calculadas na carga: só lookups aqui
+            selected_metrics = [metric_column(m, basis) for m in selected_metrics]
+            
             # Cria dados para comparação
             comparison_data = create_comparison_data(ref_player, compare_players, selected_metrics)
             
@@ -290,6 +405,7 @@ with tab2:
                 fig = px.bar(
                     comparison_data,
                     x='Metric', y='Value', color='Player', barmode='group',
+                    hover_data={'Percentile': ':.0f'},
                     title=f"Comparação com {ref_player['name']}",
                     height=500
                 )
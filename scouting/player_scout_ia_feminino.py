@@ -1,12 +1,16 @@
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler, Normalizer, PowerTransformer
-import faiss
+from sklearn.preprocessing import PowerTransformer
 import streamlit as st
 from fuzzywuzzy import fuzz
 import io
+import time
 import plotly.express as px
 
+from filter_index import FilterIndex
+from scout_data import attach_details, read_parquet_projected, score_per_value
+from scout_index import CHAVE_ATLETA, PERFIS_SIMILARIDADE, IncrementalPlayerIndex, merge_new_rows
+
 # --- Multilingual Text Strings ---
 # É CRUCIAL que esses dicionários sejam definidos ANTES de st.set_page_config
 TEXT_PT = {
@@ -26,6 +30,9 @@ TEXT_PT = {
     "position_help": "Selecione uma ou mais posições para filtrar as jogadoras.",
     "min_age_input": "Idade Mínima",
     "max_age_input": "Idade Máxima",
+    "similarity_profile_select": "Perfil de Similaridade",
+    "similarity_profile_help": "Dá mais peso às métricas que definem o perfil procurado ao comparar com a jogadora de referência.",
+    "balanced_profile_option": "Equilibrado (todas as métricas)",
     "generate_recommendations_button": "Gerar Recomendações",
     "generating_spinner": "Gerando recomendações, por favor aguarde...",
     "results_header": "Jogadoras Recomendadas",
@@ -84,6 +91,9 @@ TEXT_EN = {
     "position_help": "Select one or more positions to filter players.",
     "min_age_input": "Minimum Age",
     "max_age_input": "Maximum Age",
+    "similarity_profile_select": "Similarity Profile",
+    "similarity_profile_help": "Gives more weight to the metrics that define the target profile when comparing with the reference player.",
+    "balanced_profile_option": "Balanced (all metrics)",
     "generate_recommendations_button": "Generate Recommendations",
     "generating_spinner": "Generating recommendations, please wait...",
     "results_header": "Recommended Players",
@@ -142,6 +152,9 @@ TEXT_IT = {
     "position_help": "Seleziona una o più posizioni per filtrare le giocatrici.",
     "min_age_input": "Età Minima",
     "max_age_input": "Età Massima",
+    "similarity_profile_select": "Profilo di Similarità",
+    "similarity_profile_help": "Dà più peso alle metriche che definiscono il profilo cercato nel confronto con la giocatrice di riferimento.",
+    "balanced_profile_option": "Bilanciato (tutte le metriche)",
     "generate_recommendations_button": "Genera Raccomandazioni",
     "generating_spinner": "Generazione raccomandazioni, attendere prego...",
     "results_header": "Giocatrici Raccomandate",
@@ -280,27 +293,39 @@ colunas_numericas_originais = [
     "goalKicks","ballRecovery", "appearances", "age", "player.height"
 ]
 
-@st.cache_resource
-def load_data_and_model(lang_text, original_numeric_cols):
-    """Loads data, preprocesses, and initializes the scaler and FAISS index."""
-    try:
-        df = pd.read_parquet('https://github.com/rafacstein/profutstat/raw/main/scouting/final_merged_data_feminino.parquet')
-    except Exception as e:
-        st.error(lang_text["data_load_error"].format(error_message=e))
-        st.stop()
+DATA_URL = 'https://github.com/rafacstein/profutstat/raw/main/scouting/final_merged_data_feminino.parquet'
+SYNC_INTERVAL_SECONDS = 30 * 60 # How often to look for a new round of data
+
+# Columns converted to per 90 minutes (p90)
+# Exclude percentages, ratings, age, height, and already per-90 metrics like scoringFrequency
+cols_to_p90 = [
+    "goals", "bigChancesCreated", "bigChancesMissed", "assists", "accuratePasses", "inaccuratePasses", "totalPasses", "keyPasses", "successfulDribbles",
+    "tackles", "interceptions", "yellowCards", "redCards", "accurateCrosses",
+    "totalShots", "shotsOnTarget", "shotsOffTarget", "groundDuelsWon", "aerialDuelsWon", "totalDuelsWon",
+    "penaltiesTaken", "penaltyGoals", "shotFromSetPiece", "freeKickGoal",
+    "goalsFromInsideTheBox", "goalsFromOutsideTheBox", "shotsFromInsideTheBox", "shotsFromOutsideTheBox",
+    "headedGoals", "leftFootGoals", "rightFootGoals", "accurateLongBalls", "clearances", "errorLeadToGoal",
+    "errorLeadToShot", "dispossessed", "possessionLost", "possessionWonAttThird", "totalChippedPasses",
+    "accurateChippedPasses", "touches", "wasFouled", "fouls", "hitWoodwork", "ownGoals", "dribbledPast",
+    "offsides", "blockedShots", "passToAssist", "cleanSheet",
+     "totalAttemptAssist", "totalContest", "totalCross", "duelLost", "aerialLost", "totalLongBalls", "goalsConceded", "tacklesWon",
+    "totalOwnHalfPasses", "totalOppositionHalfPasses", "expectedGoals",
+    "goalKicks", "ballRecovery"
+]
 
-    missing_columns = [col for col in original_numeric_cols if col not in df.columns]
-    if missing_columns:
-        st.error(lang_text["missing_columns_error"].format(columns=', '.join(missing_columns)))
-        st.info(lang_text["check_column_names_info"])
-        st.stop()
+# Columns kept in memory for search, filters and display; everything else is read on demand
+MODEL_COLUMNS = ['player.name', 'player.team.name', 'position'] + CHAVE_ATLETA + colunas_numericas_originais
 
+def prepare_data(df, original_numeric_cols, medians=None):
+    """Coerces and imputes the numeric columns, using the given medians (or the frame's own)."""
     # Ensure selected columns are numeric type before imputation
     for col in original_numeric_cols:
         df[col] = pd.to_numeric(df[col], errors='coerce')
 
     # Fill NaN values with the median of each column for original columns
-    df[original_numeric_cols] = df[original_numeric_cols].fillna(df[original_numeric_cols].median())
+    if medians is None:
+        medians = df[original_numeric_cols].median()
+    df[original_numeric_cols] = df[original_numeric_cols].fillna(medians)
 
     # Handle cases where an entire column might be NaN even after median
     df[original_numeric_cols] = df[original_numeric_cols].fillna(0)
@@ -308,95 +333,142 @@ def load_data_and_model(lang_text, original_numeric_cols):
     # Replace infinite values with NaN, then fill those NaNs
     df[original_numeric_cols] = df[original_numeric_cols].replace([np.inf, -np.inf], np.nan)
     df[original_numeric_cols] = df[original_numeric_cols].fillna(0)
+    return df, medians
 
-
-    # --- FEATURE ENGINEERING: Convert to per 90 minutes (p90) and apply transformations ---
-    # Create a copy to work on processed features for the model, keep original df intact
-    df_processed = df.copy()
-
+def build_features(df, original_numeric_cols):
+    """
+    Per 90 minutes (p90) feature engineering. Returns the processed frame (model features only,
+    float32, same index as df) and the model feature list.
+    """
     # Ensure 'minutesPlayed' is not zero to avoid division by zero
-    df_processed['minutesPlayed'] = df_processed['minutesPlayed'].replace(0, 1) # Replace 0 with 1 to avoid division by zero
-
-    # List of columns to convert to per 90 minutes
-    # Exclude percentages, ratings, age, height, and already per-90 metrics like scoringFrequency
-    cols_to_p90 = [
-        "goals", "bigChancesCreated", "bigChancesMissed", "assists", "accuratePasses", "inaccuratePasses", "totalPasses", "keyPasses", "successfulDribbles",
-        "tackles", "interceptions", "yellowCards", "redCards", "accurateCrosses",
-        "totalShots", "shotsOnTarget", "shotsOffTarget", "groundDuelsWon", "aerialDuelsWon", "totalDuelsWon",
-        "penaltiesTaken", "penaltyGoals", "shotFromSetPiece", "freeKickGoal",
-        "goalsFromInsideTheBox", "goalsFromOutsideTheBox", "shotsFromInsideTheBox", "shotsFromOutsideTheBox",
-        "headedGoals", "leftFootGoals", "rightFootGoals", "accurateLongBalls", "clearances", "errorLeadToGoal",
-        "errorLeadToShot", "dispossessed", "possessionLost", "possessionWonAttThird", "totalChippedPasses",
-        "accurateChippedPasses", "touches", "wasFouled", "fouls", "hitWoodwork", "ownGoals", "dribbledPast",
-        "offsides", "blockedShots", "passToAssist", "cleanSheet",
-         "totalAttemptAssist", "totalContest", "totalCross", "duelLost", "aerialLost", "totalLongBalls", "goalsConceded", "tacklesWon",
-        "totalOwnHalfPasses", "totalOppositionHalfPasses", "expectedGoals",
-        "goalKicks", "ballRecovery"
-    ]
+    minutes_played = df['minutesPlayed'].replace(0, 1) # Replace 0 with 1 to avoid division by zero
 
     # New list of features to be used by the model
     features_for_model = []
+    processed_columns = {}
 
     for col in original_numeric_cols:
         if col in cols_to_p90:
             new_col_name = f"{col}_p90"
-            df_processed[new_col_name] = (df_processed[col] / df_processed['minutesPlayed']) * 90
+            processed_columns[new_col_name] = (df[col] / minutes_played) * 90
             features_for_model.append(new_col_name)
         elif "Percentage" in col or col in ["rating", "totalRating", "countRating", "age", "player.height", "matchesStarted", "totwAppearances", "appearances", "scoringFrequency", "penaltyConversion", "setPieceConversion"]:
             # Keep percentages, ratings, age, height, matchesStarted, appearances as is
+            processed_columns[col] = df[col]
             features_for_model.append(col)
         # Exclude minutesPlayed itself, as it's used for normalization
 
+    # Keep only the model features, instead of a full copy of the original df
+    df_processed = pd.DataFrame(processed_columns, index=df.index).astype(np.float32)
+
     # Optional: Apply log transform to some p90 features that might still have skewed distributions
     # Example (adjust based on your data distribution):
     # for col in ["goals_p90", "assists_p90", "shots_p90", "keyPasses_p90"]:
     #    if col in features_for_model: # Ensure the p90 column exists
     #        df_processed[col] = np.log1p(df_processed[col])
 
+    return df_processed, features_for_model
+
+@st.cache_resource
+def load_data_and_model(lang_text, original_numeric_cols):
+    """Loads data, preprocesses, and initializes the transformers and the incremental FAISS index."""
+    try:
+        df = read_parquet_projected(DATA_URL, MODEL_COLUMNS)
+    except Exception as e:
+        st.error(lang_text["data_load_error"].format(error_message=e))
+        st.stop()
+
+    missing_columns = [col for col in original_numeric_cols if col not in df.columns]
+    if missing_columns:
+        st.error(lang_text["missing_columns_error"].format(columns=', '.join(missing_columns)))
+        st.info(lang_text["check_column_names_info"])
+        st.stop()
+
+    df, medians = prepare_data(df, original_numeric_cols)
+
+    # --- FEATURE ENGINEERING: Convert to per 90 minutes (p90) and apply transformations ---
+    df_processed, features_for_model = build_features(df, original_numeric_cols)
+
     # Apply PowerTransformer to all features for model after p90 conversion
     # This helps in handling skewed data better than just StandardScaler
-    # Use float64 for PowerTransformer input to avoid overflow issues during transformation
-    power_transformer = PowerTransformer(method='yeo-johnson') # Yeo-Johnson handles zeros and negative values
+    # Then StandardScaler for final scaling and L2 normalization for cosine similarity
+    model = IncrementalPlayerIndex(
+        features_for_model,
+        pre_transformer_factory=lambda: PowerTransformer(method='yeo-johnson'), # Yeo-Johnson handles zeros and negative values
+        profiles=PERFIS_SIMILARIDADE # Precomputed weighted index per similarity profile
+    )
     try:
-        X_processed = power_transformer.fit_transform(df_processed[features_for_model].astype(np.float64))
+        model.fit(df_processed)
     except ValueError as e:
         st.error(f"Erro ao aplicar PowerTransformer: {e}. Isso pode ocorrer se uma coluna tiver todos os valores iguais.")
-        # Fallback to StandardScaler if PowerTransformer fails
+        # Fallback to StandardScaler only if PowerTransformer fails
         st.warning("Voltando para StandardScaler. Verifique se há colunas com valores constantes.")
-        scaler = StandardScaler()
-        X_processed = scaler.fit_transform(df_processed[features_for_model].astype(np.float64))
-        # Keep track of the actual scaler used
-        st.session_state['transformer_used'] = scaler
-    else:
-        # If PowerTransformer was successful, save it
-        st.session_state['transformer_used'] = power_transformer
+        model = IncrementalPlayerIndex(features_for_model, profiles=PERFIS_SIMILARIDADE).fit(df_processed)
 
-    # Now apply StandardScaler for final scaling
-    scaler = StandardScaler()
-    dados_normalizados = scaler.fit_transform(X_processed)
-    
-    # --- L2 Normalization for Cosine Similarity (as you had) ---
-    normalizer = Normalizer(norm='l2')
-    dados_normalizados = normalizer.fit_transform(dados_normalizados)
-    dados_normalizados = dados_normalizados.astype('float32') # FAISS requires float32
-
-    dimension = dados_normalizados.shape[1]
-    index = faiss.IndexFlatIP(dimension) # IndexFlatIP for cosine similarity
-    index.add(dados_normalizados)
+    # Position bitmaps and sorted age array, shared across sessions
+    filters = FilterIndex(df)
 
     # Store the actual features used for the model, and the original features for comparison
-    return df, scaler, index, dados_normalizados, features_for_model, df_processed
+    return {
+        'df': df, 'df_processed': df_processed, 'model': model, 'filters': filters,
+        'features_for_model': features_for_model, 'medians': medians,
+        # data_version only changes when a sync actually adds/changes players (key of the details cache)
+        'last_sync': time.time(), 'data_version': 0
+    }
+
+def sync_data(data, original_numeric_cols):
+    """
+    Applies a new round of the parquet without refitting: new players are appended and
+    changed players get their vectors replaced in the index. A full refit only happens
+    when the drift of the scaler means/variances exceeds the model thresholds.
+    """
+    model = data['model']
+    if time.time() - data['last_sync'] < SYNC_INTERVAL_SECONDS:
+        return
+    with model.lock:
+        if time.time() - data['last_sync'] < SYNC_INTERVAL_SECONDS:
+            return # Another session already synced
+        data['last_sync'] = time.time()
+        try:
+            df_new, _ = prepare_data(read_parquet_projected(DATA_URL, MODEL_COLUMNS), original_numeric_cols, data['medians'])
+        except Exception:
+            return # Keep the current data; retry on the next interval
+
+        df, changed = merge_new_rows(data['df'], df_new, original_numeric_cols)
+        if len(changed):
+            changed_processed, _ = build_features(df.loc[changed], original_numeric_cols)
+            df_processed = data['df_processed'].drop(index=changed, errors='ignore')
+            df_processed = pd.concat([df_processed, changed_processed]).reindex(df.index)
+            model.upsert(changed_processed)
+            if model.needs_refit():
+                model.refit()
+            data['df_processed'] = df_processed
+            data['filters'] = FilterIndex(df)
+            data['data_version'] += 1
+        data['df'] = df
+
+@st.cache_resource(max_entries=1)
+def load_details(version):
+    """Columns only used by the full stats table / downloads, read the first time they are needed."""
+    return read_parquet_projected(DATA_URL, excluir=[c for c in MODEL_COLUMNS if c not in CHAVE_ATLETA])
 
 # Pass current_lang_text and colunas_numericas_originais to the cached function
-# Note: df_processed is also returned now, it contains the _p90 features
-df, scaler, faiss_index, dados_normalizados, features_for_model, df_processed = load_data_and_model(current_lang_text, colunas_numericas_originais)
+# Note: df_processed is also kept, it contains the _p90 features
+data = load_data_and_model(current_lang_text, colunas_numericas_originais)
+sync_data(data, colunas_numericas_originais)
+df = data['df']
+df_processed = data['df_processed']
+faiss_index = data['model']
+filters = data['filters']
+features_for_model = data['features_for_model']
 
 # --- Recommendation Function Adapted for Streamlit ---
 
 def recommend_players_advanced(name=None, club=None, top_n=10, position=None,
-                                 min_age=None, max_age=None, lang_text=TEXT_PT):
+                                 min_age=None, max_age=None, lang_text=TEXT_PT, profile=None):
     """
     Recommends similar players with multiple filters using FAISS.
+    `profile` selects one of PERFIS_SIMILARIDADE (per-metric weights); None weighs all features equally.
     Returns: recommendations_display, complete_recommendations, reference_player_id
     """
     
@@ -409,14 +481,13 @@ def recommend_players_advanced(name=None, club=None, top_n=10, position=None,
     player_ref_club = None
 
     if name and club:
-        df_temp = df.copy()
-        df_temp['temp_sim_nome'] = df_temp['player.name'].apply(lambda x: fuzz.token_set_ratio(name, x))
-        df_temp['temp_sim_clube'] = df_temp['player.team.name'].apply(lambda x: fuzz.token_set_ratio(club, x))
-        df_temp['temp_sim_combinada'] = 0.7 * df_temp['temp_sim_nome'] + 0.3 * df_temp['temp_sim_clube']
+        temp_sim_nome = score_per_value(df['player.name'], lambda x: fuzz.token_set_ratio(name, x))
+        temp_sim_clube = score_per_value(df['player.team.name'], lambda x: fuzz.token_set_ratio(club, x))
+        temp_sim_combinada = 0.7 * temp_sim_nome + 0.3 * temp_sim_clube
         
-        best_match = df_temp.nlargest(1, 'temp_sim_combinada')
+        best_match = temp_sim_combinada.nlargest(1)
         
-        if not best_match.empty and best_match['temp_sim_combinada'].iloc[0] >= 80:
+        if not best_match.empty and best_match.iloc[0] >= 80:
             player_id = best_match.index[0]
             player_ref_name = df.loc[player_id, 'player.name']
             player_ref_club = df.loc[player_id, 'player.team.name']
@@ -431,44 +502,25 @@ def recommend_players_advanced(name=None, club=None, top_n=10, position=None,
     else:
         st.info(lang_text["no_reference_player_info"])
 
-    filter_mask = pd.Series(True, index=df.index)
-    
-    if position:
-        filter_mask &= df['position'].isin(position)
-    
-    if min_age is not None:
-        filter_mask &= df['age'] >= min_age
-    if max_age is not None:
-        filter_mask &= df['age'] <= max_age
-    
-    filtered_indices = df[filter_mask].index.tolist()
+    allowed = filters.filtrar(categorias={'position': position}, faixas={'age': (min_age, max_age)})
 
-    if not filtered_indices:
+    if filters.contar(allowed) == 0:
         st.warning(lang_text["no_athletes_match_filters_warning"])
         return pd.DataFrame(), pd.DataFrame(), None
     
     # Get recommendations
     if player_id is not None:
         # Use the processed data for querying FAISS
-        query_vector = dados_normalizados[df.index.get_loc(player_id)].reshape(1, -1)
+        query_vector = faiss_index.vector(player_id, profile)
         
-        # Search in the FAISS index with a larger number of results to filter later
-        D, I = faiss_index.search(query_vector, max(top_n * 5, len(filtered_indices) + 1)) 
+        # The filter bitmap pre-filters the FAISS search (reference player excluded), so top_n results suffice
+        D, I = faiss_index.search(query_vector, top_n, profile=profile, allowed=filters.sem(allowed, [player_id]))
 
-        similarities = D[0]
-        returned_indices = I[0]
-        
-        recommendations_raw = pd.DataFrame({
-            'original_index': returned_indices,
-            'similaridade': similarities
+        final_recommendations = pd.DataFrame({
+            'original_index': I[0],
+            'similaridade': D[0]
         })
-        
-        final_recommendations = recommendations_raw[
-            recommendations_raw['original_index'].isin(filtered_indices) & 
-            (recommendations_raw['original_index'] != player_id) # Exclude the reference player themselves
-        ]
-        
-        final_recommendations = final_recommendations.sort_values(by='similaridade', ascending=False).head(top_n)
+        final_recommendations = final_recommendations[final_recommendations['original_index'] >= 0]
         
         if final_recommendations.empty:
             st.info(lang_text["no_similar_recommendations_info"].format(player_name=player_ref_name))
@@ -483,6 +535,7 @@ def recommend_players_advanced(name=None, club=None, top_n=10, position=None,
         )
         
     else:
+        filtered_indices = filters.para_rotulos(allowed)
         st.info(lang_text["showing_filtered_athletes_info"])
         if len(filtered_indices) < top_n:
             st.info(lang_text["only_x_athletes_found_info"].format(count=len(filtered_indices)))
@@ -492,7 +545,8 @@ def recommend_players_advanced(name=None, club=None, top_n=10, position=None,
         recommendations_df['similaridade'] = np.nan
     
     # --- Prepare full DataFrame for download (BEFORE any display formatting) ---
-    recommendations_for_download = recommendations_df.copy()
+    # Columns not used by the model come from the details table (loaded on demand)
+    recommendations_for_download = attach_details(recommendations_df, load_details(data['data_version']), CHAVE_ATLETA)
 
     # --- Formatting for UI Display ONLY ---
     if 'age' in recommendations_df.columns:
@@ -518,7 +572,7 @@ def recommend_players_advanced(name=None, club=None, top_n=10, position=None,
 
 # --- Function to display detailed similarity analysis ---
 def display_detailed_similarity(ref_player_id, selected_similar_player_original_index,
-                                df_original, df_processed_data, numeric_features_for_model, scaler_model, lang_text):
+                                df_original, df_processed_data, numeric_features_for_model, model, lang_text):
     """
     Displays a detailed comparison and explanation of similarity between two players.
     Uses original and processed data for better insights.
@@ -579,18 +633,9 @@ def display_detailed_similarity(ref_player_id, selected_similar_player_original_
 
     st.subheader(lang_text["similarity_factors_header"])
 
-    # Ensure transformer_used is available in session state if it was stored
-    transformer = st.session_state.get('transformer_used', None)
-    if transformer is None:
-        st.error("Erro: Transformer não encontrado na sessão. Recarregue a página.")
-        return
-
-    # Use df_processed_data for feature transformation
-    ref_vector_pre_normalizer = transformer.transform(df_processed_data.loc[ref_player_id, numeric_features_for_model].values.reshape(1, -1))
-    ref_vector_pre_normalizer = scaler_model.transform(ref_vector_pre_normalizer)[0] # Apply StandardScaler
-
-    similar_vector_pre_normalizer = transformer.transform(df_processed_data.loc[selected_similar_player_original_index, numeric_features_for_model].values.reshape(1, -1))
-    similar_vector_pre_normalizer = scaler_model.transform(similar_vector_pre_normalizer)[0] # Apply StandardScaler
+    # Use df_processed_data for feature transformation (transformer + StandardScaler, before L2 normalization)
+    ref_vector_pre_normalizer = model.scaled(df_processed_data.loc[[ref_player_id]])[0]
+    similar_vector_pre_normalizer = model.scaled(df_processed_data.loc[[selected_similar_player_original_index]])[0]
 
     # Calculate absolute differences of the *scaled* features for contribution analysis
     # Using absolute difference directly for easier interpretation of "similarity"
@@ -679,6 +724,13 @@ with col_filters:
     with col_max_age:
         max_age_val = st.number_input(current_lang_text["max_age_input"], min_value=15, max_value=45, value=35, step=1)
 
+    selected_profile = st.selectbox(
+        current_lang_text["similarity_profile_select"],
+        options=[None] + list(PERFIS_SIMILARIDADE),
+        format_func=lambda x: current_lang_text["balanced_profile_option"] if x is None else x,
+        help=current_lang_text["similarity_profile_help"]
+    )
+
 st.markdown("---")
 
 # Recommendation Button
@@ -691,7 +743,8 @@ if st.button(current_lang_text["generate_recommendations_button"], type="primary
             min_age=min_age_val,
             max_age=max_age_val,
             top_n=10,
-            lang_text=current_lang_text
+            lang_text=current_lang_text,
+            profile=selected_profile
         )
         
         st.session_state['recommendations_display'] = recommendations_display
@@ -772,7 +825,7 @@ if 'search_executed' in st.session_state and st.session_state['search_executed']
                     df_original=df, # Pass original df
                     df_processed_data=df_processed, # Pass processed df
                     numeric_features_for_model=features_for_model, # Pass the list of features used in the model
-                    scaler_model=scaler, # Pass the scaler model
+                    model=faiss_index, # Pass the fitted model (transformers + index)
                     lang_text=current_lang_text_session
                 )
             else:
@@ -1,10 +1,13 @@
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler, Normalizer
-import faiss
 import streamlit as st
 from fuzzywuzzy import fuzz
 import io
+import time
+
+from filter_index import FilterIndex
+from scout_data import attach_details, read_parquet_projected, score_per_value
+from scout_index import CHAVE_ATLETA, PERFIS_SIMILARIDADE, IncrementalPlayerIndex, merge_new_rows
 
 # --- Configuração da Página Streamlit ---
 st.set_page_config(
@@ -120,50 +123,45 @@ st.markdown(
 
 # --- Carregamento de Dados e Inicialização do Modelo (Cacheado para Performance) ---
 
-@st.cache_resource
-def load_data_and_model():
-    """Carrega os dados e inicializa o scaler e o índice FAISS."""
-    try:
-        df = pd.read_parquet('https://github.com/rafacstein/profutstat/raw/main/scouting/final_merged_data.parquet')
-    except Exception as e:
-        st.error(f"Erro ao carregar o arquivo de dados. Por favor, verifique o link ou a conexão: {e}")
-        st.stop()
-
-    colunas_numericas = [
-        "rating", "totalRating", "countRating", "goals", "bigChancesCreated", "bigChancesMissed", "assists",
-        "goalsAssistsSum", "accuratePasses", "inaccuratePasses", "totalPasses", "accuratePassesPercentage",
-        "accurateOwnHalfPasses", "accurateOppositionHalfPasses", "accurateFinalThirdPasses", "keyPasses", # Corrected a typo here: accurateOppositionHalfPasses
-        "successfulDribbles", "successfulDribblesPercentage", "tackles", "interceptions", "yellowCards",
-        "directRedCards", "redCards", "accurateCrosses", "accurateCrossesPercentage", "totalShots", "shotsOnTarget",
-        "shotsOffTarget", "groundDuelsWon", "groundDuelsWonPercentage", "aerialDuelsWon", "aerialDuelsWonPercentage",
-        "totalDuelsWon", "totalDuelsWonPercentage", "minutesPlayed", "goalConversionPercentage", "penaltiesTaken",
-        "penaltyGoals", "penaltyWon", "penaltyConceded", "shotFromSetPiece", "freeKickGoal", "goalsFromInsideTheBox",
-        "goalsFromOutsideTheBox", "shotsFromInsideTheBox", "shotsFromOutsideTheBox", "headedGoals", "leftFootGoals",
-        "rightFootGoals", "accurateLongBalls", "accurateLongBallsPercentage", "clearances", "errorLeadToGoal",
-        "errorLeadToShot", "dispossessed", "possessionLost", "possessionWonAttThird", "totalChippedPasses",
-        "accurateChippedPasses", "touches", "wasFouled", "fouls", "hitWoodwork", "ownGoals", "dribbledPast",
-        "offsides", "blockedShots", "passToAssist", "saves", "cleanSheet", "penaltyFaced", "penaltySave",
-        "savedShotsFromInsideTheBox", "savedShotsFromOutsideTheBox", "goalsConcededInsideTheBox",
-        "goalsConcededOutsideTheBox", "punches", "runsOut", "successfulRunsOut", "highClaims", "crossesNotClaimed",
-        "matchesStarted", "penaltyConversion", "setPieceConversion", "totalAttemptAssist", "totalContest",
-        "totalCross", "duelLost", "aerialLost", "attemptPenaltyMiss", "attemptPenaltyPost", "attemptPenaltyTarget",
-        "totalLongBalls", "goalsConceded", "tacklesWon", "tacklesWonPercentage", "scoringFrequency", "yellowRedCards",
-        "savesCaught", "savesParried", "totalOwnHalfPasses", "totalOppositionHalfPasses", "totwAppearances", "expectedGoals",
-        "goalKicks","ballRecovery", "appearances","player.proposedMarketValue", "age", "player.height"
-    ]
-
-    missing_columns = [col for col in colunas_numericas if col not in df.columns]
-    if missing_columns:
-        st.error(f"Erro: As seguintes colunas numéricas essenciais não foram encontradas no arquivo de dados: **{', '.join(missing_columns)}**")
-        st.info("Por favor, verifique se os nomes das colunas na lista `colunas_numericas` correspondem exatamente aos nomes no seu arquivo Parquet.")
-        st.stop()
-
+URL_DADOS = 'https://github.com/rafacstein/profutstat/raw/main/scouting/final_merged_data.parquet'
+INTERVALO_SINCRONIZACAO = 30 * 60 # Segundos entre verificações de uma nova rodada de dados
+
+colunas_numericas = [
+    "rating", "totalRating", "countRating", "goals", "bigChancesCreated", "bigChancesMissed", "assists",
+    "goalsAssistsSum", "accuratePasses", "inaccuratePasses", "totalPasses", "accuratePassesPercentage",
+    "accurateOwnHalfPasses", "accurateOppositionHalfPasses", "accurateFinalThirdPasses", "keyPasses", # Corrected a typo here: accurateOppositionHalfPasses
+    "successfulDribbles", "successfulDribblesPercentage", "tackles", "interceptions", "yellowCards",
+    "directRedCards", "redCards", "accurateCrosses", "accurateCrossesPercentage", "totalShots", "shotsOnTarget",
+    "shotsOffTarget", "groundDuelsWon", "groundDuelsWonPercentage", "aerialDuelsWon", "aerialDuelsWonPercentage",
+    "totalDuelsWon", "totalDuelsWonPercentage", "minutesPlayed", "goalConversionPercentage", "penaltiesTaken",
+    "penaltyGoals", "penaltyWon", "penaltyConceded", "shotFromSetPiece", "freeKickGoal", "goalsFromInsideTheBox",
+    "goalsFromOutsideTheBox", "shotsFromInsideTheBox", "shotsFromOutsideTheBox", "headedGoals", "leftFootGoals",
+    "rightFootGoals", "accurateLongBalls", "accurateLongBallsPercentage", "clearances", "errorLeadToGoal",
+    "errorLeadToShot", "dispossessed", "possessionLost", "possessionWonAttThird", "totalChippedPasses",
+    "accurateChippedPasses", "touches", "wasFouled", "fouls", "hitWoodwork", "ownGoals", "dribbledPast",
+    "offsides", "blockedShots", "passToAssist", "saves", "cleanSheet", "penaltyFaced", "penaltySave",
+    "savedShotsFromInsideTheBox", "savedShotsFromOutsideTheBox", "goalsConcededInsideTheBox",
+    "goalsConcededOutsideTheBox", "punches", "runsOut", "successfulRunsOut", "highClaims", "crossesNotClaimed",
+    "matchesStarted", "penaltyConversion", "setPieceConversion", "totalAttemptAssist", "totalContest",
+    "totalCross", "duelLost", "aerialLost", "attemptPenaltyMiss", "attemptPenaltyPost", "attemptPenaltyTarget",
+    "totalLongBalls", "goalsConceded", "tacklesWon", "tacklesWonPercentage", "scoringFrequency", "yellowRedCards",
+    "savesCaught", "savesParried", "totalOwnHalfPasses", "totalOppositionHalfPasses", "totwAppearances", "expectedGoals",
+    "goalKicks","ballRecovery", "appearances","player.proposedMarketValue", "age", "player.height"
+]
+
+# Colunas mantidas em memória para busca, filtros e exibição; as demais só são lidas sob demanda
+COLUNAS_MODELO = ['player.name', 'player.team.name', 'position'] + CHAVE_ATLETA + colunas_numericas
+
+def preparar_dados(df, medianas=None):
+    """Converte e imputa as colunas numéricas. Usa as medianas informadas (ou as do próprio df)."""
     # Ensure selected columns are numeric type before imputation
     for col in colunas_numericas:
         df[col] = pd.to_numeric(df[col], errors='coerce') # Coerce non-numeric to NaN
 
     # Fill NaN values with the median of each column
-    df[colunas_numericas] = df[colunas_numericas].fillna(df[colunas_numericas].median())
+    if medianas is None:
+        medianas = df[colunas_numericas].median()
+    df[colunas_numericas] = df[colunas_numericas].fillna(medianas)
 
     # Handle cases where an entire column might be NaN even after median (e.g., if all values were NaN)
     # In such cases, fill with 0 or a sensible default.
@@ -172,32 +170,101 @@ def load_data_and_model():
     # Replace infinite values with NaN, then fill those NaNs
     df[colunas_numericas] = df[colunas_numericas].replace([np.inf, -np.inf], np.nan)
     df[colunas_numericas] = df[colunas_numericas].fillna(0) # Fill any NaNs created from infinite values with 0
+    return df, medianas
 
-    scaler = StandardScaler()
-    dados_normalizados = scaler.fit_transform(df[colunas_numericas])
-    
-    # --- NOVA ETAPA: NORMALIZAÇÃO L2 para garantir que o produto interno seja a similaridade de cosseno ---
-    normalizer = Normalizer(norm='l2')
-    dados_normalizados = normalizer.fit_transform(dados_normalizados)
-    # --- FIM DA NOVA ETAPA ---
+@st.cache_resource
+def load_data_and_model():
+    """Carrega os dados e inicializa o scaler e o índice FAISS incremental."""
+    try:
+        df = read_parquet_projected(URL_DADOS, COLUNAS_MODELO)
+    except Exception as e:
+        st.error(f"Erro ao carregar o arquivo de dados. Por favor, verifique o link ou a conexão: {e}")
+        st.stop()
 
-    dados_normalizados = dados_normalizados.astype('float32') # FAISS precisa de float32
+    missing_columns = [col for col in colunas_numericas if col not in df.columns]
+    if missing_columns:
+        st.error(f"Erro: As seguintes colunas numéricas essenciais não foram encontradas no arquivo de dados: **{', '.join(missing_columns)}**")
+        st.info("Por favor, verifique se os nomes das colunas na lista `colunas_numericas` correspondem exatamente aos nomes no seu arquivo Parquet.")
+        st.stop()
 
-    dimension = dados_normalizados.shape[1]
-    index = faiss.IndexFlatIP(dimension) # IndexFlatIP espera vetores normalizados para similaridade de cosseno
-    index.add(dados_normalizados)
+    df, medianas = preparar_dados(df)
 
-    return df, scaler, index, dados_normalizados
+    # StandardScaler + normalização L2 (produto interno = similaridade de cosseno), com ids = rótulos do df
+    # e um índice ponderado pré-calculado para cada perfil de similaridade
+    modelo = IncrementalPlayerIndex(colunas_numericas, profiles=PERFIS_SIMILARIDADE).fit(df)
 
-df, scaler, faiss_index, dados_normalizados = load_data_and_model()
+    # Bitmaps por posição e arrays ordenados de idade/valor, compartilhados entre sessões
+    filtros = FilterIndex(df)
+
+    # versao_dados só muda quando uma sincronização de fato insere/altera atletas (chave do cache dos detalhes)
+    return {'df': df, 'modelo': modelo, 'filtros': filtros, 'medianas': medianas, 'ultima_sincronizacao': time.time(), 'versao_dados': 0}
+
+def sincronizar_base(base):
+    """
+    Aplica uma nova rodada do parquet sem refazer o ajuste: atletas novos são inseridos e
+    atletas alterados têm o vetor substituído no índice. O refit completo só acontece
+    quando o drift das médias/variâncias do scaler passa do limite.
+    """
+    modelo = base['modelo']
+    if time.time() - base['ultima_sincronizacao'] < INTERVALO_SINCRONIZACAO:
+        return
+    with modelo.lock:
+        if time.time() - base['ultima_sincronizacao'] < INTERVALO_SINCRONIZACAO:
+            return # Outra sessão já sincronizou
+        base['ultima_sincronizacao'] = time.time()
+        try:
+            df_novo, _ = preparar_dados(read_parquet_projected(URL_DADOS, COLUNAS_MODELO), base['medianas'])
+        except Exception:
+            return # Mantém a base atual; nova tentativa no próximo intervalo
+
+        df_atualizado, alterados = merge_new_rows(base['df'], df_novo, colunas_numericas)
+        if len(alterados):
+            modelo.upsert(df_atualizado.loc[alterados])
+            if modelo.needs_refit():
+                modelo.refit()
+            base['filtros'] = FilterIndex(df_atualizado)
+            base['versao_dados'] += 1
+        base['df'] = df_atualizado
+
+@st.cache_resource(max_entries=1)
+def load_detalhes(versao):
+    """Colunas usadas apenas na tabela completa/download, lidas na primeira vez que forem pedidas."""
+    return read_parquet_projected(URL_DADOS, excluir=[c for c in COLUNAS_MODELO if c not in CHAVE_ATLETA])
+
+base = load_data_and_model()
+sincronizar_base(base)
+df = base['df']
+faiss_index = base['modelo']
+filtros = base['filtros']
 
 # --- Função de Recomendação Adaptada para Streamlit ---
 
+def encontrar_atleta(nome, clube):
+    """Retorna o rótulo do atleta com melhor similaridade de nome (70%) e clube (30%), ou None abaixo de 80."""
+    temp_sim_nome = score_per_value(df['player.name'], lambda x: fuzz.token_set_ratio(nome, x))
+    temp_sim_clube = score_per_value(df['player.team.name'], lambda x: fuzz.token_set_ratio(clube, x))
+    temp_sim_combinada = 0.7 * temp_sim_nome + 0.3 * temp_sim_clube
+    
+    melhor_match = temp_sim_combinada.nlargest(1)
+    
+    if not melhor_match.empty and melhor_match.iloc[0] >= 80:
+        return melhor_match.index[0]
+    return None
+
 def recomendar_atletas_avancado(nome=None, clube=None, top_n=10, posicao=None,
                                  idade_min=None, idade_max=None,
-                                 valor_min=None, valor_max=None, strict_posicao=True):
+                                 valor_min=None, valor_max=None, strict_posicao=True,
+                                 referencias_blend=None, peso_principal=1.0, modo_blend='centroid',
+                                 perfil=None):
     """
     Recomenda atletas similares com múltiplos filtros usando FAISS.
+
+    `referencias_blend` é uma lista opcional de (nome, clube, peso) com atletas de referência
+    adicionais ("algo entre o atleta A e o atleta B"). Com mais de uma referência a busca é
+    feita numa única chamada ao índice, pelo centróide ponderado (`modo_blend='centroid'`)
+    ou pela fusão dos rankings de cada referência (`modo_blend='rank_fusion'`).
+
+    `perfil` escolhe um dos PERFIS_SIMILARIDADE (pesos por métrica); None usa todas as métricas com o mesmo peso.
     """
     
     if df is None or faiss_index is None:
@@ -206,73 +273,65 @@ def recomendar_atletas_avancado(nome=None, clube=None, top_n=10, posicao=None,
 
     atleta_id = None
     atleta_ref_name = None
-    atleta_ref_club = None
+    referencias = [] # Lista de (rótulo, peso) das referências encontradas
 
+    pedidos = []
     if nome and clube:
-        df_temp = df.copy() 
-        df_temp['temp_sim_nome'] = df_temp['player.name'].apply(lambda x: fuzz.token_set_ratio(nome, x))
-        df_temp['temp_sim_clube'] = df_temp['player.team.name'].apply(lambda x: fuzz.token_set_ratio(clube, x))
-        df_temp['temp_sim_combinada'] = 0.7 * df_temp['temp_sim_nome'] + 0.3 * df_temp['temp_sim_clube']
-        
-        melhor_match = df_temp.nlargest(1, 'temp_sim_combinada')
-        
-        if not melhor_match.empty and melhor_match['temp_sim_combinada'].iloc[0] >= 80:
-            atleta_id = melhor_match.index[0]
-            atleta_ref = df.loc[atleta_id]
-            atleta_ref_name = atleta_ref['player.name']
-            atleta_ref_club = atleta_ref['player.team.name']
-            st.success(f"🔍 Atleta de Referência: **{atleta_ref_name}** ({atleta_ref_club}) encontrado.")
+        pedidos.append((nome, clube, peso_principal))
+    for nome_extra, clube_extra, peso_extra in referencias_blend or []:
+        if nome_extra and clube_extra and peso_extra > 0:
+            pedidos.append((nome_extra, clube_extra, peso_extra))
+
+    for nome_ref, clube_ref, peso_ref in pedidos:
+        id_encontrado = encontrar_atleta(nome_ref, clube_ref)
+        if id_encontrado is not None:
+            atleta_ref = df.loc[id_encontrado]
+            st.success(f"🔍 Atleta de Referência: **{atleta_ref['player.name']}** ({atleta_ref['player.team.name']}) encontrado.")
             st.info(f"Posição: {atleta_ref['position']} | Idade: **{int(atleta_ref['age'])}** | Valor: **${atleta_ref['player.proposedMarketValue'] / 1_000_000:.2f}M**")
-            
-            if strict_posicao and posicao is None:
-                posicao = [atleta_ref['position']]
+            referencias.append((id_encontrado, peso_ref))
         else:
-            st.warning(f"⚠️ Atleta de referência '{nome}' do clube '{clube}' não encontrado com alta confiança. Buscando apenas por critérios de filtro.")
-            atleta_id = None
+            st.warning(f"⚠️ Atleta de referência '{nome_ref}' do clube '{clube_ref}' não encontrado com alta confiança.")
+
+    if referencias:
+        atleta_id = referencias[0][0]
+        atleta_ref_name = " + ".join(df.loc[[r[0] for r in referencias], 'player.name'])
+        if strict_posicao and posicao is None:
+            posicao = df.loc[[r[0] for r in referencias], 'position'].unique().tolist()
+    elif pedidos:
+        st.warning("Nenhum atleta de referência encontrado. Buscando apenas por critérios de filtro.")
     else:
         st.info("Nenhum atleta de referência fornecido. Buscando recomendações apenas pelos critérios de busca.")
 
-    mascara_filtros = pd.Series(True, index=df.index)
-    
-    if posicao:
-        mascara_filtros &= df['position'].isin(posicao)
-    
-    if idade_min is not None:
-        mascara_filtros &= df['age'] >= idade_min
-    if idade_max is not None:
-        mascara_filtros &= df['age'] <= idade_max
-    
-    if valor_min is not None:
-        mascara_filtros &= df['player.proposedMarketValue'] >= valor_min
-    if valor_max is not None:
-        mascara_filtros &= df['player.proposedMarketValue'] <= valor_max
-    
-    indices_filtrados = df[mascara_filtros].index.tolist()
+    permitidos = filtros.filtrar(
+        categorias={'position': posicao},
+        faixas={'age': (idade_min, idade_max), 'player.proposedMarketValue': (valor_min, valor_max)}
+    )
 
-    if not indices_filtrados:
+    if filtros.contar(permitidos) == 0:
         st.warning("Nenhum atleta corresponde aos filtros especificados. Tente ajustar os critérios.")
         return pd.DataFrame(), pd.DataFrame()
     
     # Obter recomendações
     if atleta_id is not None:
-        query_vector = dados_normalizados[df.index.get_loc(atleta_id)].reshape(1, -1)
-        
-        D, I = faiss_index.search(query_vector, max(top_n * 5, len(indices_filtrados) + 1)) 
-
-        similaridades = D[0]
-        indices_retornados = I[0]
+        ids_referencia = [r[0] for r in referencias]
+        # O bitmap de filtros vai como pré-filtro para o FAISS: todo resultado já atende aos filtros,
+        # então basta pedir top_n (a fusão de rankings recebe uma margem maior por referência)
+        permitidos = filtros.sem(permitidos, ids_referencia)
+        k = top_n * 5 if len(referencias) > 1 and modo_blend == 'rank_fusion' else top_n
+
+        if len(referencias) == 1:
+            D, I = faiss_index.search(faiss_index.vector(atleta_id, perfil), k, profile=perfil, allowed=permitidos)
+            indices_retornados, similaridades = I[0][I[0] >= 0], D[0][I[0] >= 0]
+        else:
+            indices_retornados, similaridades = faiss_index.search_blend(
+                ids_referencia, [r[1] for r in referencias], k, mode=modo_blend, profile=perfil, allowed=permitidos
+            )
         
-        recomendacoes_brutas = pd.DataFrame({
+        # O índice já devolve os resultados em ordem de relevância (similaridade ou fusão de rankings)
+        recomendacoes_finais = pd.DataFrame({
             'original_index': indices_retornados,
             'similaridade': similaridades
-        })
-        
-        recomendacoes_finais = recomendacoes_brutas[
-            recomendacoes_brutas['original_index'].isin(indices_filtrados) & 
-            (recomendacoes_brutas['original_index'] != atleta_id)
-        ]
-        
-        recomendacoes_finais = recomendacoes_finais.sort_values(by='similaridade', ascending=False).head(top_n)
+        }).head(top_n)
         
         if recomendacoes_finais.empty:
             st.info(f"Nenhuma recomendação similar ao atleta **{atleta_ref_name}** encontrada com os filtros aplicados. Tente ajustar os critérios ou o atleta de referência.")
@@ -282,6 +341,7 @@ def recomendar_atletas_avancado(nome=None, clube=None, top_n=10, posicao=None,
         recomendacoes['similaridade'] = recomendacoes_finais['similaridade'].values
         
     else:
+        indices_filtrados = filtros.para_rotulos(permitidos)
         st.info("Mostrando atletas que atendem aos filtros. Para recomendações por similaridade, forneça um atleta de referência.")
         if len(indices_filtrados) < top_n:
             st.info(f"Apenas {len(indices_filtrados)} atletas encontrados com os filtros, mostrando todos.")
@@ -291,7 +351,8 @@ def recomendar_atletas_avancado(nome=None, clube=None, top_n=10, posicao=None,
     
     # --- PREPARAÇÃO DO DATAFRAME COMPLETO PARA DOWNLOAD ---
     # Fazer uma cópia para o download antes das formatações que mudam tipos de dados
-    recomendacoes_para_download = recomendacoes.copy()
+    # As colunas que não são usadas pelo modelo vêm da tabela de detalhes (carregada sob demanda)
+    recomendacoes_para_download = attach_details(recomendacoes, load_detalhes(base['versao_dados']), CHAVE_ATLETA)
 
     # --- Formatação e Renomeação de Colunas para Exibição na UI ---
     
@@ -323,7 +384,8 @@ def recomendar_atletas_avancado(nome=None, clube=None, top_n=10, posicao=None,
         cols_display_final.append('Similaridade')
     
     # Retornar o DataFrame principal com colunas formatadas e ordenadas, e o DF completo para download
-    return recomendacoes_exibicao[cols_display_final].sort_values(by='Similaridade', ascending=False, na_position='last').reset_index(drop=True), recomendacoes_para_download
+    # As linhas já estão em ordem de relevância (ordenar o texto "85%" quebraria a ordem numérica)
+    return recomendacoes_exibicao[cols_display_final].reset_index(drop=True), recomendacoes_para_download
 
 # --- Layout da Aplicação Streamlit ---
 
@@ -349,6 +411,27 @@ with col_ref:
     nome_atleta = st.text_input("Nome do Atleta", placeholder="Ex: Lionel Messi").strip()
     clube_atleta = st.text_input("Clube do Atleta", placeholder="Ex: Inter Miami CF").strip()
 
+    with st.expander("Combinar com outros atletas (blend)"):
+        st.markdown("Descreva o alvo como *algo entre* vários atletas. Os pesos definem a influência de cada um.")
+        peso_principal = st.number_input("Peso do atleta de referência acima", min_value=0.0, max_value=10.0, value=1.0, step=0.1)
+        referencias_editadas = st.data_editor(
+            pd.DataFrame({'Nome': pd.Series(dtype='str'), 'Clube': pd.Series(dtype='str'), 'Peso': pd.Series(dtype='float')}),
+            num_rows="dynamic",
+            use_container_width=True,
+            key="referencias_blend",
+            column_config={'Peso': st.column_config.NumberColumn(min_value=0.0, max_value=10.0, step=0.1, default=1.0)}
+        )
+        modo_blend = st.radio(
+            "Como combinar as referências",
+            options=['centroid', 'rank_fusion'],
+            format_func=lambda x: "Centróide ponderado" if x == 'centroid' else "Fusão de rankings",
+            horizontal=True
+        )
+    referencias_blend = [
+        (str(linha['Nome']).strip(), str(linha['Clube']).strip(), float(linha['Peso']) if pd.notna(linha['Peso']) else 1.0)
+        for _, linha in referencias_editadas.dropna(subset=['Nome', 'Clube']).iterrows()
+    ]
+
 with col_filters:
     st.subheader("Filtros de Perfil")
     st.markdown("Defina os critérios para o perfil dos atletas desejados.")
@@ -380,6 +463,12 @@ with col_filters:
         format="€%.1fM",
         help="Faixa de valor de mercado do atleta em milhões de Euros."
     )
+    perfil_selecionado = st.selectbox(
+        "Perfil de Similaridade",
+        options=[None] + list(PERFIS_SIMILARIDADE),
+        format_func=lambda x: "Equilibrado (todas as métricas)" if x is None else x,
+        help="Dá mais peso às métricas que definem o perfil procurado ao comparar com o atleta de referência."
+    )
     valor_min_val = valor_min_M * 1_000_000
     valor_max_val = valor_max_M * 1_000_000
 
@@ -396,7 +485,11 @@ if st.button("🔎 Gerar Recomendações", type="primary"):
             idade_max=idade_max_val,
             valor_min=valor_min_val,
             valor_max=valor_max_val,
-            top_n=10
+            top_n=10,
+            referencias_blend=referencias_blend,
+            peso_principal=peso_principal,
+            modo_blend=modo_blend,
+            perfil=perfil_selecionado
         )
         
         if not recomendacoes_display.empty:
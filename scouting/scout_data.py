@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Colunas textuais com poucos valores distintos: viram categóricas na carga
+COLUNAS_CATEGORICAS = ['position', 'player.team.name']
+TAMANHO_LOTE = 4096
+
+
+def _caminho_local(origem):
+    """Baixa `origem` em blocos para um arquivo temporário quando for URL. Retorna (caminho, temporario)."""
+    if not str(origem).startswith(('http://', 'https://')):
+        return origem, False
+    with urllib.request.urlopen(origem) as resposta, \
+            tempfile.NamedTemporaryFile(suffix='.parquet', delete=False) as destino:
+        shutil.copyfileobj(resposta, destino, length=1 << 20)
+    return destino.name, True
+
+
+def _reduzir_lote(lote, colunas_categoricas):
+    """float64 -> float32 e texto -> dicionário (categórica no pandas)."""
+    colunas = []
+    for campo, coluna in zip(lote.schema, lote.columns):
+        if pa.types.is_float64(campo.type):
+            coluna = coluna.cast(pa.float32())
+        elif campo.name in colunas_categoricas and (pa.types.is_string(campo.type) or pa.types.is_large_string(campo.type)):
+            coluna = coluna.dictionary_encode()
+        colunas.append(coluna)
+    return pa.RecordBatch.from_arrays(colunas, names=lote.schema.names)
+
+
+def read_parquet_projected(origem, colunas=None, excluir=(), colunas_categoricas=COLUNAS_CATEGORICAS,
+                           tamanho_lote=TAMANHO_LOTE):
+    """
+    Lê apenas as colunas pedidas (ou todas menos `excluir`) do parquet, lote a lote,
+    já convertendo float64 para float32 e as colunas textuais de `colunas_categoricas`
+    para categóricas. Colunas inexistentes no arquivo são ignoradas, então a checagem
+    de colunas obrigatórias continua sendo feita por quem chama.
+    """
+    caminho, temporario = _caminho_local(origem)
+    try:
+        arquivo = pq.ParquetFile(caminho)
+        nomes = arquivo.schema_arrow.names
+        if colunas is None:
+            colunas = [c for c in nomes if c not in excluir]
+        projetadas = [c for c in dict.fromkeys(colunas) if c in nomes]
+
+        lotes = [
+            _reduzir_lote(lote, colunas_categoricas)
+            for lote in arquivo.iter_batches(batch_size=tamanho_lote, columns=projetadas)
+        ]
+        if lotes:
+            tabela = pa.Table.from_batches(lotes).unify_dictionaries()
+        else:
+            tabela = arquivo.schema_arrow.empty_table().select(projetadas)
+        del lotes
+        return tabela.to_pandas(split_blocks=True, self_destruct=True)
+    finally:
+        if temporario:
+            os.remove(caminho)
+
+
+def attach_details(recomendacoes, detalhes, chave):
+    """Acrescenta as colunas de exibição (tabela carregada sob demanda) às linhas recomendadas, preservando o índice."""
+    detalhes = detalhes.drop_duplicates(subset=chave, keep='first').set_index(chave)
+    extras = detalhes.reindex(pd.MultiIndex.from_frame(recomendacoes[chave]))
+    extras = extras.drop(columns=recomendacoes.columns.intersection(extras.columns))
+    extras.index = recomendacoes.index
+    return pd.concat([recomendacoes, extras], axis=1)
+
+
+def score_per_value(serie, funcao):
+    """Aplica `funcao` uma vez por valor distinto (categorias) e devolve os scores como float64."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        por_categoria = np.array([funcao(str(c)) for c in serie.cat.categories], dtype=np.float64)
+        codigos = serie.cat.codes.to_numpy()
+        scores = np.where(codigos >= 0, por_categoria[codigos] if len(por_categoria) else 0.0, 0.0)
+        return pd.Series(scores, index=serie.index)
+    return serie.apply(lambda x: funcao(str(x))).astype(np.float64)
@@ -0,0 +1,319 @@
+import threading
+
+import faiss
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+# Colunas que identificam um registro de atleta entre duas versões do parquet
+# (o mesmo player.id aparece em mais de um clube/temporada).
+CHAVE_ATLETA = ['player.id', 'team_id', 'season_id']
+
+# Constante do Reciprocal Rank Fusion usada nas buscas com várias referências
+RRF_K = 60
+
+# Perfis de similaridade: peso por métrica (escala diagonal das features padronizadas).
+# Métricas ausentes valem 1.0; as chaves valem tanto para a coluna original quanto para a versão _p90.
+PERFIS_SIMILARIDADE = {
+    'Zagueiro construtor': {
+        'accuratePasses': 2.0, 'accuratePassesPercentage': 2.0, 'totalPasses': 1.5,
+        'accurateLongBalls': 2.5, 'accurateLongBallsPercentage': 2.0, 'totalLongBalls': 1.5,
+        'accurateOwnHalfPasses': 1.5, 'accurateOppositionHalfPasses': 2.0, 'keyPasses': 1.2,
+        'aerialDuelsWon': 1.5, 'aerialDuelsWonPercentage': 1.5, 'clearances': 1.5,
+        'interceptions': 1.5, 'tackles': 1.2, 'player.height': 1.2,
+        'goals': 0.5, 'totalShots': 0.5, 'shotsOnTarget': 0.5,
+    },
+    'Atacante de pressão': {
+        'possessionWonAttThird': 3.0, 'ballRecovery': 2.0, 'tackles': 2.0, 'tacklesWon': 2.0,
+        'interceptions': 1.5, 'totalDuelsWon': 1.5, 'groundDuelsWon': 1.5, 'fouls': 1.2,
+        'goals': 1.5, 'expectedGoals': 1.5, 'totalShots': 1.2,
+        'accurateLongBalls': 0.5, 'accurateOwnHalfPasses': 0.5, 'clearances': 0.5,
+    },
+    'Meia criativo': {
+        'keyPasses': 3.0, 'bigChancesCreated': 3.0, 'assists': 2.0, 'passToAssist': 2.0,
+        'accurateFinalThirdPasses': 2.5, 'totalAttemptAssist': 2.0, 'accurateOppositionHalfPasses': 1.5,
+        'successfulDribbles': 1.5, 'successfulDribblesPercentage': 1.2, 'accurateCrosses': 1.2,
+        'clearances': 0.5, 'aerialDuelsWon': 0.5,
+    },
+}
+
+
+def _normalizar_l2(matriz):
+    """Normalização L2 linha a linha (produto interno = similaridade de cosseno)."""
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+class IncrementalPlayerIndex:
+    """
+    Índice FAISS (IndexIDMap2 sobre IndexFlatIP) que aceita inserção e atualização
+    de atletas usando os transformadores já ajustados, sem refit completo.
+
+    Os ids do FAISS são os rótulos do índice do DataFrame, então os resultados de
+    `search` podem ser usados diretamente em `df.loc[...]`.
+
+    O drift é medido comparando as médias/variâncias atuais da entrada do
+    StandardScaler com as do último ajuste; `needs_refit()` indica quando o
+    desvio passou dos limites e um refit completo deve ser agendado.
+
+    Para cada perfil em `profiles` ({nome: {métrica: peso}}) é mantido um índice
+    ponderado pré-calculado, então trocar de perfil não exige refit nem reconstrução.
+    """
+
+    def __init__(self, feature_cols, pre_transformer_factory=None,
+                 mean_drift_threshold=0.1, var_drift_threshold=0.25, profiles=None):
+        self.feature_cols = list(feature_cols)
+        self.profile_weights = {
+            nome: self._pesos_do_perfil(perfil) for nome, perfil in (profiles or {}).items()
+        }
+        self.pre_transformer_factory = pre_transformer_factory
+        self.mean_drift_threshold = mean_drift_threshold
+        self.var_drift_threshold = var_drift_threshold
+        self.lock = threading.RLock()
+
+        self.pre_transformer = None
+        self.scaler = None
+        self.index = None
+        self.profile_indexes = {}
+        self.n_refits = 0
+        self._raw = None
+        self._n = 0
+        self._sum = None
+        self._sumsq = None
+
+    # --- Ajuste completo ---
+    def fit(self, features):
+        """Ajusta transformadores e reconstrói o índice com todas as linhas de `features`."""
+        with self.lock:
+            # Arredondado para float32, como fica guardado em _raw: as somas de drift e o que
+            # upsert desconta depois saem dos mesmos valores
+            X = features[self.feature_cols].astype(np.float32).astype(np.float64)
+
+            pre_transformer = None
+            if self.pre_transformer_factory is not None:
+                pre_transformer = self.pre_transformer_factory()
+                X_pre = pre_transformer.fit_transform(X.values)
+            else:
+                X_pre = X.values
+
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X_pre)
+            vetores = _normalizar_l2(X_scaled).astype('float32')  # FAISS precisa de float32
+
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(vetores.shape[1]))
+            index.add_with_ids(vetores, features.index.to_numpy(dtype='int64'))
+
+            self.pre_transformer = pre_transformer
+            self.scaler = scaler
+            self.index = index
+            self.profile_indexes = {
+                nome: self._indice_ponderado(vetores, features.index.to_numpy(dtype='int64'), pesos)
+                for nome, pesos in self.profile_weights.items()
+            }
+            self._raw = X.astype('float32')
+            self._n = X_pre.shape[0]
+            self._sum = X_pre.sum(axis=0)
+            self._sumsq = (X_pre ** 2).sum(axis=0)
+            self.n_refits += 1
+        return self
+
+    # --- Perfis de similaridade ---
+    def _pesos_do_perfil(self, perfil):
+        return np.array([
+            perfil.get(col, perfil.get(col.removesuffix('_p90'), 1.0)) for col in self.feature_cols
+        ], dtype='float32')
+
+    @staticmethod
+    def _indice_ponderado(vetores, ids, pesos):
+        # Escalar os vetores já normalizados e re-normalizar equivale a ponderar as features padronizadas
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(vetores.shape[1]))
+        index.add_with_ids(_normalizar_l2(vetores * pesos).astype('float32'), ids)
+        return index
+
+    def _indice(self, profile=None):
+        return self.index if profile is None else self.profile_indexes[profile]
+
+    # --- Transformações com os ajustes correntes ---
+    def _pre(self, valores):
+        if self.pre_transformer is None:
+            return valores
+        return self.pre_transformer.transform(valores)
+
+    def scaled(self, features):
+        """Features padronizadas (antes da normalização L2), úteis para explicar similaridade."""
+        valores = features[self.feature_cols].astype(np.float64).values
+        return self.scaler.transform(self._pre(valores))
+
+    def transform(self, features, profile=None):
+        """Vetores float32 normalizados, no mesmo espaço do índice (do perfil, se informado)."""
+        escalados = self.scaled(features)
+        if profile is not None:
+            escalados = escalados * self.profile_weights[profile]
+        return _normalizar_l2(escalados).astype('float32')
+
+    # --- Atualização incremental ---
+    def upsert(self, features):
+        """
+        Insere atletas novos e substitui os vetores dos atletas já indexados
+        (remove_ids + add_with_ids), mantendo as estatísticas de drift em dia.
+        Retorna (n_inseridos, n_atualizados).
+        """
+        if features.empty:
+            return 0, 0
+        with self.lock:
+            ids = features.index.to_numpy(dtype='int64')
+            existentes = features.index.intersection(self._raw.index)
+
+            if len(existentes):
+                antigos = self._pre(self._raw.loc[existentes].astype(np.float64).values)
+                self._n -= antigos.shape[0]
+                self._sum -= antigos.sum(axis=0)
+                self._sumsq -= (antigos ** 2).sum(axis=0)
+                for index in [self.index, *self.profile_indexes.values()]:
+                    index.remove_ids(existentes.to_numpy(dtype='int64'))
+
+            novos_brutos = features[self.feature_cols].astype(np.float32).astype(np.float64)
+            novos_pre = self._pre(novos_brutos.values)
+            self._n += novos_pre.shape[0]
+            self._sum += novos_pre.sum(axis=0)
+            self._sumsq += (novos_pre ** 2).sum(axis=0)
+
+            vetores = _normalizar_l2(self.scaler.transform(novos_pre)).astype('float32')
+            self.index.add_with_ids(vetores, ids)
+            for nome, index in self.profile_indexes.items():
+                index.add_with_ids(_normalizar_l2(vetores * self.profile_weights[nome]).astype('float32'), ids)
+
+            self._raw = pd.concat([
+                self._raw.drop(index=existentes),
+                novos_brutos.astype('float32')
+            ])
+        return len(ids) - len(existentes), len(existentes)
+
+    def refit(self):
+        """Refit completo com os dados brutos atualmente indexados."""
+        with self.lock:
+            return self.fit(self._raw)
+
+    # --- Drift ---
+    def drift(self):
+        """Maior desvio (média em desvios-padrão, log da razão de variâncias) entre o estado atual e o último ajuste."""
+        media_atual = self._sum / self._n
+        var_atual = np.maximum(self._sumsq / self._n - media_atual ** 2, 0.0)
+        media_ajuste = self.scaler.mean_
+        var_ajuste = self.scaler.var_
+
+        escala = np.sqrt(var_ajuste)
+        escala[escala == 0] = 1.0
+        drift_media = np.abs(media_atual - media_ajuste) / escala
+
+        validas = var_ajuste > 0
+        drift_var = np.zeros_like(var_ajuste)
+        drift_var[validas] = np.abs(np.log((var_atual[validas] + 1e-12) / var_ajuste[validas]))
+        return float(drift_media.max()), float(drift_var.max())
+
+    def needs_refit(self):
+        drift_media, drift_var = self.drift()
+        return drift_media > self.mean_drift_threshold or drift_var > self.var_drift_threshold
+
+    # --- Consulta ---
+    def vector(self, player_id, profile=None):
+        return self._indice(profile).reconstruct(int(player_id)).reshape(1, -1)
+
+    def search(self, query_vectors, k, profile=None, allowed=None):
+        """
+        `allowed` é um bitmap empacotado (bitorder='little', bit = id), como os do FilterIndex:
+        a busca só considera esses ids, em vez de buscar tudo e filtrar depois.
+        """
+        index = self._indice(profile)
+        query_vectors = np.ascontiguousarray(query_vectors, dtype='float32')
+        if allowed is None:
+            return index.search(query_vectors, min(k, index.ntotal))
+        seletor = faiss.IDSelectorBitmap(len(allowed), faiss.swig_ptr(allowed))
+        return index.search(query_vectors, min(k, index.ntotal), params=faiss.SearchParameters(sel=seletor))
+
+    def search_blend(self, player_ids, weights=None, k=10, mode='centroid', profile=None, allowed=None):
+        """
+        Busca por "algo entre o atleta A e o atleta B".
+
+        - 'centroid': média ponderada dos vetores de referência, re-normalizada; uma única consulta.
+        - 'rank_fusion': todas as referências numa única chamada em lote ao FAISS, rankings
+          fundidos por RRF ponderado.
+
+        Retorna (ids, similaridades) em ordem de relevância. A similaridade é o cosseno ao
+        centróide ou, na fusão, a média ponderada dos cossenos a cada referência. `allowed`
+        restringe os ids como em `search`.
+        """
+        vetores = np.vstack([self.vector(i, profile) for i in player_ids])
+        pesos = np.ones(len(player_ids)) if weights is None else np.asarray(weights, dtype=np.float64)
+        pesos = pesos / pesos.sum()
+
+        if mode == 'centroid':
+            centroide = _normalizar_l2((pesos[:, None] * vetores).sum(axis=0, keepdims=True))
+            D, I = self.search(centroide, k, profile, allowed)
+            validos = I[0] >= 0
+            return I[0][validos], D[0][validos]
+
+        D, I = self.search(vetores, k, profile, allowed)
+        posicoes = np.tile(np.arange(I.shape[1]), I.shape[0])
+        pesos_por_linha = np.repeat(pesos, I.shape[1])
+        resultados = pd.DataFrame({'id': I.ravel(), 'rrf': pesos_por_linha / (RRF_K + posicoes + 1)})
+        fundidos = resultados[resultados['id'] >= 0].groupby('id')['rrf'].sum().sort_values(ascending=False)
+        ids = fundidos.index.to_numpy()
+        if not len(ids):
+            return ids, np.zeros(0, dtype='float32')
+        # Cosseno a todas as referências, inclusive as que não trouxeram o candidato no top-k
+        candidatos = np.vstack([self.vector(i, profile) for i in ids])
+        return ids, (pesos @ (vetores @ candidatos.T)).astype('float32')
+
+
+def _alinhar_categorias(df, df_new, colunas):
+    """Une as categorias dos dois lados para que atribuição/concat preservem o dtype categórico."""
+    for col in colunas:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            valores_novos = pd.Index(df_new[col].dropna().astype(object).unique())
+            tipo = pd.CategoricalDtype(df[col].cat.categories.append(
+                valores_novos.difference(df[col].cat.categories)
+            ))
+            df[col] = df[col].astype(tipo)
+            df_new[col] = df_new[col].astype(tipo)
+
+
+def merge_new_rows(df, df_new, compare_cols, key_cols=CHAVE_ATLETA):
+    """
+    Junta uma nova rodada de dados ao DataFrame já carregado.
+
+    Atletas já conhecidos (mesma chave) são atualizados no próprio rótulo; atletas
+    novos recebem rótulos a partir de `df.index.max() + 1`. Retorna o DataFrame
+    resultante e os rótulos cujas colunas de `compare_cols` mudaram ou foram inseridos.
+    """
+    df_new = df_new.drop_duplicates(subset=key_cols, keep='last')
+
+    rotulo_por_chave = pd.Series(df.index, index=pd.MultiIndex.from_frame(df[key_cols]))
+    rotulo_por_chave = rotulo_por_chave[~rotulo_por_chave.index.duplicated(keep='first')]
+    chaves_novas = pd.MultiIndex.from_frame(df_new[key_cols])
+    rotulos = rotulo_por_chave.reindex(chaves_novas).to_numpy(dtype='float64', copy=True)
+
+    conhecidos = ~pd.isna(rotulos)
+    proximo_rotulo = int(df.index.max()) + 1 if len(df) else 0
+    rotulos[~conhecidos] = np.arange(proximo_rotulo, proximo_rotulo + int((~conhecidos).sum()))
+    df_new = df_new.set_axis(rotulos.astype('int64'), axis=0)
+
+    atualizados = df_new[conhecidos]
+    anteriores = df.loc[atualizados.index, compare_cols]
+    mudou = ~np.isclose(
+        atualizados[compare_cols].to_numpy(dtype=np.float64),
+        anteriores.to_numpy(dtype=np.float64),
+        equal_nan=True
+    ).all(axis=1)
+    rotulos_alterados = atualizados.index[mudou]
+
+    colunas = df.columns.intersection(df_new.columns)
+    df = df.copy()
+    _alinhar_categorias(df, df_new, colunas)
+    df.loc[rotulos_alterados, colunas] = df_new.loc[rotulos_alterados, colunas]
+    inseridos = df_new[~conhecidos]
+    if not inseridos.empty:
+        df = pd.concat([df, inseridos.reindex(columns=df.columns)])
+
+    return df, rotulos_alterados.append(inseridos.index)
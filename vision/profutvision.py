@@ -1,11 +1,21 @@
+import os
+import sys
 import streamlit as st
 import pandas as pd
 import time
 from datetime import datetime
 
+# The event log and match journal are shared with the trackers in players_tracking/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'players_tracking'))
+from event_journal import list_journals
+from event_log import EventLog
+
+# App name in the match journals (every match is written to disk so it can be resumed)
+TRACKER_APP = "profutvision"
+
 # Initialize session state
-if 'match_data' not in st.session_state:
-    st.session_state.match_data = pd.DataFrame(columns=[
+if 'event_log' not in st.session_state:
+    st.session_state.event_log = EventLog.with_journal(TRACKER_APP, [
         "Event", "Minute", "Second", "Team", "Player", "Type", "SubType", "Timestamp"
     ])
     st.session_state.team_a = "Team A"
@@ -15,7 +25,7 @@ if 'match_data' not in st.session_state:
     st.session_state.playback_speed = 1
     st.session_state.current_possession = None
     st.session_state.possession_start = None
-    st.session_state.possession_log = []
+    st.session_state.possession_seconds = {}  # accumulated possession time per team
 
 # ========== FUNCTION DEFINITIONS ==========
 def get_current_time():
@@ -37,18 +47,15 @@ def pause_timer():
 def reset_timer():
     st.session_state.timer_start = None
     st.session_state.paused_time = 0
-    st.session_state.possession_log = []
+    st.session_state.possession_seconds = {}
     st.session_state.current_possession = None
     st.session_state.possession_start = None
 
 def log_possession_duration():
     if st.session_state.current_possession and st.session_state.possession_start:
         duration = time.time() - st.session_state.possession_start
-        st.session_state.possession_log.append({
-            "Team": st.session_state.current_possession,
-            "Start": st.session_state.possession_start,
-            "Duration": duration
-        })
+        team = st.session_state.current_possession
+        st.session_state.possession_seconds[team] = st.session_state.possession_seconds.get(team, 0.0) + duration
         st.session_state.possession_start = time.time()
 
 def set_possession(team):
@@ -58,10 +65,9 @@ def set_possession(team):
     st.rerun()
 
 def calculate_possession():
-    team_a_time = sum([p["Duration"] for p in st.session_state.possession_log 
-                      if p["Team"] == st.session_state.team_a])
-    team_b_time = sum([p["Duration"] for p in st.session_state.possession_log 
-                      if p["Team"] == st.session_state.team_b])
+    # Running totals: O(1) however many possession changes were tagged
+    team_a_time = st.session_state.possession_seconds.get(st.session_state.team_a, 0.0)
+    team_b_time = st.session_state.possession_seconds.get(st.session_state.team_b, 0.0)
     
     if st.session_state.possession_start and st.session_state.current_possession:
         current_duration = time.time() - st.session_state.possession_start
@@ -91,12 +97,35 @@ def record_event(event, team, player="", event_type="", subtype=""):
         "Timestamp": time.time()
     }
     
-    st.session_state.match_data = pd.concat(
-        [st.session_state.match_data, pd.DataFrame([new_event])],
-        ignore_index=True
-    )
+    st.session_state.event_log.append(new_event)
     st.rerun()
 
+def undo_event():
+    st.session_state.event_log.undo()
+
+def redo_event():
+    st.session_state.event_log.redo()
+
+def remove_event(event_id):
+    st.session_state.event_log.remove(event_id)
+
+def correct_event(event_id):
+    """Apply the values typed in the correction panel to event `event_id`."""
+    st.session_state.event_log.edit(event_id, {
+        "Player": st.session_state[f"fix_player_{event_id}"],
+        "Minute": int(st.session_state[f"fix_minute_{event_id}"]),
+        "Second": int(st.session_state[f"fix_second_{event_id}"]),
+    })
+
+def resume_match(journal_path):
+    """Resume a saved match: journal events, timer paused at the last event."""
+    st.session_state.event_log.close()
+    st.session_state.event_log = EventLog.resume(journal_path)
+    st.session_state.timer_start = None
+    st.session_state.paused_time = st.session_state.event_log.last_time() / st.session_state.playback_speed
+    st.session_state.current_possession = None
+    st.session_state.possession_start = None
+
 # ========== STREAMLIT UI ==========
 st.title("⚽ Football Match Tracker")
 
@@ -119,23 +148,44 @@ with control_col3:
         if st.button("↻ Reset", use_container_width=True):
             reset_timer()
 
+with st.expander("💾 Resume saved match"):
+    saved_matches = list_journals(TRACKER_APP)
+    if saved_matches:
+        saved_labels = {path: f"{header['created']:%d/%m %H:%M} · {n_events} events" for path, header, n_events in saved_matches}
+        resume_path = st.selectbox("Match:", list(saved_labels), format_func=saved_labels.get, key="resume_path")
+        st.button("Resume", key="resume_btn", on_click=resume_match, args=(resume_path,))
+    else:
+        st.caption("No saved matches yet.")
+
 # Second row - Time and Possession
-time_col, poss_col_a, poss_col_b = st.columns([2,1,1])
-with time_col:
+# While the timer runs, only the clock and possession fragments re-run every second
+# (also while paused, as long as journal events are waiting for fsync)
+clock_refresh = 1 if st.session_state.timer_start or st.session_state.event_log.unsynced else None
+
+@st.fragment(run_every=clock_refresh)
+def match_clock():
+    st.session_state.event_log.sync_if_due()
     current_time = get_current_time()
     display_min = int(current_time // 60)
     display_sec = int(current_time % 60)
     st.metric("Match Time", f"{display_min}:{display_sec:02d}")
 
-team_a_poss, team_b_poss = calculate_possession()
+@st.fragment(run_every=clock_refresh)
+def possession_metric(team_index):
+    st.metric("Possession", f"{calculate_possession()[team_index]:.1f}%")
+
+time_col, poss_col_a, poss_col_b = st.columns([2,1,1])
+with time_col:
+    match_clock()
+
 with poss_col_a:
     if st.button(f"🏃 {st.session_state.team_a}", use_container_width=True):
         set_possession(st.session_state.team_a)
-    st.metric("Possession", f"{team_a_poss:.1f}%")
+    possession_metric(0)
 with poss_col_b:
     if st.button(f"🏃 {st.session_state.team_b}", use_container_width=True):
         set_possession(st.session_state.team_b)
-    st.metric("Possession", f"{team_b_poss:.1f}%")
+    possession_metric(1)
 
 # Main action buttons - All visible on one screen
 st.header("Match Actions")
@@ -307,13 +357,54 @@ with aerial_col2:
         st.button("Lost", key="aerial_lost_b", on_click=record_event, 
                 args=("Aerial Duel", st.session_state.team_b, "", "Lost"))
 
+# Event fixes (undo/redo, correct and delete)
+with st.expander("✏️ Fix Events"):
+    event_log = st.session_state.event_log
+    undo_col, redo_col = st.columns(2)
+    undo_col.button("↩️ Undo", key="undo_btn", on_click=undo_event, disabled=not event_log.can_undo, use_container_width=True)
+    redo_col.button("↪️ Redo", key="redo_btn", on_click=redo_event, disabled=not event_log.can_redo, use_container_width=True)
+    fix_minute = st.number_input("Event minute:", min_value=0, step=1, key="fix_minute")
+    fix_ids = event_log.find(fix_minute)
+    if fix_ids:
+        fix_id = st.selectbox("Event:", fix_ids, format_func=event_log.describe, key="fix_event")
+        fix_event = event_log.get(fix_id)
+        fix_col1, fix_col2, fix_col3 = st.columns([3, 1, 1])
+        fix_col1.text_input("Player:", str(fix_event["Player"]), key=f"fix_player_{fix_id}")
+        fix_col2.number_input("Minute", min_value=0, value=int(fix_event["Minute"]), step=1, key=f"fix_minute_{fix_id}")
+        fix_col3.number_input("Second", min_value=0, max_value=59, value=int(fix_event["Second"]), step=1, key=f"fix_second_{fix_id}")
+        save_col, remove_col = st.columns(2)
+        save_col.button("Save fix", key="fix_save_btn", on_click=correct_event, args=(fix_id,), use_container_width=True)
+        remove_col.button("Delete event", key="fix_remove_btn", on_click=remove_event, args=(fix_id,), use_container_width=True)
+    else:
+        st.caption("No events in this minute.")
+
+# Live stats, read from the event log counters instead of the full log
+st.header("Live Stats")
+live_stats = st.session_state.event_log.stats
+if live_stats.total:
+    team_totals = live_stats.team_totals()
+    for total_col, (team, n_events) in zip(st.columns(len(team_totals)), team_totals.items()):
+        total_col.metric(f"{team} events", n_events)
+    stats_col1, stats_col2 = st.columns(2)
+    stats_col1.caption("By event type")
+    stats_col1.dataframe(live_stats.team_table())
+    stats_col2.caption("By 15-minute window")
+    stats_col2.dataframe(live_stats.window_table())
+    player_keys = [key for key in live_stats.player_keys() if key[1]]
+    if player_keys:
+        live_player = st.selectbox("Player:", player_keys, format_func=lambda key: f"{key[1]} ({key[0]})", key="live_stats_player")
+        st.dataframe(pd.Series(live_stats.player_counts(*live_player), name="Events"))
+else:
+    st.info("Stats appear after the first tagged event.")
+
 # Data reporting at bottom
 st.header("Match Report")
-if not st.session_state.match_data.empty:
-    st.dataframe(st.session_state.match_data.sort_values(["Minute", "Second"]))
+if not st.session_state.event_log.empty:
+    match_data = st.session_state.event_log.to_frame()
+    st.dataframe(match_data.sort_values(["Minute", "Second"]))
     
     if st.button("Export to CSV"):
-        csv = st.session_state.match_data.to_csv(index=False)
+        csv = match_data.to_csv(index=False)
         st.download_button(
             label="Download CSV",
             data=csv,